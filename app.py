@@ -1,29 +1,33 @@
 import sys
-import os
 import json
-import datetime
-import wmi
 import time
-import psutil
-import GPUtil
-import pythoncom
+import datetime
+
+STARTUP_STARTED = time.perf_counter()  # ใช้วัดเวลาเริ่มโปรแกรม (--startup-timing)
+
+if __name__ == "__main__" and "--daemon" in sys.argv[1:]:
+    # โหมด daemon ไม่ใช้หน้าต่าง จึงไม่นำเข้า PyQt5 เลย
+    from hdmi_daemon import main
+    sys.exit(main(sys.argv[1:]))
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, 
-                            QHBoxLayout, QLabel, QPushButton, QTextEdit, QTableWidget, 
-                            QTableWidgetItem, QMessageBox, QHeaderView, QDateEdit, QSplitter,
+                            QHBoxLayout, QLabel, QPushButton, QTextEdit, QTableView, 
+                            QMessageBox, QHeaderView, QDateEdit, QSplitter,
                             QSystemTrayIcon, QMenu, QAction, QProgressBar, QFrame)
-from PyQt5.QtCore import QThread, pyqtSignal, Qt, QDate, QTimer
+from PyQt5.QtCore import QThread, pyqtSignal, Qt, QDate, QTimer, QEvent, QAbstractTableModel, QModelIndex
 from PyQt5.QtGui import QFont, QColor, QIcon
-from win10toast import ToastNotifier
+from hw_probes import CONNECTION_TYPE_HDMI, create_probe_backend
+from monitor_core import (EVENT_FLAPPING, PROBE_BACKEND, PROBE_DEADLINE, THREAD_STOP_TIMEOUT,
+                          METRIC_HISTORY_FILE, METRICS_HOST, METRICS_PORT, HDMIMonitorCore,
+                          SystemMonitorCore, LogManager, create_event_source, create_hardware_sampler, notification_message)
 # แก้ไขการนำเข้า pycec
 # from pycec import pycec
 
+IMPORTS_FINISHED = time.perf_counter()
+
 # กำหนดค่าคงที่
 APP_TITLE = "ตรวจสอบสถานะ HDMI บน Windows"
 APP_ICON = "monitor.ico"
-LOG_FILE = "hdmi_monitor_log.json"
-HDMI_CHECK_INTERVAL = 5  # ตรวจสอบทุก 5 วินาที
-SYSTEM_CHECK_INTERVAL = 1  # ตรวจสอบทุก 1 วินาที
-CONNECTION_TYPE_HDMI = 5  # รหัสสำหรับการเชื่อมต่อ HDMI
 NOTIFICATION_DURATION = 5  # ระยะเวลาแสดงการแจ้งเตือน (วินาที)
 
 # ประเภทการเชื่อมต่อ
@@ -42,18 +46,6 @@ CONNECTION_TYPES = {
     12: "Virtual",
 }
 
-# รหัสข้อผิดพลาดของอุปกรณ์
-ERROR_CODES = {
-    0: "อุปกรณ์ทำงานปกติ",
-    1: "อุปกรณ์ยังตั้งค่าไม่ถูกต้อง",
-    2: "Windows ไม่สามารถโหลดไดรเวอร์ของอุปกรณ์นี้",
-    3: "ไดรเวอร์อาจมีปัญหาหรือระบบเมมโมรีไม่พอ",
-    4: "อุปกรณ์นี้ทำงานไม่ถูกต้อง",
-    22: "อุปกรณ์นี้ถูกปิดการใช้งาน",
-    28: "ไม่มีไดรเวอร์ติดตั้งสำหรับอุปกรณ์นี้",
-    43: "Windows หยุดอุปกรณ์นี้เนื่องจากพบปัญหา"
-}
-
 # สถานะไอคอน
 STATUS_ICONS = {
     "normal": "✅",
@@ -62,306 +54,58 @@ STATUS_ICONS = {
     "unknown": "❓"
 }
 
-class HDMIMonitor(QThread):
-    """
-    เธรดสำหรับการตรวจสอบสถานะ HDMI และไดรเวอร์การ์ดจอ
-    """
-    update_signal = pyqtSignal(dict)
-    log_signal = pyqtSignal(dict)
-    notification_signal = pyqtSignal(str, str)  # สัญญาณสำหรับการแจ้งเตือน (หัวข้อ, ข้อความ)
-    
-    def __init__(self, parent=None):
-        super(HDMIMonitor, self).__init__(parent)
-        self.running = True
-        self.interval = HDMI_CHECK_INTERVAL
-        
-        # สถานะครั้งล่าสุด เพื่อตรวจสอบการเปลี่ยนแปลง
-        self.last_status = {
-            'hdmi_connected': False,
-            'hdmi_active': False,
-            'gpu_status': {}
-        }
-        
-    def run(self):
-        pythoncom.CoInitialize()
-        while self.running:
-            try:
-                status = self.check_hdmi_status()
-                self.update_signal.emit(status)
-                
-                # ตรวจสอบการเปลี่ยนแปลงสถานะและบันทึกล็อกหากมีการเปลี่ยนแปลง
-                if self._has_status_changed(status):
-                    log_entry = {
-                        'timestamp': datetime.datetime.now().isoformat(),
-                        'status': status,
-                        'event_type': self._determine_event_type(status)
-                    }
-                    self.log_signal.emit(log_entry)
-                    
-                    # ส่งการแจ้งเตือนเมื่อมีการเปลี่ยนแปลงสถานะ
-                    event_type = self._determine_event_type(status)
-                    notification_title = "การแจ้งเตือนสถานะ HDMI"
-                    notification_message = self._get_notification_message(event_type, status)
-                    self.notification_signal.emit(notification_title, notification_message)
-                    
-                    self.last_status = status.copy()
-                    
-                time.sleep(self.interval)
-            except Exception as e:
-                error_msg = f"Error in monitoring thread: {str(e)}"
-                print(error_msg)
-                self.notification_signal.emit("เกิดข้อผิดพลาด", error_msg)
-                time.sleep(self.interval)
-    
-    def _has_status_changed(self, current_status):
-        """ตรวจสอบว่าสถานะมีการเปลี่ยนแปลงหรือไม่"""
-        if self.last_status['hdmi_connected'] != current_status['hdmi_connected']:
-            return True
-        if self.last_status['hdmi_active'] != current_status['hdmi_active']:
-            return True
-            
-        # ตรวจสอบการเปลี่ยนแปลงสถานะ GPU
-        for gpu_id, gpu_info in current_status['gpu_status'].items():
-            if gpu_id in self.last_status['gpu_status']:
-                if self.last_status['gpu_status'][gpu_id]['error_code'] != gpu_info['error_code']:
-                    return True
-            else:
-                return True
-                
-        return False
-    
-    def _determine_event_type(self, status):
-        """ระบุประเภทของเหตุการณ์ที่เกิดขึ้น"""
-        if not status['hdmi_connected']:
-            return "HDMI_DISCONNECTED"
-        elif not status['hdmi_active']:
-            return "HDMI_INACTIVE"
-        
-        # ตรวจสอบว่ามี GPU ที่มีปัญหาหรือไม่
-        for gpu_info in status['gpu_status'].values():
-            if gpu_info['error_code'] != 0:
-                return f"GPU_ERROR_CODE_{gpu_info['error_code']}"
-        
-        return "NORMAL"
-    
-    def _get_notification_message(self, event_type, status):
-        """สร้างข้อความแจ้งเตือนตามประเภทเหตุการณ์"""
-        if event_type == "HDMI_DISCONNECTED":
-            return "HDMI ถูกถอดออกจากเครื่อง"
-        elif event_type == "HDMI_INACTIVE":
-            return "HDMI เชื่อมต่ออยู่แต่ไม่ทำงาน"
-        elif event_type.startswith("GPU_ERROR_CODE_"):
-            error_code = event_type.split("_")[-1]
-            for gpu_id, gpu_info in status['gpu_status'].items():
-                if str(gpu_info['error_code']) == error_code:
-                    return f"การ์ดจอ {gpu_info['name']} มีปัญหา: {gpu_info['error_description']}"
-            return f"การ์ดจอมีปัญหา (รหัส {error_code})"
-        elif event_type == "NORMAL":
-            return "การเชื่อมต่อ HDMI กลับมาทำงานปกติแล้ว"
-        else:
-            return f"เหตุการณ์: {event_type}"
-    
-    def check_hdmi_status(self):
-        """ตรวจสอบสถานะการเชื่อมต่อ HDMI และไดรเวอร์การ์ดจอ"""
-        pythoncom.CoInitialize()
-        result = {
-            'hdmi_connected': False,
-            'hdmi_active': False,
-            'hdmi_devices': [],
-            'gpu_status': {},
-            'driver_check_time': datetime.datetime.now().isoformat()
-        }
-        
-        try:
-            # ตรวจสอบการเชื่อมต่อ HDMI
-            try:
-                wmi_obj = wmi.WMI(namespace="root\\wmi")
-                monitors_found = False
-                for monitor in wmi_obj.WmiMonitorConnectionParams():
-                    monitors_found = True
-                    try:
-                        conn_type = monitor.VideoOutputTechnology
-                        is_active = monitor.Active
-                        
-                        monitor_info = {
-                            'instance_name': monitor.InstanceName,
-                            'connection_type': conn_type,
-                            'active': is_active,
-                            'status': 'normal'
-                        }
-                        
-                        result['hdmi_devices'].append(monitor_info)
-                        
-                        if conn_type == CONNECTION_TYPE_HDMI:  # 5 = HDMI
-                            result['hdmi_connected'] = True
-                            if is_active:
-                                result['hdmi_active'] = True
-                    except Exception as monitor_error:
-                        monitor_info = {
-                            'instance_name': getattr(monitor, 'InstanceName', 'Unknown'),
-                            'connection_type': -1,
-                            'active': False,
-                            'status': f'error: {str(monitor_error)}'
-                        }
-                        result['hdmi_devices'].append(monitor_info)
-                
-                if not monitors_found:
-                    result['wmi_error'] = "ไม่พบจอภาพที่เชื่อมต่อ"
-                    
-            except Exception as wmi_error:
-                result['wmi_error'] = str(wmi_error)
-            
-            # ตรวจสอบสถานะไดรเวอร์การ์ดจอ
-            try:
-                wmi_obj = wmi.WMI()
-                gpu_found = False
-                
-                # ลองใช้ GPUtil ก่อน
-                try:
-                    gpus = GPUtil.getGPUs()
-                    if gpus:
-                        for idx, gpu in enumerate(gpus):
-                            gpu_found = True
-                            gpu_id = f"gpu_{idx}"
-                            result['gpu_status'][gpu_id] = {
-                                'name': gpu.name,
-                                'status': "OK",
-                                'error_code': 0,
-                                'driver_version': "Unknown",  # GPUtil ไม่มีข้อมูลนี้
-                                'driver_status': "normal",
-                                'load': f"{gpu.load * 100:.1f}%",
-                                'temperature': f"{gpu.temperature}°C",
-                                'memory_used': f"{gpu.memoryUsed}MB / {gpu.memoryTotal}MB",
-                                'error_description': "ทำงานปกติ"
-                            }
-                except Exception:
-                    pass  # ถ้าใช้ GPUtil ไม่ได้ จะใช้ WMI แทน
-                
-                # ถ้ายังไม่พบ GPU ให้ใช้ WMI
-                if not gpu_found:
-                    for idx, gpu in enumerate(wmi_obj.Win32_VideoController()):
-                        gpu_found = True
-                        gpu_id = f"gpu_{idx}"
-                        
-                        try:
-                            if gpu.ConfigManagerErrorCode == 0:
-                                if gpu.Status == "OK":
-                                    driver_status = "normal"
-                                else:
-                                    driver_status = "warning"
-                            else:
-                                driver_status = "error"
-                        except:
-                            driver_status = "unknown"
-                        
-                        result['gpu_status'][gpu_id] = {
-                            'name': getattr(gpu, 'Name', 'Unknown GPU'),
-                            'status': getattr(gpu, 'Status', 'Unknown'),
-                            'error_code': getattr(gpu, 'ConfigManagerErrorCode', -1),
-                            'driver_version': getattr(gpu, 'DriverVersion', 'Unknown'),
-                            'driver_status': driver_status,
-                            'driver_date': getattr(gpu, 'DriverDate', 'Unknown'),
-                            'error_description': self._get_error_description(
-                                getattr(gpu, 'ConfigManagerErrorCode', -1)
-                            )
-                        }
-                
-                if not gpu_found:
-                    result['gpu_status']['gpu_0'] = {
-                        'name': "ไม่พบการ์ดจอ",
-                        'status': "Not found",
-                        'error_code': -1,
-                        'driver_version': "N/A",
-                        'driver_status': "error",
-                        'error_description': "ไม่พบการ์ดจอในระบบ หรือไม่สามารถเข้าถึงข้อมูลได้"
-                    }
-                    
-            except Exception as gpu_error:
-                result['gpu_error'] = str(gpu_error)
-                result['gpu_status']['gpu_error'] = {
-                    'name': "Error checking GPU",
-                    'status': "Error",
-                    'error_code': -1,
-                    'driver_version': "Unknown",
-                    'driver_status': "error",
-                    'error_description': str(gpu_error)
-                }
-                
-        except Exception as e:
-            error_msg = f"Error checking HDMI status: {str(e)}"
-            print(error_msg)
-            result['error'] = error_msg
-            
-        return result
-    
-    def _get_error_description(self, error_code):
-        """แปลงรหัสข้อผิดพลาดเป็นคำอธิบาย"""
-        return ERROR_CODES.get(error_code, f"ข้อผิดพลาดที่ไม่รู้จัก (รหัส {error_code})")
-    
-    def stop(self):
-        self.running = False
-
+# ชื่อที่แสดงของค่าในสถิติย้อนหลัง
+HISTORY_METRIC_LABELS = {
+    "cpu_percent": "CPU (%)",
+    "memory_percent": "RAM (%)",
+    "cpu_temperature": "อุณหภูมิ CPU (°C)",
+    "mainboard_temperature": "อุณหภูมิ Mainboard (°C)"
+}
+HISTORY_GPU_FIELD_LABELS = {
+    "load": "การใช้งาน (%)",
+    "memory_percent": "หน่วยความจำ (%)",
+    "temperature": "อุณหภูมิ (°C)"
+}
 
-class LogManager:
-    """จัดการการบันทึกและเรียกดูล็อก"""
-    
-    def __init__(self, log_file=LOG_FILE):
-        self.log_file = log_file
-        self._ensure_log_file()
-    
-    def _ensure_log_file(self):
-        """สร้างไฟล์ล็อกหากยังไม่มี"""
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False)
-    
-    def add_log_entry(self, log_entry):
-        """เพิ่มรายการล็อกใหม่"""
-        try:
-            logs = self.get_logs()
-            logs.append(log_entry)
-            
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump(logs, f, ensure_ascii=False, indent=2)
-                
-            return True
-        except Exception as e:
-            print(f"Error adding log entry: {str(e)}")
-            return False
-    
-    def get_logs(self):
-        """อ่านล็อกทั้งหมด"""
-        try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error reading logs: {str(e)}")
-            return []
-    
-    def get_logs_by_date(self, date):
-        """อ่านล็อกตามวันที่"""
-        logs = self.get_logs()
-        date_str = date.toString("yyyy-MM-dd")
-        
-        filtered_logs = []
-        for log in logs:
-            log_date = log['timestamp'].split('T')[0]
-            if log_date == date_str:
-                filtered_logs.append(log)
-                
-        return filtered_logs
+# เกณฑ์สีของแถบ CPU/RAM (เปอร์เซ็นต์): ต่ำกว่า WARNING เป็นสีเขียว, ต่ำกว่า CRITICAL เป็นสีส้ม, นอกนั้นสีแดง
+USAGE_WARNING_PERCENT = 60
+USAGE_CRITICAL_PERCENT = 85
+USAGE_CHUNK_STYLES = {
+    "normal": "QProgressBar::chunk { background-color: green; }",
+    "warning": "QProgressBar::chunk { background-color: orange; }",
+    "error": "QProgressBar::chunk { background-color: red; }"
+}
 
+def usage_level(percent):
+    """ระดับการใช้งานสำหรับเลือกสีแถบ ("normal", "warning" หรือ "error")"""
+    if percent < USAGE_WARNING_PERCENT:
+        return "normal"
+    if percent < USAGE_CRITICAL_PERCENT:
+        return "warning"
+    return "error"
 
 class NotificationManager:
     """จัดการการแจ้งเตือนบน Windows"""
     
     def __init__(self):
-        self.toaster = ToastNotifier()
+        self._toaster = None  # สร้างเมื่อแจ้งเตือนครั้งแรก เพื่อไม่ให้การนำเข้า win10toast ทำให้เปิดโปรแกรมช้า
+    
+    def _get_toaster(self):
+        if self._toaster is None:
+            try:
+                from win10toast import ToastNotifier
+                self._toaster = ToastNotifier()
+            except ImportError:
+                self._toaster = False  # ไม่ใช่ Windows: แจ้งเตือนผ่าน System Tray อย่างเดียว
+        return self._toaster or None
     
     def show_notification(self, title, message, duration=NOTIFICATION_DURATION):
         """แสดงการแจ้งเตือนบน Windows"""
+        toaster = self._get_toaster()
+        if toaster is None:
+            return False
         try:
-            self.toaster.show_toast(
+            toaster.show_toast(
                 title,
                 message,
                 icon_path=APP_ICON,  # ใช้ไอคอนแอพ
@@ -374,126 +118,262 @@ class NotificationManager:
             return False
 
 
+class HDMIMonitor(QThread):
+    """
+    เธรดสำหรับการตรวจสอบสถานะ HDMI และไดรเวอร์การ์ดจอ
+    ส่งผลของ HDMIMonitorCore ออกเป็นสัญญาณ Qt
+    """
+    update_signal = pyqtSignal(dict)
+    log_signal = pyqtSignal(dict)
+    notification_signal = pyqtSignal(str, str)  # สัญญาณสำหรับการแจ้งเตือน (หัวข้อ, ข้อความ)
+    
+    def __init__(self, parent=None, **kwargs):
+        super(HDMIMonitor, self).__init__(parent)
+        self.core = HDMIMonitorCore(on_status=self.update_signal.emit, on_event=self._on_event,
+                                    on_error=self._on_error, **kwargs)
+        
+    def run(self):
+        self.core.run()
+    
+    def _on_event(self, log_entry):
+        self.log_signal.emit(log_entry)
+        # ส่งการแจ้งเตือนเมื่อมีการเปลี่ยนแปลงสถานะ
+        self.notification_signal.emit("การแจ้งเตือนสถานะ HDMI", notification_message(log_entry))
+    
+    def _on_error(self, error_msg):
+        self.notification_signal.emit("เกิดข้อผิดพลาด", error_msg)
+    
+    def check_hdmi_status(self):
+        """ตรวจสอบสถานะการเชื่อมต่อ HDMI และไดรเวอร์การ์ดจอ"""
+        return self.core.check_hdmi_status()
+    
+    def poll_metrics(self):
+        """สถิติอัตราการตรวจสอบ HDMI"""
+        return self.core.poll_metrics()
+    
+    def stop(self):
+        self.core.stop()
+
+
 class SystemMonitor(QThread):
-    """เธรดสำหรับการตรวจสอบสถานะระบบ (CPU, RAM, GPU)"""
+    """เธรดสำหรับการตรวจสอบสถานะระบบ (CPU, RAM, GPU) ส่งผลของ SystemMonitorCore ออกเป็นสัญญาณ Qt"""
     
     update_signal = pyqtSignal(dict)
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, **kwargs):
         super(SystemMonitor, self).__init__(parent)
-        self.running = True
-        self.interval = SYSTEM_CHECK_INTERVAL
+        self.core = SystemMonitorCore(on_status=self.update_signal.emit, **kwargs)
         
     def run(self):
-        while self.running:
-            try:
-                status = self.check_system_status()
-                self.update_signal.emit(status)
-                time.sleep(self.interval)
-            except Exception as e:
-                print(f"Error in system monitoring thread: {str(e)}")
-                time.sleep(self.interval)
+        self.core.run()
     
     def check_system_status(self):
         """ตรวจสอบสถานะ CPU, RAM และ GPU"""
-        result = {
-            'cpu': {},
-            'memory': {},
-            'gpu': [],
-            'temperatures': {}
-        }
+        return self.core.check_system_status()
+    
+    def set_window_visible(self, visible):
+        """แจ้งว่าหน้าต่างแสดงผลอยู่หรือถูกซ่อนใน System Tray"""
+        self.core.set_window_visible(visible)
+    
+    def rolling_stats(self, windows=None):
+        """สถิติย้อนหลัง 1 นาที, 15 นาที และ 1 ชั่วโมงของค่าการใช้งาน"""
+        return self.core.rolling_stats(windows)
+    
+    def history_series(self, name, start=None, end=None, max_points=None):
+        """ค่าย้อนหลังของ name (ไม่เกิน max_points จุด) สำหรับกราฟ"""
+        return self.core.history_series(name, start, end, max_points)
+    
+    def poll_metrics(self):
+        """สถิติอัตราการตรวจสอบสถานะระบบ"""
+        return self.core.poll_metrics()
+    
+    def stop(self):
+        self.core.stop()
+
+
+class LogTableModel(QAbstractTableModel):
+    """
+    โมเดลข้อมูลของตารางล็อก
+    ข้อความในแต่ละช่องจะถูกสร้างเมื่อ QTableView ขอข้อมูลของแถวที่มองเห็นเท่านั้น
+    ตารางใช้ความสูงแถวคงที่ รายละเอียดจึงแสดงเป็นบรรทัดเดียว ส่วนข้อความเต็มแสดงใน tooltip
+    """
+    
+    HEADERS = ["เวลา", "ประเภทเหตุการณ์", "สถานะ HDMI", "รายละเอียด"]
+    
+    def __init__(self, parent=None):
+        super(LogTableModel, self).__init__(parent)
+        self._logs = []
+        self._row_cache = {}  # แถว -> ข้อความของทุกช่องที่จัดรูปแบบแล้ว
+    
+    def set_logs(self, logs):
+        """แทนที่ข้อมูลทั้งหมดของตาราง"""
+        self.beginResetModel()
+        self._logs = logs
+        self._row_cache = {}
+        self.endResetModel()
+    
+    def append_log(self, log):
+        """เพิ่มรายการล็อกต่อท้ายตารางโดยไม่ต้องโหลดข้อมูลใหม่ทั้งหมด"""
+        row = len(self._logs)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._logs.append(log)
+        self.endInsertRows()
+    
+    def log_at(self, row):
+        """คืนค่ารายการล็อกของแถวที่ระบุ"""
+        return self._logs[row]
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._logs)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super(LogTableModel, self).headerData(section, orientation, role)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
         
-        try:
-            # CPU
-            cpu_percent = psutil.cpu_percent(interval=None)
-            cpu_count = psutil.cpu_count(logical=True)
-            cpu_freq = psutil.cpu_freq()
-            
-            result['cpu'] = {
-                'percent': cpu_percent,
-                'cores': cpu_count,
-                'frequency': cpu_freq.current if cpu_freq else 0
-            }
+        if role == Qt.DisplayRole:
+            return self._format_row(index.row())[index.column()]
+        
+        if role == Qt.ToolTipRole and index.column() == 3:
+            return self._format_row(index.row())[4]
+        
+        if role == Qt.ForegroundRole and index.column() == 1:
+            event_type = self._logs[index.row()]['event_type']
+            if "ERROR" in event_type:
+                return QColor("red")
+            elif event_type == "HDMI_DISCONNECTED":
+                return QColor("red")
+            elif event_type in ("HDMI_INACTIVE", EVENT_FLAPPING):
+                return QColor("orange")
+        
+        return None
+    
+    def _format_row(self, row):
+        """
+        สร้างข้อความของทุกช่องในแถว (คำนวณครั้งเดียวต่อแถว)
+        ลำดับที่ 4 คือรายละเอียดแบบหลายบรรทัดสำหรับ tooltip
+        """
+        cells = self._row_cache.get(row)
+        if cells is None:
+            log = self._logs[row]
             
-            # Memory
-            memory = psutil.virtual_memory()
-            result['memory'] = {
-                'total': memory.total,
-                'available': memory.available,
-                'percent': memory.percent,
-                'used': memory.used
-            }
+            # เวลา (ช่อง 0)
+            timestamp = log['timestamp'].replace('T', ' ').split('.')[0]  # ตัดหน่วยไมโครวินาที
             
-            # อุณหภูมิ - ใช้ psutil แทนการใช้ WMI
-            try:
-                # ตรวจสอบว่า psutil มีข้อมูลอุณหภูมิหรือไม่
-                if hasattr(psutil, 'sensors_temperatures'):
-                    temps = psutil.sensors_temperatures()
-                    if temps:
-                        # CPU Temperature
-                        for name, entries in temps.items():
-                            if 'cpu' in name.lower() or 'coretemp' in name.lower():
-                                if entries:
-                                    result['temperatures']['cpu'] = entries[0].current
-                            elif 'acpi' in name.lower() or 'system' in name.lower() or 'motherboard' in name.lower():
-                                if entries:
-                                    result['temperatures']['mainboard'] = entries[0].current
-                else:
-                    # ถ้า psutil ไม่มีข้อมูล temperature
-                    result['temperatures']['error'] = "ไม่สามารถอ่านอุณหภูมิได้ (psutil ไม่สนับสนุนบนระบบนี้)"
-            except Exception as e:
-                result['temperatures']['error'] = f"ไม่สามารถอ่านอุณหภูมิได้: {str(e)}"
+            # สถานะ HDMI (ช่อง 2)
+            hdmi_status = "เชื่อมต่อแล้ว" if log['status']['hdmi_connected'] else "ไม่ได้เชื่อมต่อ"
+            hdmi_active = "กำลังทำงาน" if log['status']['hdmi_active'] else "ไม่ได้ทำงาน"
             
-            # GPU
-            try:
-                gpus = GPUtil.getGPUs()
-                if not gpus:
-                    # ถ้าไม่พบ GPU ให้ใช้ wmi เพื่อดึงข้อมูลการ์ดจอแทน
-                    wmi_obj = wmi.WMI()
-                    for idx, gpu in enumerate(wmi_obj.Win32_VideoController()):
-                        result['gpu'].append({
-                            'name': gpu.Name,
-                            'driver_version': gpu.DriverVersion,
-                            'driver_status': "ปกติ" if gpu.ConfigManagerErrorCode == 0 else "มีปัญหา",
-                            'status_message': self._get_error_description(gpu.ConfigManagerErrorCode)
-                        })
-                    if not result['gpu']:
-                        result['gpu'].append({'error': "ไม่พบข้อมูล GPU"})
-                else:
-                    for gpu in gpus:
-                        result['gpu'].append({
-                            'name': gpu.name,
-                            'load': gpu.load * 100,  # Convert to percentage
-                            'memory_total': gpu.memoryTotal,
-                            'memory_used': gpu.memoryUsed,
-                            'memory_percent': (gpu.memoryUsed / gpu.memoryTotal) * 100 if gpu.memoryTotal > 0 else 0,
-                            'temperature': gpu.temperature
-                        })
-            except Exception as e:
-                print(f"Error getting GPU info: {str(e)}")
-                result['gpu'].append({'error': str(e)})
-                
-        except Exception as e:
-            print(f"Error checking system status: {str(e)}")
+            details = self._format_log_details(log)
+            cells = (
+                timestamp,
+                self._format_event_type(log['event_type']),
+                f"{hdmi_status}, {hdmi_active}",
+                " | ".join(details.splitlines()),
+                details
+            )
+            self._row_cache[row] = cells
+        return cells
+    
+    def _format_event_type(self, event_type):
+        """แปลงรหัสเหตุการณ์เป็นข้อความที่อ่านง่าย"""
+        event_types = {
+            "NORMAL": "ปกติ",
+            "HDMI_DISCONNECTED": "HDMI ถูกถอด",
+            "HDMI_INACTIVE": "HDMI ไม่ทำงาน",
+            EVENT_FLAPPING: "สัญญาณไม่เสถียร"
+        }
+        
+        if event_type.startswith("GPU_ERROR_CODE_"):
+            error_code = event_type.split("_")[-1]
+            return f"การ์ดจอมีปัญหา (รหัส {error_code})"
             
-        if not result['gpu']:
-            result['gpu'].append({'error': "ไม่พบข้อมูล GPU"})
+        return event_types.get(event_type, event_type)
+    
+    def _format_log_details(self, log):
+        """สร้างข้อความรายละเอียดจากล็อก"""
+        details = ""
+        
+        # สรุปการกระพริบของสัญญาณ
+        if 'flap_count' in log:
+            if log['event_type'] == EVENT_FLAPPING:
+                details += f"สถานะเปลี่ยนไปมา {log['flap_count']} ครั้งใน {log['flap_window']} วินาที\n"
+            else:
+                details += (f"สัญญาณนิ่งแล้วหลังเปลี่ยนไปมา {log['flap_count']} ครั้ง"
+                            f" ({log['flap_duration']:.0f} วินาที)\n")
+        
+        # รายละเอียดการ์ดจอ
+        for gpu_id, gpu_data in log['status']['gpu_status'].items():
+            if gpu_data['error_code'] != 0:
+                details += f"การ์ดจอ {gpu_data['name']} มีปัญหา: {gpu_data['error_description']}\n"
+        
+        # รายละเอียดจอภาพ
+        hdmi_devices = log['status']['hdmi_devices']
+        if hdmi_devices:
+            hdmi_count = sum(1 for dev in hdmi_devices if dev['connection_type'] == CONNECTION_TYPE_HDMI)
+            details += f"พบจอ HDMI {hdmi_count} จอ, "
+            active_count = sum(1 for dev in hdmi_devices if dev['connection_type'] == CONNECTION_TYPE_HDMI and dev['active'])
+            details += f"ทำงาน {active_count} จอ"
+        else:
+            details += "ไม่พบจอภาพที่เชื่อมต่อ"
             
-        return result
+        return details
+
+
+class WidgetRenderer:
+    """
+    ส่งค่าให้วิดเจ็ตเฉพาะเมื่อค่าต่างจากครั้งก่อน
+    setText/setStyleSheet ของ Qt จะคำนวณขนาดและวาดวิดเจ็ตใหม่ทุกครั้งแม้ค่าจะเท่าเดิม
+    """
     
-    def _get_error_description(self, error_code):
-        """แปลงรหัสข้อผิดพลาดเป็นคำอธิบาย"""
-        return ERROR_CODES.get(error_code, f"ข้อผิดพลาดที่ไม่รู้จัก (รหัส {error_code})")
+    def __init__(self):
+        self._values = {}
+        self.applied = 0
+        self.skipped = 0
     
-    def stop(self):
-        self.running = False
+    def _apply(self, widget, prop, value, setter):
+        key = (id(widget), prop)
+        if key in self._values and self._values[key] == value:
+            self.skipped += 1
+            return False
+        self._values[key] = value
+        setter(value)
+        self.applied += 1
+        return True
+    
+    def set_text(self, widget, text):
+        return self._apply(widget, 'text', text, widget.setText)
+    
+    def set_style(self, widget, style):
+        return self._apply(widget, 'style', style, widget.setStyleSheet)
+    
+    def set_value(self, widget, value):
+        return self._apply(widget, 'value', value, widget.setValue)
+    
+    def set_tooltip(self, widget, text):
+        return self._apply(widget, 'tooltip', text, widget.setToolTip)
+    
+    def metrics(self):
+        return {'applied': self.applied, 'skipped': self.skipped}
 
 
 class MainWindow(QMainWindow):
     """หน้าต่างหลักของแอปพลิเคชัน"""
     
-    def __init__(self):
+    def __init__(self, report_startup=False, metrics_port=METRICS_PORT):
         super(MainWindow, self).__init__()
+        init_started = time.perf_counter()
+        # เวลาเริ่มโปรแกรม (มิลลิวินาทีนับจากเริ่มโหลด app.py) พิมพ์ออกมาเมื่อ report_startup
+        self.startup_timings = {'imports_ms': (IMPORTS_FINISHED - STARTUP_STARTED) * 1000}
+        self.report_startup = report_startup
+        self._startup_finished = False
         
         self.setWindowTitle(APP_TITLE)
         self.setMinimumSize(800, 600)
@@ -502,31 +382,88 @@ class MainWindow(QMainWindow):
         self.setWindowIcon(QIcon(APP_ICON))
         
         self.log_manager = LogManager()
+        # เขียนล็อกในเธรดเบื้องหลัง เพื่อไม่ให้หน้าต่างค้างระหว่างเขียนไฟล์
+        self.log_manager.start_background_writer()
         self.notification_manager = NotificationManager()
+        # อัปเดตวิดเจ็ตเฉพาะค่าที่เปลี่ยน และเก็บสถานะล่าสุดไว้แสดงเมื่อหน้าต่างถูกซ่อน
+        self.renderer = WidgetRenderer()
+        self._pending_status = None
+        self._pending_system_status = None
         self.init_ui()
         
         # ตั้งค่า System Tray
         self.setup_system_tray()
         
         # เริ่มการตรวจสอบ HDMI
-        self.hdmi_monitor = HDMIMonitor()
+        # ตัวตรวจสอบฮาร์ดแวร์ที่ใช้ร่วมกัน (การเชื่อมต่อ WMI แยกตามเธรดภายใน)
+        self.probe_backend = create_probe_backend(PROBE_BACKEND)
+        # อ่านข้อมูลฮาร์ดแวร์ในเธรดเดียว และแบ่งผลลัพธ์ให้ทั้งสองเธรดตรวจสอบ
+        self.sampler = create_hardware_sampler(self.probe_backend, deadline=PROBE_DEADLINE)
+        
+        # ประวัติค่าการใช้งานและสถานะ HDMI สร้างใน finish_startup (numpy ใช้เวลานำเข้านาน)
+        self.metric_history = None
+        
+        # /metrics ให้บริการจากผลตรวจสอบล่าสุด (เริ่ม HTTP server ใน finish_startup)
+        self.metrics_port = metrics_port
+        self.metrics_cache = None
+        self.metrics_exporter = None
+        
+        event_source = create_event_source(self.probe_backend)
+        self.hdmi_monitor = HDMIMonitor(backend=self.probe_backend, event_source=event_source,
+                                        sampler=self.sampler)
         self.hdmi_monitor.update_signal.connect(self.update_status)
         self.hdmi_monitor.log_signal.connect(self.add_log_entry)
         self.hdmi_monitor.notification_signal.connect(self.show_notification)
-        self.hdmi_monitor.start()
         
         # เริ่มการตรวจสอบระบบ (CPU, RAM, GPU)
-        self.system_monitor = SystemMonitor()
+        self.system_monitor = SystemMonitor(backend=self.probe_backend, sampler=self.sampler)
         self.system_monitor.update_signal.connect(self.update_system_status)
-        self.system_monitor.start()
         
         # ตั้งเวลาอัปเดตสถานะทุก 1 วินาที (สำหรับแสดงเวลาปัจจุบัน)
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_current_time)
         self.timer.start(1000)
         
-        # อัปเดตรายการล็อกเมื่อเริ่มต้น
+        # การโหลดประวัติล็อกและการเริ่มเธรดตรวจสอบทำหลังหน้าต่างแสดงผลครั้งแรก (finish_startup)
+        self.startup_timings['window_init_ms'] = (time.perf_counter() - init_started) * 1000
+    
+    def paintEvent(self, event):
+        super(MainWindow, self).paintEvent(event)
+        if not self._startup_finished:
+            self._startup_finished = True
+            self.startup_timings['first_paint_ms'] = (time.perf_counter() - STARTUP_STARTED) * 1000
+            # ทำงานที่เหลือต่อหลังวาดหน้าต่างเสร็จ
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """โหลดประวัติล็อกของวันนี้และเริ่มเธรดตรวจสอบ (เรียกครั้งเดียวหลังแสดงหน้าต่างครั้งแรก)"""
+        started = time.perf_counter()
         self.update_log_view(QDate.currentDate())
+        from metric_history import MetricHistory
+        self.metric_history = MetricHistory(path=METRIC_HISTORY_FILE)
+        self.metric_history.load()
+        self.hdmi_monitor.core.history = self.metric_history
+        self.system_monitor.core.history = self.metric_history
+        if self.metrics_port:
+            self.start_metrics_exporter()
+        self.hdmi_monitor.start()
+        self.system_monitor.start()
+        self.startup_timings['deferred_init_ms'] = (time.perf_counter() - started) * 1000
+        self.startup_timings['ready_ms'] = (time.perf_counter() - STARTUP_STARTED) * 1000
+        
+        if self.report_startup:
+            print(json.dumps(self.startup_timings), flush=True)
+            self.close_application()
+    
+    def start_metrics_exporter(self):
+        """เปิด HTTP /metrics (Prometheus/OpenMetrics) ที่ METRICS_HOST:metrics_port"""
+        from metrics_exporter import MetricsCache, MetricsExporter
+        try:
+            self.metrics_cache = MetricsCache()
+            self.metrics_exporter = MetricsExporter(self.metrics_cache, METRICS_HOST, self.metrics_port).start()
+        except OSError as e:
+            print(f"Cannot start metrics exporter on port {self.metrics_port}: {str(e)}")
+            self.metrics_cache = None
     
     def setup_system_tray(self):
         """ตั้งค่า System Tray Icon"""
@@ -572,7 +509,7 @@ class MainWindow(QMainWindow):
         self.notification_manager.show_notification(title, message)
         
         # อัปเดตข้อความใน System Tray
-        self.tray_icon.setToolTip(f"{title}: {message}")
+        self.renderer.set_tooltip(self.tray_icon, f"{title}: {message}")
         
         # แสดงการแจ้งเตือนใน System Tray
         if self.isHidden():
@@ -711,6 +648,21 @@ class MainWindow(QMainWindow):
         
         self.system_layout.addWidget(gpu_monitor_group)
         
+        # สถิติย้อนหลัง
+        history_group = QWidget()
+        history_layout = QVBoxLayout()
+        history_group.setLayout(history_layout)
+        
+        history_header = QLabel("สถิติย้อนหลัง (ต่ำสุด / สูงสุด / เฉลี่ย / p95):")
+        history_header.setFont(QFont("Arial", 12, QFont.Bold))
+        history_layout.addWidget(history_header)
+        
+        self.history_stats_text = QTextEdit()
+        self.history_stats_text.setReadOnly(True)
+        history_layout.addWidget(self.history_stats_text)
+        
+        self.system_layout.addWidget(history_group)
+        
         # สถานะ HDMI
         hdmi_group = QWidget()
         hdmi_layout = QVBoxLayout()
@@ -787,40 +739,64 @@ class MainWindow(QMainWindow):
         self.log_layout.addWidget(date_group)
         
         # ตารางแสดงล็อก
-        self.log_table = QTableWidget()
-        self.log_table.setColumnCount(4)
-        self.log_table.setHorizontalHeaderLabels(["เวลา", "ประเภทเหตุการณ์", "สถานะ HDMI", "รายละเอียด"])
+        self.log_model = LogTableModel(self)
+        self.log_view_date = None  # วันที่ของข้อมูลที่แสดงอยู่ในตารางล็อก
+        self.log_table = QTableView()
+        self.log_table.setModel(self.log_model)
         self.log_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        # ความสูงแถวคงที่ ไม่ต้องคำนวณขนาดจากข้อมูลทุกแถว (ข้อความยาวถูกย่อด้วย "..." แทนการตัดบรรทัด)
+        self.log_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.log_table.setWordWrap(False)
+        self.log_table.setTextElideMode(Qt.ElideRight)
+        self.log_table.setSelectionBehavior(QTableView.SelectRows)
         self.log_layout.addWidget(self.log_table)
     
     def update_current_time(self):
         """อัปเดตเวลาปัจจุบันในอินเตอร์เฟซ"""
+        if not self._is_window_shown():
+            return
         try:
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.time_label.setText(f"เวลาปัจจุบัน: {current_time}")
+            self.renderer.set_text(self.time_label, f"เวลาปัจจุบัน: {current_time}")
         except KeyboardInterrupt:
             # จัดการกับ KeyboardInterrupt ที่อาจเกิดขึ้น
             print("ได้รับ KeyboardInterrupt ในการอัปเดตเวลา")
         except Exception as e:
             print(f"เกิดข้อผิดพลาดในการอัปเดตเวลา: {str(e)}")
     
+    def _is_window_shown(self):
+        """หน้าต่างแสดงอยู่บนจอหรือไม่ (ซ่อนไว้ใน System Tray หรือย่อไว้ถือว่าไม่แสดง)"""
+        return self.isVisible() and not self.isMinimized()
+    
     def update_status(self, status):
         """อัปเดตการแสดงผลสถานะ"""
         try:
+            if self.metrics_cache is not None:
+                self.metrics_cache.set_hdmi_status(status)
+            
+            # ข้อความใน System Tray ต้องถูกต้องเสมอ แม้หน้าต่างจะถูกซ่อน
+            self._update_tray_tooltip(status)
+            
+            if not self._is_window_shown():
+                # เก็บไว้แสดงเมื่อเปิดหน้าต่าง (showEvent)
+                self._pending_status = status
+                return
+            self._pending_status = None
+            
             # อัปเดตสถานะ HDMI
             if status['hdmi_connected']:
-                self.hdmi_status_label.setText(f"สถานะการเชื่อมต่อ HDMI: {STATUS_ICONS['normal']} เชื่อมต่อแล้ว")
-                self.hdmi_status_label.setStyleSheet("color: green;")
+                self.renderer.set_text(self.hdmi_status_label, f"สถานะการเชื่อมต่อ HDMI: {STATUS_ICONS['normal']} เชื่อมต่อแล้ว")
+                self.renderer.set_style(self.hdmi_status_label, "color: green;")
             else:
-                self.hdmi_status_label.setText(f"สถานะการเชื่อมต่อ HDMI: {STATUS_ICONS['error']} ไม่ได้เชื่อมต่อ")
-                self.hdmi_status_label.setStyleSheet("color: red;")
+                self.renderer.set_text(self.hdmi_status_label, f"สถานะการเชื่อมต่อ HDMI: {STATUS_ICONS['error']} ไม่ได้เชื่อมต่อ")
+                self.renderer.set_style(self.hdmi_status_label, "color: red;")
             
             if status['hdmi_active']:
-                self.hdmi_active_label.setText(f"สถานะการทำงาน HDMI: {STATUS_ICONS['normal']} กำลังทำงาน (Active)")
-                self.hdmi_active_label.setStyleSheet("color: green;")
+                self.renderer.set_text(self.hdmi_active_label, f"สถานะการทำงาน HDMI: {STATUS_ICONS['normal']} กำลังทำงาน (Active)")
+                self.renderer.set_style(self.hdmi_active_label, "color: green;")
             else:
-                self.hdmi_active_label.setText(f"สถานะการทำงาน HDMI: {STATUS_ICONS['warning']} ไม่ได้ทำงาน (Inactive)")
-                self.hdmi_active_label.setStyleSheet("color: orange;")
+                self.renderer.set_text(self.hdmi_active_label, f"สถานะการทำงาน HDMI: {STATUS_ICONS['warning']} ไม่ได้ทำงาน (Inactive)")
+                self.renderer.set_style(self.hdmi_active_label, "color: orange;")
             
             # อัปเดตข้อมูลการ์ดจอ
             gpu_info = ""
@@ -849,7 +825,7 @@ class MainWindow(QMainWindow):
                     gpu_info += f"วันที่ไดรเวอร์: {gpu_data['driver_date']}\n"
                 gpu_info += "\n"
             
-            self.gpu_status_text.setText(gpu_info)
+            self.renderer.set_text(self.gpu_status_text, gpu_info)
             
             # อัปเดตข้อมูลจอภาพทั้งหมด
             monitor_info = ""
@@ -875,29 +851,30 @@ class MainWindow(QMainWindow):
             if not monitor_info:
                 monitor_info = "ไม่พบจอภาพที่เชื่อมต่อ"
             
-            self.monitor_info_text.setText(monitor_info)
-            
-            # อัปเดตข้อความใน System Tray
-            tray_tooltip = f"{APP_TITLE}\n"
-            if status['hdmi_connected']:
-                tray_tooltip += "HDMI: เชื่อมต่อแล้ว"
-                if status['hdmi_active']:
-                    tray_tooltip += ", กำลังทำงาน"
-                else:
-                    tray_tooltip += ", ไม่ได้ทำงาน"
-            else:
-                tray_tooltip += "HDMI: ไม่ได้เชื่อมต่อ"
-            
-            if 'driver_check_time' in status:
-                tray_tooltip += f"\nตรวจสอบไดรเวอร์ล่าสุด: {status['driver_check_time'].split('T')[1].split('.')[0]}"
-            
-            self.tray_icon.setToolTip(tray_tooltip)
+            self.renderer.set_text(self.monitor_info_text, monitor_info)
             
         except Exception as e:
             error_msg = f"เกิดข้อผิดพลาดในการอัปเดตสถานะ: {str(e)}"
             print(error_msg)
-            self.gpu_status_text.setText(error_msg)
-            self.monitor_info_text.setText(error_msg)
+            self.renderer.set_text(self.gpu_status_text, error_msg)
+            self.renderer.set_text(self.monitor_info_text, error_msg)
+    
+    def _update_tray_tooltip(self, status):
+        """อัปเดตข้อความใน System Tray"""
+        tray_tooltip = f"{APP_TITLE}\n"
+        if status['hdmi_connected']:
+            tray_tooltip += "HDMI: เชื่อมต่อแล้ว"
+            if status['hdmi_active']:
+                tray_tooltip += ", กำลังทำงาน"
+            else:
+                tray_tooltip += ", ไม่ได้ทำงาน"
+        else:
+            tray_tooltip += "HDMI: ไม่ได้เชื่อมต่อ"
+        
+        if 'driver_check_time' in status:
+            tray_tooltip += f"\nตรวจสอบไดรเวอร์ล่าสุด: {status['driver_check_time'].split('T')[1].split('.')[0]}"
+        
+        self.renderer.set_tooltip(self.tray_icon, tray_tooltip)
     
     def _get_connection_type_name(self, type_code):
         """แปลงรหัสประเภทการเชื่อมต่อเป็นชื่อ"""
@@ -907,10 +884,10 @@ class MainWindow(QMainWindow):
         """เพิ่มรายการล็อกใหม่และอัปเดตการแสดงผลหากจำเป็น"""
         self.log_manager.add_log_entry(log_entry)
         
-        # อัปเดตหน้าแสดงล็อกหากเป็นวันนี้
+        # เพิ่มแถวในตารางโดยตรงหากเป็นวันที่กำลังแสดงอยู่ (ไม่ต้องอ่านไฟล์ล็อกใหม่)
         log_date = QDate.fromString(log_entry['timestamp'].split('T')[0], "yyyy-MM-dd")
-        if log_date == self.date_selector.date():
-            self.update_log_view(log_date)
+        if log_date == self.log_view_date:
+            self.log_model.append_log(log_entry)
     
     def date_changed(self, date):
         """จัดการเมื่อมีการเลือกวันที่ใหม่"""
@@ -919,76 +896,14 @@ class MainWindow(QMainWindow):
     def update_log_view(self, date):
         """อัปเดตการแสดงรายการล็อกตามวันที่"""
         logs = self.log_manager.get_logs_by_date(date)
-        
-        self.log_table.setRowCount(0)  # ล้างข้อมูลเดิม
-        
-        for log in logs:
-            row_position = self.log_table.rowCount()
-            self.log_table.insertRow(row_position)
-            
-            # เวลา (ช่อง 0)
-            timestamp = log['timestamp'].replace('T', ' ').split('.')[0]  # ตัดหน่วยไมโครวินาที
-            self.log_table.setItem(row_position, 0, QTableWidgetItem(timestamp))
-            
-            # ประเภทเหตุการณ์ (ช่อง 1)
-            event_type = log['event_type']
-            event_cell = QTableWidgetItem(self._format_event_type(event_type))
-            if "ERROR" in event_type:
-                event_cell.setForeground(QColor("red"))
-            elif event_type == "HDMI_DISCONNECTED":
-                event_cell.setForeground(QColor("red"))
-            elif event_type == "HDMI_INACTIVE":
-                event_cell.setForeground(QColor("orange"))
-            self.log_table.setItem(row_position, 1, event_cell)
-            
-            # สถานะ HDMI (ช่อง 2)
-            hdmi_status = "เชื่อมต่อแล้ว" if log['status']['hdmi_connected'] else "ไม่ได้เชื่อมต่อ"
-            hdmi_active = "กำลังทำงาน" if log['status']['hdmi_active'] else "ไม่ได้ทำงาน"
-            hdmi_cell = QTableWidgetItem(f"{hdmi_status}, {hdmi_active}")
-            self.log_table.setItem(row_position, 2, hdmi_cell)
-            
-            # รายละเอียด (ช่อง 3)
-            details = self._format_log_details(log)
-            self.log_table.setItem(row_position, 3, QTableWidgetItem(details))
-    
-    def _format_event_type(self, event_type):
-        """แปลงรหัสเหตุการณ์เป็นข้อความที่อ่านง่าย"""
-        event_types = {
-            "NORMAL": "ปกติ",
-            "HDMI_DISCONNECTED": "HDMI ถูกถอด",
-            "HDMI_INACTIVE": "HDMI ไม่ทำงาน"
-        }
-        
-        if event_type.startswith("GPU_ERROR_CODE_"):
-            error_code = event_type.split("_")[-1]
-            return f"การ์ดจอมีปัญหา (รหัส {error_code})"
-            
-        return event_types.get(event_type, event_type)
-    
-    def _format_log_details(self, log):
-        """สร้างข้อความรายละเอียดจากล็อก"""
-        details = ""
-        
-        # รายละเอียดการ์ดจอ
-        for gpu_id, gpu_data in log['status']['gpu_status'].items():
-            if gpu_data['error_code'] != 0:
-                details += f"การ์ดจอ {gpu_data['name']} มีปัญหา: {gpu_data['error_description']}\n"
-        
-        # รายละเอียดจอภาพ
-        hdmi_devices = log['status']['hdmi_devices']
-        if hdmi_devices:
-            hdmi_count = sum(1 for dev in hdmi_devices if dev['connection_type'] == CONNECTION_TYPE_HDMI)
-            details += f"พบจอ HDMI {hdmi_count} จอ, "
-            active_count = sum(1 for dev in hdmi_devices if dev['connection_type'] == CONNECTION_TYPE_HDMI and dev['active'])
-            details += f"ทำงาน {active_count} จอ"
-        else:
-            details += "ไม่พบจอภาพที่เชื่อมต่อ"
-            
-        return details
+        # ข้อมูลของวันที่เลือกจะถูกเก็บไว้ในโมเดล จนกว่าจะเปลี่ยนวันที่
+        self.log_view_date = date
+        self.log_model.set_logs(logs)
     
     def refresh_status(self):
         """รีเฟรชสถานะทันที"""
         try:
+            self.probe_backend.inventory.invalidate()
             status = self.hdmi_monitor.check_hdmi_status()
             self.update_status(status)
             QMessageBox.information(self, "รีเฟรชสถานะ", "รีเฟรชสถานะเรียบร้อยแล้ว")
@@ -998,11 +913,20 @@ class MainWindow(QMainWindow):
     def close_application(self):
         """ปิดแอปพลิเคชัน"""
         print("กำลังปิดแอปพลิเคชัน...")
-        # หยุดการทำงานของเธรด
+        # หยุดการทำงานของเธรด (การอ่านฮาร์ดแวร์มี PROBE_DEADLINE จึงรอได้ไม่เกิน THREAD_STOP_TIMEOUT)
         self.hdmi_monitor.stop()
-        self.hdmi_monitor.wait()
         self.system_monitor.stop()
-        self.system_monitor.wait()
+        for thread in (self.hdmi_monitor, self.system_monitor):
+            if not thread.wait(THREAD_STOP_TIMEOUT * 1000):
+                print(f"{type(thread).__name__} did not stop within {THREAD_STOP_TIMEOUT}s")
+        self.sampler.close(timeout=THREAD_STOP_TIMEOUT)
+        if self.metric_history is not None:
+            self.metric_history.save()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.close()
+        
+        # เขียนล็อกที่ยังค้างอยู่ในคิวให้หมดก่อนปิดโปรแกรม
+        self.log_manager.close()
         
         # ปิด QApplication และออกจากโปรแกรม
         QApplication.quit()
@@ -1010,39 +934,38 @@ class MainWindow(QMainWindow):
     
     def update_system_status(self, status):
         """อัปเดตการแสดงผลสถานะระบบ"""
+        if self.metrics_cache is not None:
+            self.metrics_cache.set_system_status(status)
+        
+        if not self._is_window_shown():
+            # ไม่มีใครเห็นหน้าต่าง เก็บไว้แสดงเมื่อเปิดหน้าต่าง (showEvent)
+            self._pending_system_status = status
+            return
+        self._pending_system_status = None
+        
         # CPU
         cpu_percent = status['cpu'].get('percent', 0)
-        self.cpu_percent_label.setText(f"{cpu_percent:.1f}%")
-        self.cpu_progress.setValue(int(cpu_percent))
-        
-        # Set color based on CPU usage
-        if cpu_percent < 60:
-            self.cpu_progress.setStyleSheet("QProgressBar::chunk { background-color: green; }")
-        elif cpu_percent < 85:
-            self.cpu_progress.setStyleSheet("QProgressBar::chunk { background-color: orange; }")
-        else:
-            self.cpu_progress.setStyleSheet("QProgressBar::chunk { background-color: red; }")
+        self.renderer.set_text(self.cpu_percent_label, f"{cpu_percent:.1f}%")
+        self.renderer.set_value(self.cpu_progress, int(cpu_percent))
+        
+        # Set color based on CPU usage (เปลี่ยน stylesheet เฉพาะเมื่อข้ามเกณฑ์)
+        self.renderer.set_style(self.cpu_progress, USAGE_CHUNK_STYLES[usage_level(cpu_percent)])
         
         cpu_cores = status['cpu'].get('cores', 0)
         cpu_freq = status['cpu'].get('frequency', 0)
-        self.cpu_info_label.setText(f"จำนวน Core: {cpu_cores} | ความเร็ว: {cpu_freq:.0f} MHz")
+        self.renderer.set_text(self.cpu_info_label, f"จำนวน Core: {cpu_cores} | ความเร็ว: {cpu_freq:.0f} MHz")
         
         # RAM
         ram_percent = status['memory'].get('percent', 0)
-        self.ram_percent_label.setText(f"{ram_percent:.1f}%")
-        self.ram_progress.setValue(int(ram_percent))
+        self.renderer.set_text(self.ram_percent_label, f"{ram_percent:.1f}%")
+        self.renderer.set_value(self.ram_progress, int(ram_percent))
         
         # Set color based on RAM usage
-        if ram_percent < 60:
-            self.ram_progress.setStyleSheet("QProgressBar::chunk { background-color: green; }")
-        elif ram_percent < 85:
-            self.ram_progress.setStyleSheet("QProgressBar::chunk { background-color: orange; }")
-        else:
-            self.ram_progress.setStyleSheet("QProgressBar::chunk { background-color: red; }")
+        self.renderer.set_style(self.ram_progress, USAGE_CHUNK_STYLES[usage_level(ram_percent)])
         
         ram_total = status['memory'].get('total', 0) / (1024 ** 3)  # Convert to GB
         ram_used = status['memory'].get('used', 0) / (1024 ** 3)  # Convert to GB
-        self.ram_info_label.setText(f"ใช้งาน: {ram_used:.2f} GB / ทั้งหมด: {ram_total:.2f} GB")
+        self.renderer.set_text(self.ram_info_label, f"ใช้งาน: {ram_used:.2f} GB / ทั้งหมด: {ram_total:.2f} GB")
         
         # อุณหภูมิ
         temp_info = "อุณหภูมิระบบ:\n"
@@ -1082,7 +1005,62 @@ class MainWindow(QMainWindow):
             gpu_info = "ไม่พบข้อมูล GPU หรือไม่สามารถอ่านข้อมูลได้"
             
         # รวมข้อมูลอุณหภูมิและ GPU
-        self.gpu_info_text.setText(temp_info + "\n" + gpu_info)
+        self.renderer.set_text(self.gpu_info_text, temp_info + "\n" + gpu_info)
+        
+        # สถิติย้อนหลัง
+        self.renderer.set_text(self.history_stats_text,
+                               self._format_rolling_stats(self.system_monitor.rolling_stats()))
+    
+    def _format_rolling_stats(self, stats):
+        """สร้างข้อความสถิติย้อนหลังของแต่ละค่า แยกตามช่วงเวลา"""
+        text = ""
+        for window, metrics in stats.items():
+            lines = ""
+            for name, values in metrics.items():
+                if not values['samples']:
+                    continue
+                if name in HISTORY_METRIC_LABELS:
+                    label = HISTORY_METRIC_LABELS[name]
+                elif name.startswith("gpu"):
+                    # gpu0_load -> GPU #1 การใช้งาน (%)
+                    index, field = name[3:].split("_", 1)
+                    label = f"GPU #{int(index) + 1} {HISTORY_GPU_FIELD_LABELS.get(field, field)}"
+                else:
+                    continue  # สถานะ HDMI (0/1) ใช้สำหรับกราฟเท่านั้น
+                lines += (f"  {label}: {values['min']:.1f} / {values['max']:.1f} / "
+                          f"{values['mean']:.1f} / {values['p95']:.1f}\n")
+            if lines:
+                text += f"{window}:\n{lines}"
+        return text or "ยังไม่มีข้อมูลย้อนหลัง"
+    
+    def showEvent(self, event):
+        """กลับมาแสดงหน้าต่าง: ตรวจสอบสถานะระบบตามรอบปกติ และแสดงสถานะล่าสุดที่เก็บไว้"""
+        super(MainWindow, self).showEvent(event)
+        self.system_monitor.set_window_visible(True)
+        self._render_pending()
+    
+    def changeEvent(self, event):
+        """คืนขนาดหน้าต่างจากการย่อ: แสดงสถานะล่าสุดที่เก็บไว้"""
+        super(MainWindow, self).changeEvent(event)
+        if event.type() == QEvent.WindowStateChange and self._is_window_shown():
+            self._render_pending()
+    
+    def _render_pending(self):
+        """แสดงสถานะที่ได้รับระหว่างหน้าต่างถูกซ่อน"""
+        if not self.timer.isActive():
+            self.timer.start(1000)
+        self.update_current_time()
+        if self._pending_status is not None:
+            self.update_status(self._pending_status)
+        if self._pending_system_status is not None:
+            self.update_system_status(self._pending_system_status)
+    
+    def hideEvent(self, event):
+        """ซ่อนหน้าต่างไว้ใน System Tray: ไม่มีใครเห็นสถานะระบบ จึงตรวจสอบให้ห่างขึ้น"""
+        super(MainWindow, self).hideEvent(event)
+        self.system_monitor.set_window_visible(False)
+        # นาฬิกาในหน้าต่างไม่ต้องเดินระหว่างซ่อน
+        self.timer.stop()
     
     def closeEvent(self, event):
         """จัดการเมื่อปิดแอปพลิเคชัน (เมื่อคลิกปุ่ม X ที่มุมขวาบน)"""
@@ -1114,9 +1092,15 @@ def check_cec_info():
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    # --startup-timing: พิมพ์เวลาเริ่มโปรแกรมเป็น JSON แล้วปิดโปรแกรม (ใช้ตรวจสอบว่าเปิดช้าลงหรือไม่)
+    report_startup = "--startup-timing" in sys.argv[1:]
+    # --metrics-port PORT: เปิด HTTP /metrics สำหรับ Prometheus
+    metrics_port = METRICS_PORT
+    if "--metrics-port" in sys.argv[1:-1]:
+        metrics_port = int(sys.argv[sys.argv.index("--metrics-port") + 1])
     
     # ตรวจสอบว่า System Tray สามารถใช้งานได้หรือไม่
-    if not QSystemTrayIcon.isSystemTrayAvailable():
+    if not report_startup and not QSystemTrayIcon.isSystemTrayAvailable():
         QMessageBox.critical(None, "System Tray ไม่พร้อมใช้งาน",
                            "ระบบของคุณไม่รองรับ System Tray ซึ่งจำเป็นสำหรับแอปพลิเคชันนี้")
         sys.exit(1)
@@ -1138,7 +1122,7 @@ if __name__ == "__main__":
     # ลงทะเบียนตัวจัดการสัญญาณ
     signal.signal(signal.SIGINT, signal_handler)
     
-    window = MainWindow()
+    window = MainWindow(report_startup=report_startup, metrics_port=metrics_port)
     window.show()
     
     try:
@@ -1148,4 +1132,4 @@ if __name__ == "__main__":
         window.close_application()
     except Exception as e:
         print(f"เกิดข้อผิดพลาดที่ไม่คาดคิด: {str(e)}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
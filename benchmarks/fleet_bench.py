@@ -0,0 +1,147 @@
+"""
+ตัวจำลอง agent และการวัดความเร็วของ collector ในโหมดกลุ่มเครื่อง (fleet.py)
+
+    python benchmarks/fleet_bench.py                                 # วัดผล collector ในโปรเซสเดียวกัน
+    python benchmarks/fleet_bench.py --agents 2000 --events 50
+    python benchmarks/fleet_bench.py --simulate 127.0.0.1:8765       # จำลอง agent ส่งไปยัง collector ที่รันอยู่
+
+ผลลัพธ์เป็น JSON: events_per_second (เหตุการณ์ที่เขียนลงที่เก็บแล้วต่อวินาที) และ ingest_p99_ms
+(เวลาตั้งแต่ agent ส่งจนเหตุการณ์ถูกเขียนลงที่เก็บ)
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet import FleetCollector, create_fleet_store, encode_record, parse_address
+
+AGENT_CONNECT_CONCURRENCY = 200  # จำนวน agent ที่เปิดการเชื่อมต่อพร้อมกัน (เลี่ยง backlog ของ listen เต็ม)
+
+
+def simulated_status(connected, active):
+    """สถานะในรูปแบบเดียวกับ check_hdmi_status() ของเครื่องที่มีจอ HDMI หนึ่งจอ"""
+    return {
+        'hdmi_connected': connected,
+        'hdmi_active': active,
+        'hdmi_devices': [{
+            'instance_name': "DISPLAY\\SIM0001\\1&1&0&UID0_0",
+            'connection_type': 5,
+            'active': active,
+            'status': "normal"
+        }] if connected else [],
+        'gpu_status': {
+            'gpu_0': {'name': "Simulated GPU", 'status': "OK", 'driver_status': "normal", 'error_code': 0,
+                      'error_description': "อุปกรณ์ทำงานปกติ", 'driver_version': "1.0"}
+        }
+    }
+
+
+def simulated_event(connected, active):
+    """รายการ "event" แบบเดียวกับที่ MonitorDaemon ส่ง"""
+    if not connected:
+        event_type = "HDMI_DISCONNECTED"
+    elif not active:
+        event_type = "HDMI_INACTIVE"
+    else:
+        event_type = "NORMAL"
+    return {
+        'type': "event",
+        'timestamp': datetime.datetime.now().isoformat(),
+        'event_type': event_type,
+        'status': simulated_status(connected, active)
+    }
+
+
+async def simulate_agent(address, host_id, events, interval=0.0, connect_limit=None):
+    """agent จำลองหนึ่งเครื่อง: เชื่อมต่อ ส่ง hello แล้วส่งเหตุการณ์สลับสถานะ HDMI ทั้งหมด events รายการ"""
+    if connect_limit is not None:
+        async with connect_limit:
+            _, writer = await asyncio.open_connection(*address)
+    else:
+        _, writer = await asyncio.open_connection(*address)
+    writer.write(encode_record({'type': "hello", 'host': host_id, 'sent': time.time()}))
+
+    connected = True
+    for _ in range(events):
+        connected = not connected if random.random() < 0.5 else connected
+        record = simulated_event(connected, connected and random.random() < 0.9)
+        record['host'] = host_id
+        record['sent'] = time.time()
+        writer.write(encode_record(record))
+        await writer.drain()
+        if interval:
+            await asyncio.sleep(interval * random.uniform(0.5, 1.5))
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_agents(address, agents, events, interval=0.0):
+    connect_limit = asyncio.Semaphore(AGENT_CONNECT_CONCURRENCY)
+    await asyncio.gather(*(simulate_agent(address, f"sim-{i:05d}", events, interval, connect_limit)
+                           for i in range(agents)))
+
+
+async def run_benchmark(agents=1000, events=100, interval=0.0, storage="sqlite", batch_size=None):
+    """รัน collector และ agent จำลองในโปรเซสเดียวกัน แล้วคืนผลการวัด"""
+    directory = tempfile.mkdtemp(prefix="fleet-bench-")
+    path = os.path.join(directory, "fleet_events.db" if storage == "sqlite" else "fleet_events.jsonl")
+    kwargs = {'batch_size': batch_size} if batch_size else {}
+    collector = FleetCollector(create_fleet_store(storage, path), **kwargs)
+    address = await collector.start("127.0.0.1", 0)
+
+    total = agents * events
+    started = time.perf_counter()
+    await run_agents(address, agents, events, interval)
+    while collector.events_written + collector.write_errors < total:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await collector.close()
+
+    stats = collector.stats()
+    return {
+        'agents': agents,
+        'events_per_agent': events,
+        'storage': storage,
+        'events': stats['events_written'],
+        'hosts': stats['hosts'],
+        'batches': stats['batches'],
+        'seconds': elapsed,
+        'events_per_second': stats['events_written'] / elapsed,
+        'ingest_p50_ms': stats['ingest_p50_ms'],
+        'ingest_p99_ms': stats['ingest_p99_ms']
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fleet collector agent simulator and throughput benchmark")
+    parser.add_argument("--agents", type=int, default=1000, help="number of concurrent agent connections")
+    parser.add_argument("--events", type=int, default=100, help="events sent by each agent")
+    parser.add_argument("--interval", type=float, default=0.0, help="mean seconds between events of one agent")
+    parser.add_argument("--storage", choices=("sqlite", "jsonl"), default="sqlite")
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--simulate", metavar="HOST:PORT",
+                        help="only run the simulated agents against a running collector")
+    args = parser.parse_args(argv)
+
+    if args.simulate:
+        started = time.perf_counter()
+        asyncio.run(run_agents(parse_address(args.simulate), args.agents, args.events, args.interval))
+        elapsed = time.perf_counter() - started
+        result = {'agents': args.agents, 'events': args.agents * args.events, 'seconds': elapsed,
+                  'events_per_second': args.agents * args.events / elapsed}
+    else:
+        result = asyncio.run(run_benchmark(args.agents, args.events, args.interval, args.storage, args.batch_size))
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
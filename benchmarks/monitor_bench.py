@@ -0,0 +1,341 @@
+"""
+วัดความเร็วของเส้นทางที่ทำงานบ่อยของการตรวจสอบและการบันทึกล็อก บน Linux โดยใช้โมดูล wmi, GPUtil
+และ pythoncom จำลองจาก tests/fakes.py (ส่งเข้า WindowsProbeBackend/WMIConnectionPool แทนโมดูลจริง)
+
+    python benchmarks/monitor_bench.py                      # วัดทั้งหมด ล็อก 1k/100k/1M รายการ
+    python benchmarks/monitor_bench.py --sizes 1000 100000
+    python benchmarks/monitor_bench.py --save-baseline      # บันทึกผลเป็น baseline
+    python benchmarks/monitor_bench.py --check              # เทียบกับ baseline (exit 1 หากช้าลงเกิน --tolerance)
+
+สิ่งที่วัด:
+- check_hdmi_status() ทั้งแบบอ่านตรงและอ่านผ่าน HardwareSampler, check_system_status()
+- LogManager.add_log_entry() (เขียนทันทีและผ่านเธรดเขียนล็อก) และ get_logs_by_date() เมื่อมีล็อก N รายการ
+- MainWindow.update_log_view() พร้อมวาดตาราง และ LogTableModel._format_log_details() บน Qt แบบ offscreen
+ค่าที่ลงท้ายด้วย _per_second ยิ่งมากยิ่งดี ค่าอื่น (_us, _ms) ยิ่งน้อยยิ่งดี
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "tests"))  # โมดูลจำลองใช้ร่วมกับชุดทดสอบ (tests/fakes.py)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from hw_probes import CONNECTION_TYPE_HDMI, get_error_description
+from monitor_core import HDMIMonitorCore, SystemMonitorCore, LogManager, LOG_STORAGE, create_hardware_sampler
+from fakes import FakeGPUtil, create_fake_backend
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "monitor_bench_baseline.json")
+LOG_SIZES = (1000, 100000, 1000000)
+LOG_DAYS = 30  # กระจายล็อกทั้งหมดในช่วง 30 วันล่าสุด (วันก่อนหน้าถูกย้ายไปเก็บถาวรตามการหมุนไฟล์ปกติ)
+LOG_POPULATE_BATCH = 10000  # จำนวนรายการต่อการเขียนหนึ่งครั้งขณะเตรียมข้อมูล
+PROBE_REPEAT = 2000  # จำนวนรอบของการวัด check_hdmi_status/check_system_status
+LOG_ADD_REPEAT = 1000  # จำนวนรอบของการวัด add_log_entry
+LOG_READ_REPEAT = 5  # จำนวนรอบของการวัด get_logs_by_date/update_log_view
+BASELINE_TOLERANCE = 1.5  # ช้าลงเกิน 1.5 เท่าของ baseline ถือว่าถดถอย
+COMPARE_SKIP_SUFFIXES = (".mean_us", ".p99_us", ".day_entries")
+
+
+def summarize(samples):
+    """ค่าเฉลี่ย, p50 และ p99 (ไมโครวินาที) ของเวลาที่วัดได้ (วินาที)"""
+    samples = sorted(samples)
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1e6
+
+    return {'mean_us': sum(samples) / len(samples) * 1e6, 'p50_us': percentile(50), 'p99_us': percentile(99)}
+
+
+def measure(func, repeat, warmup=10):
+    """เรียก func ซ้ำ repeat ครั้ง และคืนสรุปเวลาของแต่ละครั้ง"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def best_ms(func, repeat):
+    """เวลาที่ดีที่สุด (มิลลิวินาที) จากการเรียก func ซ้ำ repeat ครั้ง และผลลัพธ์ของครั้งสุดท้าย"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def bench_probes(repeat=PROBE_REPEAT):
+    """เวลาของ check_hdmi_status (อ่านตรง/ผ่าน sampler) และ check_system_status"""
+    results = {}
+    backend = create_fake_backend(gputil_module=FakeGPUtil(random_readings=True))
+
+    hdmi = HDMIMonitorCore(backend=backend)
+    for key, value in measure(hdmi.check_hdmi_status, repeat).items():
+        results[f"check_hdmi_status.{key}"] = value
+
+    sampler = create_hardware_sampler(backend)
+    try:
+        hdmi = HDMIMonitorCore(backend=backend, sampler=sampler)
+        for key, value in measure(hdmi.check_hdmi_status, repeat).items():
+            results[f"check_hdmi_status_sampler.{key}"] = value
+    finally:
+        sampler.close(timeout=5)
+
+    system = SystemMonitorCore(backend=backend)
+    for key, value in measure(system.check_system_status, repeat).items():
+        results[f"check_system_status.{key}"] = value
+    return results
+
+
+def make_status(connected, active, gpu_error_code=0):
+    """สถานะรูปแบบเดียวกับ check_hdmi_status()"""
+    return {
+        'hdmi_connected': connected,
+        'hdmi_active': active,
+        'hdmi_devices': [{
+            'instance_name': "DISPLAY\\BENCH01\\1&1&0&UID0_0",
+            'connection_type': CONNECTION_TYPE_HDMI,
+            'active': active,
+            'status': "normal"
+        }] if connected else [],
+        'gpu_status': {
+            'gpu_0': {'name': "Bench GPU", 'status': "OK" if gpu_error_code == 0 else "Error",
+                      'error_code': gpu_error_code, 'driver_version': "31.0.15.0000",
+                      'driver_status': "normal" if gpu_error_code == 0 else "error",
+                      'error_description': get_error_description(gpu_error_code)}
+        },
+        'driver_check_time': datetime.datetime.now().isoformat()
+    }
+
+
+def make_log_entry(timestamp, rng):
+    """รายการล็อกสุ่มตามสัดส่วนเหตุการณ์ที่พบบ่อย (ส่วนใหญ่ปกติ บางครั้งถูกถอด/ไม่ทำงาน/การ์ดจอมีปัญหา)"""
+    roll = rng.random()
+    if roll < 0.6:
+        event_type, status = "NORMAL", make_status(True, True)
+    elif roll < 0.8:
+        event_type, status = "HDMI_DISCONNECTED", make_status(False, False)
+    elif roll < 0.95:
+        event_type, status = "HDMI_INACTIVE", make_status(True, False)
+    else:
+        event_type, status = "GPU_ERROR_CODE_43", make_status(True, True, gpu_error_code=43)
+    status['driver_check_time'] = timestamp
+    return {'timestamp': timestamp, 'status': status, 'event_type': event_type}
+
+
+def generate_logs(count, days=LOG_DAYS, seed=1):
+    """สร้างล็อก count รายการ เรียงตามเวลา กระจายในช่วง days วันที่สิ้นสุดตอนนี้ (ทีละชุด)"""
+    rng = random.Random(seed)
+    end = datetime.datetime.now()
+    start = end - datetime.timedelta(days=days)
+    step = (end - start) / count
+    batch = []
+    for i in range(count):
+        batch.append(make_log_entry((start + step * i).isoformat(), rng))
+        if len(batch) == LOG_POPULATE_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def create_log_manager(directory, storage):
+    log_file = os.path.join(directory, "hdmi_monitor_log.db" if storage == "sqlite" else "hdmi_monitor_log.jsonl")
+    return LogManager(log_file=log_file, storage=storage,
+                      legacy_log_file=os.path.join(directory, "hdmi_monitor_log.json"),
+                      archive_dir=os.path.join(directory, "log_archive"))
+
+
+def populate(log_manager, count):
+    """เขียนล็อก count รายการลงที่เก็บ (เขียนทีละชุดผ่าน store เพื่อให้เตรียมข้อมูลได้เร็ว)"""
+    store = log_manager.store
+    append_many = getattr(store, 'append_many', None)
+    for batch in generate_logs(count):
+        if append_many is not None:
+            append_many(batch)
+        else:
+            for log_entry in batch:
+                store.append(log_entry)
+
+
+class LogViewHost:
+    """ส่วนของ MainWindow ที่ update_log_view ใช้ (log_manager และ log_model)"""
+
+    def __init__(self, log_manager, log_model):
+        self.log_manager = log_manager
+        self.log_model = log_model
+        self.log_view_date = None
+
+
+class QtLogView:
+    """ตารางล็อกของหน้าต่างหลักบน Qt แบบ offscreen (QTableView + LogTableModel)"""
+
+    def __init__(self):
+        import app
+        from PyQt5.QtWidgets import QApplication, QTableView
+
+        self.app_module = app
+        self.qt_app = QApplication.instance() or QApplication(sys.argv[:1])
+        self.model = app.LogTableModel()
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.resize(1000, 600)
+        self.view.show()
+
+    def update_log_view(self, log_manager, date):
+        """MainWindow.update_log_view แล้ววาดแถวที่มองเห็น คืนค่าจำนวนแถว"""
+        host = LogViewHost(log_manager, self.model)
+        self.app_module.MainWindow.update_log_view(host, date)
+        self.qt_app.processEvents()
+        self.view.viewport().grab()
+        return self.model.rowCount()
+
+    def format_details_per_second(self, logs):
+        format_details = self.model._format_log_details
+        started = time.perf_counter()
+        for log in logs:
+            format_details(log)
+        return len(logs) / (time.perf_counter() - started)
+
+
+def bench_logs(size, storage=LOG_STORAGE, qt_view=None, repeat=LOG_READ_REPEAT):
+    """เวลาของ add_log_entry และ get_logs_by_date เมื่อที่เก็บมีล็อก size รายการ (และตารางล็อกหากระบุ qt_view)"""
+    results = {}
+    prefix = f"logs_{size}"
+    directory = tempfile.mkdtemp(prefix="monitor-bench-")
+    try:
+        log_manager = create_log_manager(directory, storage)
+        started = time.perf_counter()
+        populate(log_manager, size)
+        results[f"{prefix}.populate_per_second"] = size / (time.perf_counter() - started)
+
+        today = datetime.date.today()
+        archived_day = today - datetime.timedelta(days=LOG_DAYS // 2)
+        elapsed, logs = best_ms(lambda: log_manager.get_logs_by_date(archived_day), repeat)
+        results[f"{prefix}.get_logs_by_date_archived_ms"] = elapsed
+        results[f"{prefix}.day_entries"] = len(logs)
+        elapsed, logs = best_ms(lambda: log_manager.get_logs_by_date(today), repeat)
+        results[f"{prefix}.get_logs_by_date_today_ms"] = elapsed
+
+        if qt_view is not None:
+            from PyQt5.QtCore import QDate
+            qdate = QDate(today.year, today.month, today.day)
+            results[f"{prefix}.update_log_view_ms"], _ = best_ms(
+                lambda: qt_view.update_log_view(log_manager, qdate), repeat)
+            results[f"{prefix}.format_log_details_per_second"] = max(
+                qt_view.format_details_per_second(logs) for _ in range(repeat))
+
+        rng = random.Random(size)
+        entries = [make_log_entry(datetime.datetime.now().isoformat(), rng) for _ in range(LOG_ADD_REPEAT)]
+        entry_iter = iter(entries)
+        for key, value in measure(lambda: log_manager.add_log_entry(next(entry_iter)),
+                                  LOG_ADD_REPEAT - 10).items():
+            results[f"{prefix}.add_log_entry.{key}"] = value
+
+        # โหมดหน้าต่าง: add_log_entry ส่งเข้าคิวของเธรดเขียนล็อก
+        log_manager.start_background_writer()
+        entry_iter = iter(entries)
+        for key, value in measure(lambda: log_manager.add_log_entry(next(entry_iter)),
+                                  LOG_ADD_REPEAT - 10).items():
+            results[f"{prefix}.add_log_entry_background.{key}"] = value
+        log_manager.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count()
+    }
+
+
+def compare(results, baseline, tolerance=BASELINE_TOLERANCE):
+    """
+    รายการค่าที่แย่กว่า baseline เกิน tolerance เท่า: (ชื่อ, baseline, ค่าปัจจุบัน, อัตราส่วน)
+    ไม่เทียบค่าเฉลี่ยและ p99 (แกว่งมากตามภาระของเครื่อง) และจำนวนรายการ (day_entries)
+    """
+    regressions = []
+    for name, expected in baseline.items():
+        value = results.get(name)
+        if value is None or not expected or name.endswith(COMPARE_SKIP_SUFFIXES):
+            continue
+        ratio = expected / value if name.endswith("_per_second") else value / expected
+        if ratio > tolerance:
+            regressions.append((name, expected, value, ratio))
+    return regressions
+
+
+def run_benchmarks(sizes=LOG_SIZES, storage=LOG_STORAGE, qt=True):
+    results = bench_probes()
+    qt_view = QtLogView() if qt else None
+    for size in sizes:
+        results.update(bench_logs(size, storage, qt_view))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the monitoring and logging hot paths with fake hardware")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(LOG_SIZES),
+                        help="number of stored log entries for each log benchmark")
+    parser.add_argument("--storage", choices=("jsonl", "sqlite", "json"), default=LOG_STORAGE)
+    parser.add_argument("--no-qt", action="store_true", help="skip the log table benchmarks")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--check", action="store_true",
+                        help="exit with status 1 if any result regressed beyond --tolerance")
+    parser.add_argument("--tolerance", type=float, default=BASELINE_TOLERANCE,
+                        help="allowed slowdown factor against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.storage, qt=not args.no_qt)
+    report = {'machine': machine_info(), 'storage': args.storage, 'results': results}
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.check:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read baseline {args.baseline}: {str(e)}")
+            return 2
+        if baseline.get('machine') != report['machine']:
+            print("Warning: baseline was recorded on a different machine")
+        expected = baseline.get('results', {})
+        if baseline.get('storage') != args.storage:
+            print(f"Baseline used {baseline.get('storage')} log storage; comparing only the probe results")
+            expected = {name: value for name, value in expected.items() if not name.startswith("logs_")}
+        regressions = compare(results, expected, args.tolerance)
+        for name, expected, value, ratio in regressions:
+            print(f"REGRESSION {name}: {value:.3f} vs baseline {expected:.3f} ({ratio:.2f}x worse)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.2f}x of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
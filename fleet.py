@@ -0,0 +1,357 @@
+"""
+โหมดกลุ่มเครื่อง (fleet) ของ HDMI Monitor: agent บนแต่ละเครื่องส่งเหตุการณ์ไปยัง collector ตัวกลาง
+
+    python app.py --daemon --collector HOST:PORT      # agent (โหมด daemon ที่ส่งเหตุการณ์ไปยัง collector ด้วย)
+    python fleet.py --listen 0.0.0.0:8765              # collector
+
+โปรโตคอลเป็น JSON หนึ่งบรรทัดต่อรายการผ่าน TCP (รูปแบบเดียวกับผลลัพธ์ของโหมด daemon)
+agent ส่ง {"type": "hello", "host": ...} เมื่อเชื่อมต่อ ตามด้วยรายการ "event" (และ "status"/"system"/"stats" ถ้าเปิดไว้)
+และ "heartbeat" เมื่อไม่มีรายการอื่นนานเกิน FLEET_HEARTBEAT_INTERVAL ทุกรายการมี "sent" (epoch วินาที) ที่ agent ส่ง
+"""
+import sys
+import json
+import time
+import queue
+import signal
+import socket
+import asyncio
+import argparse
+import datetime
+import threading
+import collections
+import concurrent.futures
+
+from log_storage import JsonlLogStore, SqliteLogStore
+
+FLEET_PORT = 8765
+FLEET_LOG_FILE = "fleet_events.db"  # เหตุการณ์ของทุกเครื่อง (SQLite, หรือ .jsonl เมื่อใช้ --storage jsonl)
+FLEET_BATCH_SIZE = 500  # เขียนเหตุการณ์ลงที่เก็บครั้งละไม่เกินจำนวนนี้
+FLEET_FLUSH_INTERVAL = 0.5  # เขียนเหตุการณ์ที่รออยู่อย่างน้อยทุก 0.5 วินาที
+FLEET_HEARTBEAT_INTERVAL = 30  # agent ส่ง heartbeat เมื่อไม่มีรายการอื่นนานเกิน 30 วินาที
+FLEET_AGENT_QUEUE_SIZE = 1000  # รายการที่ agent เก็บไว้ระหว่างติดต่อ collector ไม่ได้ (ทิ้งรายการเก่าที่สุดเมื่อเต็ม)
+FLEET_RECONNECT_DELAY = 1
+FLEET_MAX_RECONNECT_DELAY = 60
+FLEET_MAX_LINE = 1024 * 1024  # ขนาดสูงสุดของหนึ่งรายการที่ collector รับ
+FLEET_LATENCY_SAMPLES = 100000  # จำนวนค่าเวลาที่ใช้คำนวณ p50/p99
+
+
+def parse_address(value, default_host="127.0.0.1"):
+    """แปลง "HOST:PORT", "HOST" หรือ ":PORT" เป็น (host, port)"""
+    host, _, port = value.rpartition(":") if ":" in value else (value, "", "")
+    return host or default_host, int(port) if port else FLEET_PORT
+
+
+def encode_record(record):
+    return (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+
+
+class FleetAgent:
+    """
+    ส่งรายการของ MonitorDaemon ไปยัง collector (ใช้เป็น emit ได้โดยตรง เรียกได้จากหลายเธรด)
+    การเชื่อมต่อและการส่งทำในเธรดของตัวเอง เชื่อมต่อใหม่อัตโนมัติเมื่อหลุด
+    ระหว่างติดต่อ collector ไม่ได้จะเก็บรายการไว้ไม่เกิน queue_size รายการ
+    """
+
+    def __init__(self, address, host_id=None, queue_size=FLEET_AGENT_QUEUE_SIZE,
+                 heartbeat_interval=FLEET_HEARTBEAT_INTERVAL):
+        self.address = address
+        self.host_id = host_id or socket.gethostname()
+        self.heartbeat_interval = heartbeat_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closing = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fleet-agent", daemon=True)
+        self._last_status = None  # สถานะล่าสุด ส่งไปพร้อม hello เมื่อเชื่อมต่อใหม่
+        self.sent = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    def start(self):
+        self._thread.start()
+
+    def __call__(self, record):
+        if record.get('type') == "event":
+            self._last_status = record.get('status')
+        while True:
+            try:
+                self._queue.put_nowait(record)
+                return
+            except queue.Full:
+                # ทิ้งรายการที่เก่าที่สุด ให้รายการล่าสุดไปถึง collector
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=10)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(None)
+        hello = {'type': "hello", 'host': self.host_id, 'sent': time.time()}
+        if self._last_status is not None:
+            hello['status'] = self._last_status
+        sock.sendall(encode_record(hello))
+        return sock
+
+    def _run(self):
+        delay = FLEET_RECONNECT_DELAY
+        pending = None  # รายการที่ส่งไม่สำเร็จ ส่งใหม่หลังเชื่อมต่อได้
+        while not self._closing.is_set():
+            try:
+                sock = self._connect()
+            except OSError as e:
+                print(f"Cannot connect to collector {self.address[0]}:{self.address[1]}: {str(e)}")
+                self._closing.wait(delay)
+                delay = min(delay * 2, FLEET_MAX_RECONNECT_DELAY)
+                continue
+
+            delay = FLEET_RECONNECT_DELAY
+            try:
+                while True:
+                    if pending is None:
+                        try:
+                            pending = self._queue.get(timeout=self.heartbeat_interval)
+                        except queue.Empty:
+                            pending = {'type': "heartbeat"}
+                    if pending is _CLOSE:
+                        return
+                    record = dict(pending, host=self.host_id, sent=time.time())
+                    sock.sendall(encode_record(record))
+                    pending = None
+                    self.sent += 1
+            except OSError as e:
+                print(f"Lost connection to collector: {str(e)}")
+                self.reconnects += 1
+            finally:
+                sock.close()
+
+    def close(self, timeout=None):
+        """ส่งรายการที่ค้างอยู่ให้หมด (รอไม่เกิน timeout วินาที) แล้วหยุดเธรด"""
+        self._closing.set()
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_CLOSE, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+
+_CLOSE = object()
+
+
+class FleetCollector:
+    """
+    รับการเชื่อมต่อจาก agent จำนวนมากด้วย asyncio (หนึ่ง coroutine ต่อการเชื่อมต่อ)
+    เก็บสถานะปัจจุบันของทุกเครื่องไว้ในหน่วยความจำ (hosts) และรวมเหตุการณ์เขียนลง store ครั้งละหลายรายการ
+    การเขียนทำในเธรดแยกหนึ่งเธรด event loop จึงไม่ถูกบล็อกระหว่างเขียนดิสก์
+    """
+
+    def __init__(self, store, batch_size=FLEET_BATCH_SIZE, flush_interval=FLEET_FLUSH_INTERVAL):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.hosts = {}  # host -> สถานะล่าสุดของเครื่อง
+        self.connections = 0
+        self.events_received = 0
+        self.events_written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.bad_records = 0
+        self.latencies = collections.deque(maxlen=FLEET_LATENCY_SAMPLES)  # ตั้งแต่ agent ส่งจนเขียนเสร็จ (วินาที)
+        self._pending = []
+        self._host_connections = {}  # host -> writer ของการเชื่อมต่อล่าสุด
+        self._flush_wanted = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="fleet-writer")
+        self._server = None
+        self._flusher = None
+
+    async def start(self, host="0.0.0.0", port=FLEET_PORT):
+        self._flush_wanted = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_agent, host, port, limit=FLEET_MAX_LINE,
+                                                  backlog=4096)
+        self._flusher = asyncio.create_task(self._flush_loop())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def _handle_agent(self, reader, writer):
+        self.connections += 1
+        host = None
+        address = writer.get_extra_info('peername')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    record = json.loads(line)
+                    host = record.get('host') or host
+                except ValueError:
+                    self.bad_records += 1
+                    continue
+                if host is not None:
+                    self._host_connections[host] = writer
+                    self.ingest(record, host, address)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            print(f"Agent connection {address} closed: {str(e)}")
+        finally:
+            self.connections -= 1
+            # เครื่องที่เชื่อมต่อใหม่แล้ว (ก่อนการเชื่อมต่อเดิมปิด) ยังถือว่าออนไลน์
+            if host is not None and self._host_connections.get(host) is writer:
+                del self._host_connections[host]
+                self.hosts[host]['connected'] = False
+            writer.close()
+
+    def ingest(self, record, host, address=None):
+        """ปรับสถานะของ host ตามรายการที่ได้รับ และเก็บเหตุการณ์ไว้รอเขียน"""
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = {'host': host, 'status': None, 'system': None, 'last_event': None,
+                                        'last_event_time': None, 'events': 0}
+        state['connected'] = True
+        state['last_seen'] = time.time()
+        if address is not None:
+            state['address'] = address[0]
+
+        record_type = record.get('type')
+        if record_type == "hello":
+            if record.get('status') is not None:
+                state['status'] = record['status']
+        elif record_type == "event":
+            state['status'] = record.get('status')
+            state['last_event'] = record.get('event_type')
+            state['last_event_time'] = record.get('timestamp')
+            state['events'] += 1
+            self.events_received += 1
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._flush_wanted.set()
+        elif record_type == "status":
+            state['status'] = record.get('status')
+        elif record_type in ("system", "stats"):
+            state[record_type] = record.get(record_type) or record.get('status')
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wanted.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wanted.clear()
+            await self.flush()
+
+    async def flush(self):
+        """เขียนเหตุการณ์ที่รออยู่ทั้งหมด (ครั้งละไม่เกิน batch_size รายการ)"""
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            entries = [_log_entry(record) for record in batch]
+            try:
+                await loop.run_in_executor(self._executor, self.store.append_many, entries)
+            except Exception as e:
+                self.write_errors += 1
+                print(f"Error writing fleet events: {str(e)}")
+                continue
+            now = time.time()
+            self.latencies.extend(now - record.get('sent', now) for record in batch)
+            self.events_written += len(batch)
+            self.batches += 1
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        self._executor.shutdown(wait=True)
+        if hasattr(self.store, 'close'):
+            self.store.close()
+
+    def snapshot(self):
+        """สำเนาสถานะปัจจุบันของทุกเครื่อง"""
+        return {host: dict(state) for host, state in self.hosts.items()}
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+
+        return {
+            'hosts': len(self.hosts),
+            'connections': self.connections,
+            'events_received': self.events_received,
+            'events_written': self.events_written,
+            'pending': len(self._pending),
+            'batches': self.batches,
+            'write_errors': self.write_errors,
+            'bad_records': self.bad_records,
+            'ingest_p50_ms': percentile(50),
+            'ingest_p99_ms': percentile(99)
+        }
+
+
+def _log_entry(record):
+    """รายการล็อกที่เก็บใน store: เหตุการณ์ของ agent พร้อมชื่อเครื่อง (ไม่รวมข้อมูลของโปรโตคอล)"""
+    entry = {key: value for key, value in record.items() if key not in ('type', 'sent')}
+    entry.setdefault('timestamp', datetime.datetime.now().isoformat())
+    return entry
+
+
+def create_fleet_store(storage, path=None):
+    if storage == "jsonl":
+        return JsonlLogStore(path or "fleet_events.jsonl")
+    return SqliteLogStore(path or FLEET_LOG_FILE)
+
+
+async def serve(args):
+    collector = FleetCollector(create_fleet_store(args.storage, args.log), batch_size=args.batch_size)
+    host, port = parse_address(args.listen, default_host="0.0.0.0")
+    address = await collector.start(host, port)
+    print(f"Fleet collector listening on {address[0]}:{address[1]}")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stopping.set)
+        except NotImplementedError:
+            # Windows: ใช้ KeyboardInterrupt แทน
+            pass
+
+    try:
+        while not stopping.is_set():
+            try:
+                await asyncio.wait_for(stopping.wait(), args.report or None)
+            except asyncio.TimeoutError:
+                print(json.dumps(collector.stats()), flush=True)
+    finally:
+        await collector.close()
+        print(json.dumps(collector.stats()), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="fleet.py", description="HDMI Monitor fleet collector")
+    parser.add_argument("--listen", default=f"0.0.0.0:{FLEET_PORT}", help="address to accept agents on")
+    parser.add_argument("--storage", choices=("sqlite", "jsonl"), default="sqlite")
+    parser.add_argument("--log", help=f"event store path (default {FLEET_LOG_FILE})")
+    parser.add_argument("--batch-size", type=int, default=FLEET_BATCH_SIZE)
+    parser.add_argument("--report", type=float, default=60, metavar="SECONDS",
+                        help="print collector statistics every SECONDS (0 to disable)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
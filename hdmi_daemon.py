@@ -0,0 +1,198 @@
+"""
+โหมด daemon ของ HDMI Monitor: ตรวจสอบและบันทึกล็อกโดยไม่ใช้หน้าต่าง (ไม่นำเข้า PyQt5)
+แต่ละเหตุการณ์ถูกพิมพ์เป็น JSON หนึ่งบรรทัดทาง stdout ส่วนข้อความอื่นๆ ไปที่ stderr
+
+    python app.py --daemon [--status] [--system] [--stats SECONDS] [--collector HOST:PORT] [--metrics-port PORT]
+
+เมื่อระบุ --collector ทุกรายการจะถูกส่งไปยัง collector ของโหมดกลุ่มเครื่องด้วย (ดู fleet.py)
+เมื่อระบุ --metrics-port ผลตรวจสอบล่าสุดจะให้บริการที่ http://127.0.0.1:PORT/metrics (ดู metrics_exporter.py)
+"""
+import sys
+import json
+import signal
+import argparse
+import datetime
+import threading
+import time
+
+from hw_probes import create_probe_backend
+from monitor_core import (PROBE_BACKEND, PROBE_DEADLINE, THREAD_STOP_TIMEOUT, METRIC_HISTORY_FILE,
+                          METRICS_HOST, METRICS_PORT, HDMIMonitorCore, SystemMonitorCore, LogManager, create_event_source, create_hardware_sampler,
+                          notification_message)
+
+
+class JsonLineWriter:
+    """เขียนข้อมูลเป็น JSON หนึ่งบรรทัดต่อรายการ (เรียกจากหลายเธรดได้)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class TeeEmitter:
+    """ส่งแต่ละรายการให้ emit ทุกตัว"""
+
+    def __init__(self, *emitters):
+        self.emitters = emitters
+
+    def __call__(self, record):
+        for emit in self.emitters:
+            emit(record)
+
+
+class MonitorDaemon:
+    """
+    ต่อ HDMIMonitorCore (และ SystemMonitorCore หากต้องการ) เข้ากับ LogManager และผลลัพธ์แบบ JSON
+    ทุกรายการที่ส่งให้ emit มี type เป็น "event", "status", "system" หรือ "stats"
+    (สถิติย้อนหลังของ SystemMonitorCore ทุก stats_interval วินาที)
+    หากกำหนด metrics_cache (MetricsCache) ผลตรวจสอบทุกรอบจะถูกเก็บไว้ให้ /metrics
+    ประวัติค่าการใช้งาน (MetricHistory, นำเข้า numpy) สร้างเฉพาะเมื่อมีการตรวจสอบระบบ
+    การตรวจสอบเฉพาะ HDMI จึงไม่นำเข้า numpy และไม่เขียนไฟล์ประวัติ
+    """
+
+    def __init__(self, emit, log_manager=None, backend=None, include_status=False, include_system=False,
+                 stats_interval=None, history=None, metrics_cache=None):
+        self.emit = emit
+        self.log_manager = log_manager or LogManager()
+        self.backend = backend or create_probe_backend(PROBE_BACKEND)
+        self.sampler = create_hardware_sampler(self.backend, deadline=PROBE_DEADLINE)
+        self.include_status = include_status
+        self.include_system = include_system
+        self.stats_interval = stats_interval
+        self._last_stats = time.monotonic()
+        self.metrics_cache = metrics_cache
+        monitor_system = include_system or stats_interval or metrics_cache is not None
+        if history is None and monitor_system:
+            from metric_history import MetricHistory
+            history = MetricHistory(path=METRIC_HISTORY_FILE)
+        self.history = history
+
+        self.hdmi_monitor = HDMIMonitorCore(backend=self.backend,
+                                            event_source=create_event_source(self.backend),
+                                            sampler=self.sampler,
+                                            on_status=self._on_status,
+                                            on_event=self._on_event,
+                                            history=self.history)
+        self.system_monitor = None
+        self._system_thread = None
+        if monitor_system:
+            self.system_monitor = SystemMonitorCore(backend=self.backend, sampler=self.sampler,
+                                                    on_status=self._on_system_status,
+                                                    history=self.history)
+
+    def _on_event(self, log_entry):
+        self.log_manager.add_log_entry(log_entry)
+        record = {'type': "event", 'message': notification_message(log_entry)}
+        record.update(log_entry)
+        self.emit(record)
+
+    def _on_status(self, status):
+        if self.metrics_cache is not None:
+            self.metrics_cache.set_hdmi_status(status)
+        if self.include_status:
+            self.emit({'type': "status", 'timestamp': datetime.datetime.now().isoformat(), 'status': status})
+
+    def _on_system_status(self, status):
+        if self.metrics_cache is not None:
+            self.metrics_cache.set_system_status(status)
+        if self.include_system:
+            self.emit({'type': "system", 'timestamp': datetime.datetime.now().isoformat(), 'status': status})
+        if self.stats_interval and time.monotonic() - self._last_stats >= self.stats_interval:
+            self._last_stats = time.monotonic()
+            self.emit({'type': "stats", 'timestamp': datetime.datetime.now().isoformat(),
+                       'stats': self.system_monitor.rolling_stats()})
+
+    def run(self):
+        """ตรวจสอบในเธรดที่เรียกจนกว่า stop() จะถูกเรียก แล้วปิดทรัพยากรทั้งหมด"""
+        self.log_manager.start_background_writer()
+        if self.history is not None:
+            self.history.load()
+        if self.system_monitor is not None:
+            self._system_thread = threading.Thread(target=self.system_monitor.run,
+                                                   name="system-monitor", daemon=True)
+            self._system_thread.start()
+        try:
+            self.hdmi_monitor.run()
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self.hdmi_monitor.stop()
+        if self.system_monitor is not None:
+            self.system_monitor.stop()
+
+    def shutdown(self):
+        """หยุดเธรดตรวจสอบ (รอไม่เกิน THREAD_STOP_TIMEOUT) บันทึกประวัติค่าการใช้งาน (ถ้ามี) และเขียนล็อกที่ค้างอยู่ให้หมด"""
+        self.stop()
+        if self._system_thread is not None:
+            self._system_thread.join(THREAD_STOP_TIMEOUT)
+        self.sampler.close(timeout=THREAD_STOP_TIMEOUT)
+        if self.history is not None:
+            self.history.save()
+        self.log_manager.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.py --daemon",
+                                     description="HDMI Monitor headless mode (events as JSON lines)")
+    parser.add_argument("--daemon", action="store_true", help="run without the tray GUI")
+    parser.add_argument("--status", action="store_true", help="also print every HDMI status sample")
+    parser.add_argument("--system", action="store_true", help="also print CPU/RAM/GPU samples")
+    parser.add_argument("--stats", type=float, metavar="SECONDS",
+                        help="also print rolling CPU/RAM/GPU statistics every SECONDS")
+    parser.add_argument("--collector", metavar="HOST:PORT", help="also stream records to a fleet collector")
+    parser.add_argument("--host-id", help="name reported to the collector (default: hostname)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="serve Prometheus/OpenMetrics text on this port")
+    parser.add_argument("--metrics-host", default=METRICS_HOST, help="address for --metrics-port")
+    args = parser.parse_args(argv)
+
+    # stdout ใช้สำหรับ JSON เท่านั้น ข้อความจาก print() ของส่วนอื่นให้ไปที่ stderr
+    emit = JsonLineWriter(sys.stdout)
+    sys.stdout = sys.stderr
+
+    exporter = None
+    metrics_cache = None
+    if args.metrics_port:
+        from metrics_exporter import MetricsCache, MetricsExporter
+        metrics_cache = MetricsCache()
+        try:
+            exporter = MetricsExporter(metrics_cache, args.metrics_host, args.metrics_port).start()
+        except OSError as e:
+            # ผู้ใช้ขอ /metrics ไว้ชัดเจน: หยุดทำงานพร้อมข้อความแทน traceback (เช่น พอร์ตถูกใช้อยู่)
+            print(f"Cannot start metrics exporter on {args.metrics_host}:{args.metrics_port}: {str(e)}")
+            return 1
+
+    agent = None
+    if args.collector:
+        from fleet import FleetAgent, parse_address
+        agent = FleetAgent(parse_address(args.collector), host_id=args.host_id)
+        agent.start()
+        emit = TeeEmitter(emit, agent)
+
+    daemon = MonitorDaemon(emit, include_status=args.status, include_system=args.system,
+                           stats_interval=args.stats, metrics_cache=metrics_cache)
+
+    def handle_signal(signum, frame):
+        print("Stopping HDMI monitor daemon...")
+        daemon.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    daemon.run()
+    if exporter is not None:
+        exporter.close()
+    if agent is not None:
+        agent.close(timeout=THREAD_STOP_TIMEOUT)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
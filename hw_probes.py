@@ -0,0 +1,746 @@
+"""
+การเข้าถึงฮาร์ดแวร์สำหรับ HDMI Monitor
+"""
+import os
+import sys
+import glob
+import datetime
+import threading
+import queue
+import time
+
+CONNECTION_TYPE_HDMI = 5  # รหัสสำหรับการเชื่อมต่อ HDMI
+CONNECTION_TYPE_INTERNAL = -2147483648  # จอภายใน (เช่น จอโน้ตบุ๊ก eDP)
+
+# รหัสข้อผิดพลาดของอุปกรณ์
+ERROR_CODES = {
+    0: "อุปกรณ์ทำงานปกติ",
+    1: "อุปกรณ์ยังตั้งค่าไม่ถูกต้อง",
+    2: "Windows ไม่สามารถโหลดไดรเวอร์ของอุปกรณ์นี้",
+    3: "ไดรเวอร์อาจมีปัญหาหรือระบบเมมโมรีไม่พอ",
+    4: "อุปกรณ์นี้ทำงานไม่ถูกต้อง",
+    22: "อุปกรณ์นี้ถูกปิดการใช้งาน",
+    28: "ไม่มีไดรเวอร์ติดตั้งสำหรับอุปกรณ์นี้",
+    43: "Windows หยุดอุปกรณ์นี้เนื่องจากพบปัญหา"
+}
+
+# ประเภทคอนเนกเตอร์ของ Linux DRM เทียบกับรหัส VideoOutputTechnology ของ Windows
+DRM_CONNECTOR_TYPES = {
+    "VGA": 0,
+    "Composite": 1,
+    "SVIDEO": 2,
+    "Component": 3,
+    "DVI-I": 4,
+    "DVI-D": 4,
+    "DVI-A": 4,
+    "HDMI-A": CONNECTION_TYPE_HDMI,
+    "HDMI-B": CONNECTION_TYPE_HDMI,
+    "LVDS": 6,
+    "DP": 10,
+    "Virtual": 12,
+    "eDP": CONNECTION_TYPE_INTERNAL,
+    "DSI": CONNECTION_TYPE_INTERNAL,
+}
+
+# ผู้ผลิตการ์ดจอตาม PCI vendor ID
+PCI_VENDORS = {
+    "8086": "Intel",
+    "10DE": "NVIDIA",
+    "1002": "AMD",
+}
+
+DRM_ROOT = "/sys/class/drm"
+SYS_MODULE_ROOT = "/sys/module"
+
+# ชนิดข้อมูลดิบที่ backend อ่านได้ (ใช้เป็นชื่อ query ของ HardwareSampler)
+QUERY_MONITORS = "monitors"  # จอภาพที่เชื่อมต่อ
+QUERY_GPUS = "gpus"  # ค่าการใช้งานการ์ด NVIDIA
+QUERY_CONTROLLERS = "controllers"  # การ์ดจอจากระบบปฏิบัติการ
+PROBE_QUERIES = (QUERY_MONITORS, QUERY_GPUS, QUERY_CONTROLLERS)
+CONTROLLER_STATE_FIELDS = ('status', 'error_code', 'driver_status')  # ค่าของการ์ดจอที่อ่านใหม่ทุกครั้ง
+
+GPU_INVENTORY_TTL = 300  # อ่านข้อมูลคงที่ของการ์ดจอใหม่ทุก 5 นาที (วินาที)
+GPUTIL_MIN_INTERVAL = 5  # เมื่อไม่มี pynvml อ่านค่าผ่าน GPUtil (เรียก nvidia-smi) ห่างกันอย่างน้อย 5 วินาที
+
+WMI_NAMESPACE_DEFAULT = None  # namespace เริ่มต้น (root\cimv2)
+WMI_NAMESPACE_MONITOR = "root\\wmi"  # namespace ของ WmiMonitorConnectionParams
+
+# เหตุการณ์เมื่อจอภาพถูกเชื่อมต่อ ถอด หรือเปลี่ยนสถานะ Active
+DISPLAY_EVENT_WQL = (
+    "SELECT * FROM __InstanceOperationEvent WITHIN 1 "
+    "WHERE TargetInstance ISA 'WmiMonitorConnectionParams'"
+)
+
+
+class WMIConnectionPool:
+    """
+    เก็บการเชื่อมต่อ WMI ไว้ใช้ซ้ำ แยกตามเธรดและ namespace
+    แต่ละเธรดจะเรียก CoInitialize และเปิดการเชื่อมต่อแต่ละ namespace เพียงครั้งเดียว
+    หาก query ล้มเหลว จะทิ้งการเชื่อมต่อเดิมแล้วเชื่อมต่อใหม่หนึ่งครั้ง
+
+    สามารถส่งโมดูล wmi/pythoncom ปลอมเข้ามาเพื่อใช้ทดสอบบนระบบที่ไม่ใช่ Windows
+    """
+
+    def __init__(self, wmi_module=None, com_module=None):
+        self._wmi = wmi_module
+        self._com = com_module
+        self._local = threading.local()
+        self.connects = 0  # จำนวนครั้งที่สร้างการเชื่อมต่อใหม่ (ทุกเธรด)
+        self.reconnects = 0  # จำนวนครั้งที่ต้องเชื่อมต่อใหม่เพราะ query ล้มเหลว
+
+    def _modules(self):
+        if self._wmi is None:
+            import wmi
+            self._wmi = wmi
+        if self._com is None:
+            import pythoncom
+            self._com = pythoncom
+        return self._wmi, self._com
+
+    @property
+    def wmi_module(self):
+        return self._modules()[0]
+
+    def _connections(self):
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = {}
+            self._local.connections = connections
+        return connections
+
+    def get(self, namespace=WMI_NAMESPACE_DEFAULT):
+        """คืนค่าการเชื่อมต่อของเธรดปัจจุบันสำหรับ namespace ที่ระบุ"""
+        wmi_module, com_module = self._modules()
+        if not getattr(self._local, 'com_initialized', False):
+            com_module.CoInitialize()
+            self._local.com_initialized = True
+
+        connections = self._connections()
+        conn = connections.get(namespace)
+        if conn is None:
+            conn = wmi_module.WMI(namespace=namespace) if namespace else wmi_module.WMI()
+            connections[namespace] = conn
+            self.connects += 1
+        return conn
+
+    def invalidate(self, namespace=WMI_NAMESPACE_DEFAULT):
+        """ทิ้งการเชื่อมต่อของเธรดปัจจุบัน เพื่อให้เชื่อมต่อใหม่ในครั้งถัดไป"""
+        self._connections().pop(namespace, None)
+
+    def query(self, namespace, class_name, fields=None, **filters):
+        """
+        เรียก query คลาส WMI และคืนค่าผลลัพธ์เป็น list (ระบุ fields เพื่ออ่านเฉพาะบางคุณสมบัติ)
+        หากการเชื่อมต่อเดิมใช้ไม่ได้ จะเชื่อมต่อใหม่และลองอีกครั้ง
+        """
+        args = (list(fields),) if fields else ()
+        try:
+            return list(getattr(self.get(namespace), class_name)(*args, **filters))
+        except Exception:
+            self.invalidate(namespace)
+            self.reconnects += 1
+        return list(getattr(self.get(namespace), class_name)(*args, **filters))
+
+    def close_thread(self):
+        """ปิดการเชื่อมต่อทั้งหมดของเธรดปัจจุบัน (เรียกก่อนเธรดจบการทำงาน)"""
+        self._connections().clear()
+        if getattr(self._local, 'com_initialized', False):
+            self._local.com_initialized = False
+            try:
+                self._com.CoUninitialize()
+            except Exception as e:
+                print(f"Error uninitializing COM: {str(e)}")
+
+
+def make_display_event(source, kind="changed"):
+    """สร้างข้อมูลเหตุการณ์จอภาพ พร้อมเวลาที่เกิดเหตุการณ์ (ใช้วัดความหน่วง)"""
+    return {'source': source, 'kind': kind, 'time': time.monotonic()}
+
+
+class DisplayEventSource:
+    """
+    แหล่งเหตุการณ์การเปลี่ยนแปลงของจอภาพ
+    wait() จะบล็อกจนกว่าจะมีเหตุการณ์หรือหมดเวลา และต้องถูกเรียกจากเธรดเดียวกันเสมอ
+    """
+
+    def wait(self, timeout):
+        """รอเหตุการณ์ไม่เกิน timeout วินาที คืนค่าเหตุการณ์ หรือ None หากหมดเวลา"""
+        raise NotImplementedError
+
+    def close(self):
+        """หยุดรอเหตุการณ์ (เรียกจากเธรดอื่นได้)"""
+
+
+class QueueDisplayEventSource(DisplayEventSource):
+    """แหล่งเหตุการณ์ที่ป้อนผ่าน push() ใช้ทดสอบหรือเชื่อมกับแหล่งเหตุการณ์ภายนอก"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._closed = False
+
+    def push(self, kind="changed"):
+        self._queue.put(make_display_event("queue", kind))
+
+    def wait(self, timeout):
+        if self._closed:
+            return None
+        try:
+            event = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        # รวมเหตุการณ์ที่เข้ามาพร้อมกันให้เป็นการตรวจสอบครั้งเดียว
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        return event
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+
+
+class WMIDisplayEventSource(DisplayEventSource):
+    """
+    รับเหตุการณ์การสร้าง/ลบ/แก้ไข WmiMonitorConnectionParams ผ่าน WMI
+    การเชื่อมต่อของ watcher มาจาก WMIConnectionPool ของเธรดที่เรียก wait()
+    """
+
+    def __init__(self, wmi_pool, poll_ms=500):
+        self.wmi_pool = wmi_pool
+        self.poll_ms = poll_ms
+        self._watcher = None
+        self._closed = False
+
+    def wait(self, timeout):
+        if self._watcher is None:
+            conn = self.wmi_pool.get(WMI_NAMESPACE_MONITOR)
+            self._watcher = conn.watch_for(raw_wql=DISPLAY_EVENT_WQL)
+
+        timed_out = self.wmi_pool.wmi_module.x_wmi_timed_out
+        deadline = time.monotonic() + timeout
+        # รอเป็นช่วงสั้นๆ เพื่อให้ close() หยุดการรอได้ภายใน poll_ms
+        while not self._closed:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                return None
+            try:
+                event = self._watcher(timeout_ms=min(self.poll_ms, remaining_ms))
+            except timed_out:
+                continue
+            kind = getattr(event, 'event_type', None) or "changed"
+            return make_display_event("wmi", kind)
+        return None
+
+    def close(self):
+        self._closed = True
+
+
+class ProbeTimeout(Exception):
+    """การอ่านข้อมูลฮาร์ดแวร์ไม่เสร็จภายในเวลาที่กำหนด"""
+
+    def __init__(self, query, deadline):
+        super(ProbeTimeout, self).__init__(f"Hardware probe '{query}' timed out after {deadline:.1f}s")
+        self.query = query
+        self.deadline = deadline
+
+
+def get_error_description(error_code):
+    """แปลงรหัสข้อผิดพลาดเป็นคำอธิบาย"""
+    return ERROR_CODES.get(error_code, f"ข้อผิดพลาดที่ไม่รู้จัก (รหัส {error_code})")
+
+
+class _InventoryEntry:
+    """
+    ข้อมูลหนึ่งชนิดใน GpuInventory
+    การอ่านฮาร์ดแวร์ทำนอก lock แล้วจึงเก็บผลภายใต้ lock (lock ถูกถือเพียงช่วงสั้นๆ)
+    ระหว่างที่มีเธรดกำลังอ่านอยู่ ผู้อ่านอื่นจะได้ข้อมูลชุดเดิม (หรือ idle_value หากยังไม่เคยอ่าน)
+    เพื่อไม่ให้เธรดต่อคิวกันรอโปรแกรมที่ค้าง เช่น nvidia-smi
+    """
+
+    def __init__(self, inventory, load, idle_value=None):
+        self.inventory = inventory
+        self.load = load
+        self.idle_value = idle_value  # None = ยังไม่เคยอ่าน ต้องอ่านเองแม้มีเธรดอื่นกำลังอ่าน
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = None
+        self._generation = None
+        self._loading = False
+
+    def get(self):
+        inventory = self.inventory
+        with self._lock:
+            fresh = (self._loaded_at is not None and self._generation == inventory.generation and
+                     time.monotonic() - self._loaded_at < inventory.ttl)
+            if fresh:
+                return self._value
+            if self._loading:
+                if self._value is not None:
+                    return self._value
+                if self.idle_value is not None:
+                    return self.idle_value
+            self._loading = True
+            generation = inventory.generation
+
+        try:
+            value = self.load()
+        finally:
+            with self._lock:
+                self._loading = False
+
+        with self._lock:
+            self._value = value
+            self._loaded_at = time.monotonic()
+            self._generation = generation
+            inventory.refreshes += 1
+        return value
+
+
+class GpuInventory:
+    """
+    แคชข้อมูลคงที่ของการ์ดจอ
+    - การ์ด NVIDIA จาก GPUtil: ลำดับ, uuid, ชื่อ, รุ่นไดรเวอร์, หน่วยความจำทั้งหมด
+    - การ์ดจอจากระบบปฏิบัติการ: ชื่อ, รุ่นไดรเวอร์, วันที่ไดรเวอร์
+      (สถานะและรหัสข้อผิดพลาดไม่ถูกแคช อ่านใหม่ทุกครั้งผ่าน controller_states())
+    อ่านใหม่เมื่อครบ ttl วินาที หรือเมื่อ invalidate() ถูกเรียกเพราะอุปกรณ์เปลี่ยนแปลง
+    ข้อมูลแต่ละชนิดมี lock ของตัวเอง และไม่มีการอ่านฮาร์ดแวร์ขณะถือ lock
+    invalidate() จึงไม่ต้องรอการอ่านที่ค้างอยู่ (เรียกจากเธรด UI ได้)
+    """
+
+    def __init__(self, backend, ttl=GPU_INVENTORY_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.generation = 0  # เพิ่มทุกครั้งที่ invalidate() ข้อมูลที่อ่านก่อนหน้าถือว่าหมดอายุ
+        self.refreshes = 0
+        self._nvidia = _InventoryEntry(self, self._load_nvidia, idle_value=[])
+        self._controllers = _InventoryEntry(self, self.backend.video_controllers)
+
+    def invalidate(self):
+        """ล้างแคช ให้การอ่านครั้งถัดไปดึงข้อมูลใหม่ (ไม่รอการอ่านที่กำลังทำอยู่)"""
+        self.generation += 1
+
+    def _load_nvidia(self):
+        try:
+            gpus = self.backend.get_gpus()
+        except Exception:
+            gpus = []  # ไม่มี nvidia-smi: ไม่ต้องลองใหม่จนกว่าแคชจะหมดอายุ
+        return [{
+            'index': idx,
+            'uuid': getattr(gpu, 'uuid', None),
+            'name': gpu.name,
+            'driver_version': getattr(gpu, 'driver', None) or "Unknown",
+            'memory_total': gpu.memoryTotal
+        } for idx, gpu in enumerate(gpus)]
+
+    def nvidia_gpus(self):
+        """รายการการ์ด NVIDIA (รายการว่างหากไม่มี GPUtil หรือไม่มีการ์ด NVIDIA)"""
+        return [dict(gpu) for gpu in self._nvidia.get()]
+
+    def controllers(self):
+        """
+        รายการการ์ดจอจากระบบปฏิบัติการ รูปแบบเดียวกับ video_controllers()
+        ชื่อและไดรเวอร์มาจากแคช ส่วน status/error_code/driver_status อ่านใหม่ทุกครั้ง
+        เพื่อให้ไดรเวอร์ที่เกิดข้อผิดพลาดถูกรายงานในการตรวจสอบครั้งถัดไปทันที
+        """
+        # หากอ่านไม่สำเร็จ ข้อผิดพลาดจะถูกส่งต่อและไม่เก็บลงแคช
+        controllers = self._controllers.get()
+        states = self.backend.controller_states()
+        if len(states) != len(controllers):
+            # จำนวนการ์ดเปลี่ยน: ข้อมูลคงที่ในแคชใช้ไม่ได้แล้ว
+            self.invalidate()
+            controllers = self._controllers.get()
+        merged = []
+        for controller, state in zip(controllers, states):
+            controller = dict(controller)
+            controller.update(state)
+            merged.append(controller)
+        return merged
+
+
+class ProbeBackend:
+    """
+    คลาสฐานของการตรวจสอบจอภาพและการ์ดจอ
+    check_hdmi_status() คืนค่า dict รูปแบบเดียวกันทุก backend
+    (hdmi_connected, hdmi_active, hdmi_devices, gpu_status, driver_check_time)
+    backend ย่อยกำหนดเพียง probe_monitors() และ video_controllers()
+    ข้อมูลคงที่ของการ์ดจออ่านผ่าน self.inventory ส่วน sample_gpus() อ่านเฉพาะค่าที่เปลี่ยนตลอดเวลา
+    """
+
+    name = None
+
+    def __init__(self, gputil_module=None, nvml_module=None, inventory_ttl=GPU_INVENTORY_TTL):
+        self._gputil = gputil_module
+        self._nvml = nvml_module
+        self.inventory = GpuInventory(self, inventory_ttl)
+        self.gputil_interval = GPUTIL_MIN_INTERVAL
+        self._gputil_cache = None  # (เวลาที่อ่าน, generation ของ inventory, ค่าที่อ่านได้)
+
+    def _gputil_module(self):
+        if self._gputil is None:
+            import GPUtil
+            self._gputil = GPUtil
+        return self._gputil
+
+    def _nvml_module(self):
+        """pynvml (ถ้ามี) อ่านค่าจากไดรเวอร์โดยตรงโดยไม่ต้องเรียก nvidia-smi"""
+        if self._nvml is None:
+            try:
+                import pynvml
+                pynvml.nvmlInit()
+                self._nvml = pynvml
+            except Exception:
+                self._nvml = False
+        return self._nvml or None
+
+    def get_gpus(self):
+        """ข้อมูล GPU จาก GPUtil (nvidia-smi)"""
+        return self._gputil_module().getGPUs()
+
+    def gputil_readings(self):
+        """
+        ค่าจาก GPUtil ที่อ่านล่าสุด ใช้ซ้ำหากอายุไม่เกิน gputil_interval วินาที
+        (GPUtil เรียก nvidia-smi ทุกครั้ง จึงไม่อ่านทุกรอบตรวจสอบ) อ่านใหม่ทันทีเมื่อ inventory ถูก invalidate()
+        """
+        generation = self.inventory.generation
+        cached = self._gputil_cache
+        if (cached is not None and cached[1] == generation and
+                time.monotonic() - cached[0] < self.gputil_interval):
+            return cached[2]
+        readings = self.get_gpus()
+        self._gputil_cache = (time.monotonic(), generation, readings)
+        return readings
+
+    def sample_gpus(self):
+        """
+        ค่าที่เปลี่ยนตลอดเวลาของการ์ด NVIDIA (load %, memory_used MB, temperature °C)
+        รวมกับข้อมูลคงที่จาก inventory คืนรายการว่างโดยไม่เรียก nvidia-smi หากไม่มีการ์ด NVIDIA
+        หากไม่มี pynvml ค่าจะมาจาก gputil_readings() ซึ่งอาจมีอายุไม่เกิน gputil_interval วินาที
+        """
+        gpus = self.inventory.nvidia_gpus()
+        if not gpus:
+            return []
+
+        nvml = self._nvml_module()
+        if nvml:
+            for gpu in gpus:
+                handle = nvml.nvmlDeviceGetHandleByIndex(gpu['index'])
+                gpu['load'] = float(nvml.nvmlDeviceGetUtilizationRates(handle).gpu)
+                gpu['memory_used'] = nvml.nvmlDeviceGetMemoryInfo(handle).used / (1024 * 1024)
+                gpu['temperature'] = nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU)
+            return gpus
+
+        readings = self.gputil_readings()
+        if len(readings) != len(gpus):
+            # จำนวนการ์ดเปลี่ยน: ข้อมูลคงที่ในแคชใช้ไม่ได้แล้ว
+            self.inventory.invalidate()
+            gpus = self.inventory.nvidia_gpus()
+        for gpu, reading in zip(gpus, readings):
+            gpu['load'] = reading.load * 100
+            gpu['memory_used'] = reading.memoryUsed
+            gpu['temperature'] = reading.temperature
+        return gpus
+
+    def read_query(self, name):
+        """อ่านข้อมูลดิบชนิด name (หนึ่งใน PROBE_QUERIES) จากฮาร์ดแวร์โดยตรง"""
+        if name == QUERY_MONITORS:
+            monitors = {'hdmi_connected': False, 'hdmi_active': False, 'hdmi_devices': []}
+            self.probe_monitors(monitors)
+            return monitors
+        if name == QUERY_GPUS:
+            return self.sample_gpus()
+        if name == QUERY_CONTROLLERS:
+            return self.inventory.controllers()
+        raise ValueError(f"Unknown probe query: {name}")
+
+    def check_hdmi_status(self, read=None):
+        """
+        ตรวจสอบสถานะการเชื่อมต่อ HDMI และไดรเวอร์การ์ดจอ
+        read(name) ใช้อ่านข้อมูลดิบแต่ละชนิด (ค่าเริ่มต้นคือ read_query) เช่น อ่านผ่าน HardwareSampler
+        query ที่หมดเวลา (ProbeTimeout) จะถูกระบุไว้ใน result['probe_timeouts']
+        """
+        read = read or self.read_query
+        result = {
+            'hdmi_connected': False,
+            'hdmi_active': False,
+            'hdmi_devices': [],
+            'gpu_status': {},
+            'driver_check_time': datetime.datetime.now().isoformat()
+        }
+
+        try:
+            # ตรวจสอบการเชื่อมต่อ HDMI
+            try:
+                monitors = read(QUERY_MONITORS)
+                result['hdmi_connected'] = monitors['hdmi_connected']
+                result['hdmi_active'] = monitors['hdmi_active']
+                result['hdmi_devices'] = [dict(device) for device in monitors['hdmi_devices']]
+                if not result['hdmi_devices']:
+                    result['wmi_error'] = "ไม่พบจอภาพที่เชื่อมต่อ"
+            except ProbeTimeout as timeout:
+                result['wmi_error'] = str(timeout)
+                result.setdefault('probe_timeouts', []).append(timeout.query)
+            except Exception as wmi_error:
+                result['wmi_error'] = str(wmi_error)
+
+            # ตรวจสอบสถานะไดรเวอร์การ์ดจอ
+            try:
+                self.probe_gpus(result, read)
+            except Exception as gpu_error:
+                if isinstance(gpu_error, ProbeTimeout):
+                    result.setdefault('probe_timeouts', []).append(gpu_error.query)
+                result['gpu_error'] = str(gpu_error)
+                result['gpu_status']['gpu_error'] = {
+                    'name': "Error checking GPU",
+                    'status': "Error",
+                    'error_code': -1,
+                    'driver_version': "Unknown",
+                    'driver_status': "error",
+                    'error_description': str(gpu_error)
+                }
+
+        except Exception as e:
+            error_msg = f"Error checking HDMI status: {str(e)}"
+            print(error_msg)
+            result['error'] = error_msg
+
+        return result
+
+    def probe_monitors(self, result):
+        """เพิ่มข้อมูลจอภาพลงใน result['hdmi_devices'] และตั้งค่า hdmi_connected/hdmi_active"""
+        raise NotImplementedError
+
+    def video_controllers(self):
+        """
+        รายการการ์ดจอจากระบบปฏิบัติการ แต่ละรายการมี name, status, error_code,
+        driver_version, driver_date และ driver_status
+        """
+        raise NotImplementedError
+
+    def controller_states(self):
+        """
+        ค่าที่เปลี่ยนได้ของการ์ดจอแต่ละใบ (status, error_code, driver_status) ลำดับเดียวกับ video_controllers()
+        backend ย่อยควรอ่านเฉพาะค่าเหล่านี้ให้เร็วกว่าการอ่านข้อมูลทั้งหมด
+        """
+        return [{key: controller[key] for key in CONTROLLER_STATE_FIELDS}
+                for controller in self.video_controllers()]
+
+    def probe_gpus(self, result, read=None):
+        """เพิ่มสถานะการ์ดจอลงใน result['gpu_status']"""
+        read = read or self.read_query
+        gpu_found = False
+
+        # ลองใช้ GPUtil ก่อน
+        try:
+            for gpu in read(QUERY_GPUS):
+                gpu_found = True
+                gpu_id = f"gpu_{gpu['index']}"
+                result['gpu_status'][gpu_id] = {
+                    'name': gpu['name'],
+                    'status': "OK",
+                    'error_code': 0,
+                    'driver_version': gpu['driver_version'],
+                    'driver_status': "normal",
+                    'load': f"{gpu['load']:.1f}%",
+                    'temperature': f"{gpu['temperature']}°C",
+                    'memory_used': f"{gpu['memory_used']}MB / {gpu['memory_total']}MB",
+                    'error_description': "ทำงานปกติ"
+                }
+        except ProbeTimeout as timeout:
+            result.setdefault('probe_timeouts', []).append(timeout.query)
+        except Exception:
+            pass  # ถ้าใช้ GPUtil ไม่ได้ จะใช้ข้อมูลจากระบบปฏิบัติการแทน
+
+        # ถ้ายังไม่พบ GPU ให้ใช้ข้อมูลการ์ดจอจากระบบปฏิบัติการ
+        if not gpu_found:
+            for idx, controller in enumerate(read(QUERY_CONTROLLERS)):
+                gpu_found = True
+                result['gpu_status'][f"gpu_{idx}"] = {
+                    'name': controller['name'],
+                    'status': controller['status'],
+                    'error_code': controller['error_code'],
+                    'driver_version': controller['driver_version'],
+                    'driver_status': controller['driver_status'],
+                    'driver_date': controller['driver_date'],
+                    'error_description': get_error_description(controller['error_code'])
+                }
+
+        if not gpu_found:
+            result['gpu_status']['gpu_0'] = {
+                'name': "ไม่พบการ์ดจอ",
+                'status': "Not found",
+                'error_code': -1,
+                'driver_version': "N/A",
+                'driver_status': "error",
+                'error_description': "ไม่พบการ์ดจอในระบบ หรือไม่สามารถเข้าถึงข้อมูลได้"
+            }
+
+    def close_thread(self):
+        """คืนทรัพยากรของเธรดปัจจุบัน (เรียกก่อนเธรดตรวจสอบจบการทำงาน)"""
+
+
+class WindowsProbeBackend(ProbeBackend):
+    """ตรวจสอบผ่าน WMI (WmiMonitorConnectionParams และ Win32_VideoController)"""
+
+    name = "windows"
+
+    def __init__(self, wmi_pool=None, gputil_module=None, nvml_module=None,
+                 inventory_ttl=GPU_INVENTORY_TTL):
+        super(WindowsProbeBackend, self).__init__(gputil_module, nvml_module, inventory_ttl)
+        self.wmi_pool = wmi_pool or WMIConnectionPool()
+
+    def probe_monitors(self, result):
+        for monitor in self.wmi_pool.query(WMI_NAMESPACE_MONITOR, "WmiMonitorConnectionParams"):
+            try:
+                conn_type = monitor.VideoOutputTechnology
+                is_active = monitor.Active
+
+                monitor_info = {
+                    'instance_name': monitor.InstanceName,
+                    'connection_type': conn_type,
+                    'active': is_active,
+                    'status': 'normal'
+                }
+
+                result['hdmi_devices'].append(monitor_info)
+
+                if conn_type == CONNECTION_TYPE_HDMI:  # 5 = HDMI
+                    result['hdmi_connected'] = True
+                    if is_active:
+                        result['hdmi_active'] = True
+            except Exception as monitor_error:
+                monitor_info = {
+                    'instance_name': getattr(monitor, 'InstanceName', 'Unknown'),
+                    'connection_type': -1,
+                    'active': False,
+                    'status': f'error: {str(monitor_error)}'
+                }
+                result['hdmi_devices'].append(monitor_info)
+
+    def video_controllers(self):
+        controllers = []
+        for gpu in self.wmi_pool.query(WMI_NAMESPACE_DEFAULT, "Win32_VideoController"):
+            controller = {
+                'name': getattr(gpu, 'Name', 'Unknown GPU'),
+                'driver_version': getattr(gpu, 'DriverVersion', 'Unknown'),
+                'driver_date': getattr(gpu, 'DriverDate', 'Unknown')
+            }
+            controller.update(self._controller_state(gpu))
+            controllers.append(controller)
+        return controllers
+
+    def controller_states(self):
+        # อ่านเฉพาะคุณสมบัติที่เปลี่ยนได้ ไม่อ่านข้อมูลไดรเวอร์ทั้งหมดทุกรอบ
+        return [self._controller_state(gpu)
+                for gpu in self.wmi_pool.query(WMI_NAMESPACE_DEFAULT, "Win32_VideoController",
+                                               fields=("Status", "ConfigManagerErrorCode"))]
+
+    def _controller_state(self, gpu):
+        try:
+            if gpu.ConfigManagerErrorCode == 0:
+                if gpu.Status == "OK":
+                    driver_status = "normal"
+                else:
+                    driver_status = "warning"
+            else:
+                driver_status = "error"
+        except Exception:
+            driver_status = "unknown"
+
+        return {
+            'status': getattr(gpu, 'Status', 'Unknown'),
+            'error_code': getattr(gpu, 'ConfigManagerErrorCode', -1),
+            'driver_status': driver_status
+        }
+
+    def close_thread(self):
+        self.wmi_pool.close_thread()
+
+
+def _read_sysfs(path):
+    """อ่านไฟล์ sysfs ขนาดเล็ก คืนค่า None หากอ่านไม่ได้"""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class SysfsProbeBackend(ProbeBackend):
+    """
+    ตรวจสอบผ่าน Linux DRM ใน sysfs โดยอ่านไฟล์โดยตรง ไม่เรียกโปรแกรมภายนอก
+    จอภาพ: <drm_root>/cardN-<ชนิด>-M/{status,enabled}
+    การ์ดจอ: <drm_root>/cardN/device/uevent (ไดรเวอร์และ PCI ID)
+    กำหนด drm_root/module_root ให้ชี้ไปยังโครงสร้างไฟล์จำลองเพื่อใช้ทดสอบได้
+    """
+
+    name = "sysfs"
+
+    def __init__(self, drm_root=DRM_ROOT, module_root=SYS_MODULE_ROOT, gputil_module=None,
+                 nvml_module=None, inventory_ttl=GPU_INVENTORY_TTL):
+        super(SysfsProbeBackend, self).__init__(gputil_module, nvml_module, inventory_ttl)
+        self.drm_root = drm_root
+        self.module_root = module_root
+
+    def probe_monitors(self, result):
+        for path in sorted(glob.glob(os.path.join(self.drm_root, "card*-*"))):
+            if _read_sysfs(os.path.join(path, "status")) != "connected":
+                continue
+
+            name = os.path.basename(path)
+            # cardN-HDMI-A-1 -> HDMI-A
+            connector = name.split("-", 1)[1].rsplit("-", 1)[0]
+            conn_type = DRM_CONNECTOR_TYPES.get(connector, -1)
+            is_active = _read_sysfs(os.path.join(path, "enabled")) == "enabled"
+
+            result['hdmi_devices'].append({
+                'instance_name': name,
+                'connection_type': conn_type,
+                'active': is_active,
+                'status': 'normal'
+            })
+
+            if conn_type == CONNECTION_TYPE_HDMI:
+                result['hdmi_connected'] = True
+                if is_active:
+                    result['hdmi_active'] = True
+
+    def video_controllers(self):
+        controllers = []
+        for path in sorted(glob.glob(os.path.join(self.drm_root, "card[0-9]*"))):
+            if "-" in os.path.basename(path):
+                continue  # คอนเนกเตอร์ ไม่ใช่การ์ดจอ
+
+            uevent = {}
+            for line in (_read_sysfs(os.path.join(path, "device", "uevent")) or "").splitlines():
+                key, _, value = line.partition("=")
+                uevent[key] = value
+
+            driver = uevent.get("DRIVER")
+            vendor_id, _, device_id = uevent.get("PCI_ID", "").upper().partition(":")
+            vendor = PCI_VENDORS.get(vendor_id, vendor_id or "Unknown")
+            name = f"{vendor} GPU {device_id}".strip()
+            if driver:
+                name += f" ({driver})"
+
+            version = _read_sysfs(os.path.join(self.module_root, driver, "version")) if driver else None
+            controllers.append({
+                'name': name,
+                'status': "OK" if driver else "Error",
+                'error_code': 0 if driver else 28,  # 28 = ไม่มีไดรเวอร์ติดตั้ง
+                'driver_version': version or "Unknown",
+                'driver_date': "Unknown",
+                'driver_status': "normal" if driver else "error"
+            })
+        return controllers
+
+
+def create_probe_backend(name="auto", **kwargs):
+    """สร้าง backend ตามชื่อ ("windows", "sysfs" หรือ "auto" เพื่อเลือกตามระบบปฏิบัติการ)"""
+    if name == "auto":
+        name = "windows" if sys.platform.startswith("win") else "sysfs"
+    if name == "windows":
+        return WindowsProbeBackend(**kwargs)
+    if name == "sysfs":
+        return SysfsProbeBackend(**kwargs)
+    raise ValueError(f"Unknown probe backend: {name}")
@@ -0,0 +1,1046 @@
+"""
+รูปแบบการจัดเก็บล็อกเหตุการณ์ของ HDMI Monitor
+"""
+import os
+import copy
+import json
+import zlib
+import gzip
+import sqlite3
+import datetime
+import threading
+import queue
+import time
+import itertools
+
+# รูปแบบการจัดเก็บที่รองรับ
+STORAGE_JSON = "json"    # ไฟล์ JSON array แบบเดิม (เขียนทับทั้งไฟล์ทุกครั้ง)
+STORAGE_JSONL = "jsonl"  # ไฟล์ JSON Lines แบบต่อท้าย (append-only)
+STORAGE_SQLITE = "sqlite"  # ฐานข้อมูล SQLite (WAL) พร้อมดัชนีเวลาและประเภทเหตุการณ์
+
+INDEX_SUFFIX = ".idx"  # นามสกุลไฟล์ดัชนีวันที่ที่เก็บคู่กับไฟล์ JSONL
+INDEX_VERSION = 1
+INDEX_HEAD_BYTES = 256  # จำนวนไบต์ต้นไฟล์ที่ใช้ตรวจว่าไฟล์ล็อกถูกแทนที่หรือไม่
+
+ARCHIVE_DIR_NAME = "log_archive"  # โฟลเดอร์เก็บล็อกเก่าที่บีบอัดแล้ว (แยกไฟล์ตามวัน)
+ARCHIVE_SUFFIX = ".jsonl.gz"
+MIGRATED_SUFFIX = ".migrated"  # ไฟล์บันทึกวันที่ย้ายล็อกจากไฟล์เดิม (เริ่มนับอายุของล็อกที่ย้ายมาจากวันนั้น)
+
+# การเก็บสถานะแบบ delta: บางรายการเก็บสถานะเต็ม (keyframe) รายการอื่นเก็บเฉพาะส่วนที่เปลี่ยน
+DELTA_KEY = "status_delta"  # คีย์ของ diff สถานะในรายการที่ไม่ใช่ keyframe
+DELETED_KEY = "$del"  # รายชื่อคีย์ที่ถูกลบออกใน diff
+
+
+def encode_log_line(log_entry):
+    """แปลงรายการล็อกเป็นข้อความหนึ่งบรรทัดสำหรับไฟล์ JSONL"""
+    return json.dumps(log_entry, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+
+def log_date_key(log_entry):
+    """คืนค่าวันที่ (yyyy-MM-dd) ของรายการล็อก"""
+    return log_entry['timestamp'].split('T')[0]
+
+
+def _time_key(value):
+    """แปลง datetime/date/ข้อความ เป็นข้อความ ISO สำหรับเปรียบเทียบกับ timestamp"""
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def next_day_key(date_key):
+    """คืนค่าวันถัดไปของวันที่ yyyy-MM-dd"""
+    return (datetime.date.fromisoformat(date_key) + datetime.timedelta(days=1)).isoformat()
+
+
+def filter_logs(logs, start=None, end=None, event_types=None, limit=None, newest_first=False):
+    """
+    กรองรายการล็อกตามช่วงเวลา [start, end) และประเภทเหตุการณ์
+    ใช้กับที่เก็บแบบไฟล์ที่ไม่มีดัชนีในตัว
+    """
+    start, end = _time_key(start), _time_key(end)
+    if isinstance(event_types, str):
+        event_types = [event_types]
+    event_types = set(event_types) if event_types else None
+
+    result = [
+        log for log in logs
+        if (start is None or log['timestamp'] >= start)
+        and (end is None or log['timestamp'] < end)
+        and (event_types is None or log.get('event_type') in event_types)
+    ]
+    if newest_first:
+        result.reverse()
+    if limit is not None:
+        if newest_first:
+            result = result[:limit]
+        else:
+            result = result[len(result) - limit:] if limit else []
+    return result
+
+
+def _days_ago(date_key, days):
+    """คืนค่าวันที่ย้อนหลังจาก date_key ไป days วัน"""
+    return (datetime.date.fromisoformat(date_key) - datetime.timedelta(days=days)).isoformat()
+
+
+def retention_cutoff(today, retention_days, retention_start=None):
+    """
+    วันที่ (yyyy-MM-dd) ที่ล็อกก่อนหน้านั้นต้องถูกลบ หรือ None หากยังไม่ต้องลบ
+    ล็อกที่ย้ายมาจากไฟล์เดิมเมื่อ retention_start นับอายุจากวันที่ย้าย
+    จึงไม่ถูกลบทันทีในการเปิดครั้งแรกหลังอัปเกรด แม้ตัวล็อกจะเก่ากว่า retention_days วัน
+    """
+    if not retention_days:
+        return None
+    cutoff = _days_ago(today, retention_days)
+    if retention_start and cutoff < retention_start:
+        return None  # ล็อกที่ใหม่กว่าวันที่ย้ายยังไม่เก่าพอ ส่วนล็อกที่ย้ายมายังไม่ครบอายุ
+    return cutoff
+
+
+def read_retention_start(log_path):
+    """วันที่ย้ายล็อกจากไฟล์เดิมของ log_path (None หากไม่เคยย้าย)"""
+    try:
+        with open(log_path + MIGRATED_SUFFIX, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def mark_migrated(log_path, today=None):
+    """บันทึกวันที่ย้ายล็อกจากไฟล์เดิมมาที่ log_path คืนค่าวันที่นั้น"""
+    today = today or datetime.date.today().isoformat()
+    try:
+        with open(log_path + MIGRATED_SUFFIX, 'w', encoding='utf-8') as f:
+            f.write(today + "\n")
+    except OSError as e:
+        print(f"Error writing log migration marker: {str(e)}")
+    return today
+
+
+def diff_status(old, new):
+    """
+    สร้าง diff ของสถานะ new เทียบกับ old
+    dict ย่อยที่มีอยู่ทั้งสองฝั่งจะถูก diff ซ้อนลงไป ค่าอื่นที่เปลี่ยนจะถูกเก็บทั้งค่า
+    """
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+            continue
+        old_value = old[key]
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            sub_patch = diff_status(old_value, value)
+            if sub_patch:
+                patch[key] = sub_patch
+        elif value != old_value or type(value) is not type(old_value):
+            patch[key] = value
+
+    deleted = [key for key in old if key not in new]
+    if deleted:
+        patch[DELETED_KEY] = deleted
+    return patch
+
+
+def apply_status_delta(old, patch):
+    """สร้างสถานะใหม่จากสถานะก่อนหน้าและ diff (ไม่แก้ไข old)"""
+    result = dict(old)
+    for key, value in patch.items():
+        if key == DELETED_KEY:
+            continue
+        if isinstance(value, dict) and isinstance(old.get(key), dict):
+            result[key] = apply_status_delta(old[key], value)
+        else:
+            result[key] = value
+    for key in patch.get(DELETED_KEY, []):
+        result.pop(key, None)
+    return result
+
+
+class SnapshotEncoder:
+    """
+    แปลงรายการล็อกเป็นรูปแบบ delta ก่อนเขียนลงไฟล์
+    จะเขียน keyframe (สถานะเต็ม) เมื่อเริ่มไฟล์ใหม่ เมื่อขึ้นวันใหม่ และทุก keyframe_interval รายการ
+    ทำให้ทุกช่วงไบต์ของแต่ละวันเริ่มต้นด้วย keyframe และอ่านแยกวันได้
+    """
+
+    def __init__(self, keyframe_interval=100):
+        self.keyframe_interval = keyframe_interval
+        self.reset()
+
+    def reset(self):
+        """บังคับให้รายการถัดไปเป็น keyframe"""
+        self._base_status = None
+        self._base_day = None
+        self._since_keyframe = 0
+
+    def encode(self, log_entry):
+        status = log_entry.get('status')
+        if not isinstance(status, dict):
+            return log_entry
+
+        day = log_date_key(log_entry)
+        if (self._base_status is None or day != self._base_day
+                or self._since_keyframe >= self.keyframe_interval):
+            encoded = log_entry
+            self._since_keyframe = 0
+        else:
+            encoded = {key: value for key, value in log_entry.items() if key != 'status'}
+            encoded[DELTA_KEY] = diff_status(self._base_status, status)
+            self._since_keyframe += 1
+
+        self._base_status = copy.deepcopy(status)
+        self._base_day = day
+        return encoded
+
+
+class SnapshotDecoder:
+    """สร้างรายการล็อกเต็มจากลำดับ keyframe และ delta ที่อ่านจากไฟล์"""
+
+    def __init__(self):
+        self._status = None
+
+    def decode(self, log_entry):
+        """คืนค่ารายการล็อกที่มีสถานะเต็ม หรือ None หากไม่มี keyframe ก่อนหน้า"""
+        if DELTA_KEY in log_entry:
+            if self._status is None:
+                return None
+            log_entry = dict(log_entry)
+            self._status = apply_status_delta(self._status, log_entry.pop(DELTA_KEY))
+            log_entry['status'] = self._status
+        elif isinstance(log_entry.get('status'), dict):
+            self._status = log_entry['status']
+        return log_entry
+
+
+def _iter_decoded(lines):
+    """แปลงบรรทัด JSONL เป็นรายการล็อกเต็ม ข้ามบรรทัดที่เสียหาย"""
+    decoder = SnapshotDecoder()
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            log_entry = decoder.decode(json.loads(line))
+        except (ValueError, AttributeError, TypeError):
+            continue
+        if log_entry is not None:
+            yield log_entry
+
+
+def _parse_lines(data):
+    """แปลงข้อมูล JSONL หลายบรรทัดเป็นรายการล็อก"""
+    return list(_iter_decoded(data.splitlines()))
+
+
+def _line_date_key(line):
+    """อ่านวันที่จากบรรทัด JSONL โดยไม่ต้องแปลง JSON ทั้งบรรทัดหากทำได้"""
+    marker = b'"timestamp":"'
+    pos = line.find(marker)
+    if pos != -1:
+        start = pos + len(marker)
+        return line[start:start + 10].decode('ascii', 'replace')
+    try:
+        return log_date_key(json.loads(line))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def iter_json_array(path, chunk_size=64 * 1024):
+    """
+    อ่านสมาชิกของไฟล์ JSON array ทีละรายการโดยไม่โหลดทั้งไฟล์
+    ใช้หน่วยความจำตามขนาดของรายการที่ใหญ่ที่สุด ไม่ใช่ขนาดไฟล์
+    หากไฟล์เสียหายจะเกิด ValueError หลังจากส่งรายการที่อ่านได้ออกไปแล้ว
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ""
+        pos = 0
+        eof = False
+        started = False
+
+        while True:
+            # ข้ามช่องว่างและตัวคั่น โดยอ่านข้อมูลเพิ่มเมื่อบัฟเฟอร์หมด
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n\ufeff" + ("," if started else ""):
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                buf = f.read(chunk_size)
+                pos = 0
+                eof = not buf
+
+            if pos >= len(buf):
+                raise ValueError(f"Unexpected end of JSON array in {path}")
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path} is not a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                    # ค่าที่จบพอดีท้ายบัฟเฟอร์อาจยังอ่านไม่ครบ (เช่น ตัวเลข)
+                    if end < len(buf) or eof:
+                        break
+                except ValueError:
+                    if eof:
+                        raise
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+
+            yield item
+            pos = end
+            if pos > chunk_size:
+                buf = buf[pos:]
+                pos = 0
+
+
+class JsonArrayLogStore:
+    """ที่เก็บล็อกแบบ JSON array (รูปแบบเดิมของ hdmi_monitor_log.json)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._ensure_file()
+
+    def _ensure_file(self):
+        """สร้างไฟล์ล็อกหากยังไม่มี"""
+        if not os.path.exists(self.path):
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump([], f, ensure_ascii=False)
+
+    def append(self, log_entry):
+        """เพิ่มรายการล็อก (ต้องอ่านและเขียนทับทั้งไฟล์)"""
+        self.append_many([log_entry])
+
+    def append_many(self, log_entries, fsync=False):
+        """เพิ่มรายการล็อกหลายรายการด้วยการเขียนทับไฟล์เพียงครั้งเดียว"""
+        logs = self.read_all()
+        logs.extend(log_entries)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(logs, f, ensure_ascii=False, indent=2)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def iter_entries(self):
+        """อ่านล็อกทีละรายการแบบสตรีม หยุดเมื่อพบส่วนที่เสียหาย"""
+        try:
+            yield from iter_json_array(self.path)
+        except ValueError as e:
+            print(f"Error reading logs: {str(e)}")
+
+    def read_all(self):
+        """อ่านล็อกทั้งหมด"""
+        return list(self.iter_entries())
+
+    def read_day(self, date_key):
+        """
+        อ่านล็อกของวันที่ระบุ
+        ล็อกถูกเขียนเรียงตามเวลา จึงหยุดอ่านทันทีเมื่อพบรายการของวันถัดไป
+        """
+        logs = []
+        for log in self.iter_entries():
+            log_day = log_date_key(log)
+            if log_day == date_key:
+                logs.append(log)
+            elif log_day > date_key:
+                break
+        return logs
+
+    def query(self, start=None, end=None, event_types=None, limit=None, newest_first=False):
+        """ค้นหาล็อกตามช่วงเวลาและประเภทเหตุการณ์ (หยุดอ่านเมื่อเลยเวลา end)"""
+        entries = self.iter_entries()
+        if end is not None:
+            end_key = _time_key(end)
+            entries = itertools.takewhile(lambda log: log['timestamp'] < end_key, entries)
+        return filter_logs(entries, start, end, event_types, limit, newest_first)
+
+
+class LogDayIndex:
+    """
+    ดัชนีตำแหน่งไบต์ของล็อกในไฟล์ JSONL แยกตามวันที่ บันทึกไว้ในไฟล์ .idx
+    แต่ละวันเก็บเป็นช่วง [เริ่ม, จบ) ที่ต่อเนื่องกันในไฟล์ล็อก
+    หากไฟล์ดัชนีหายไป เสียหาย หรือไม่ตรงกับไฟล์ล็อก จะสร้างใหม่อัตโนมัติ
+    """
+
+    def __init__(self, log_path, index_path=None):
+        self.log_path = log_path
+        self.index_path = index_path or log_path + INDEX_SUFFIX
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        """ล้างดัชนีเพื่อสร้างใหม่ทั้งหมด"""
+        self.days = {}
+        self.indexed_size = 0
+        self.head_len = 0
+        self.head_crc = 0
+        self._dirty = True
+
+    def _load(self):
+        """โหลดดัชนีจากไฟล์ หากอ่านไม่ได้จะเริ่มจากดัชนีว่าง"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != INDEX_VERSION:
+                return
+            self.days = {day: [list(span) for span in spans] for day, spans in data['days'].items()}
+            self.indexed_size = int(data['indexed_size'])
+            self.head_len = int(data['head_len'])
+            self.head_crc = int(data['head_crc'])
+            self._dirty = False
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self._reset()
+
+    def save(self):
+        """บันทึกดัชนีลงไฟล์ (เขียนไฟล์ชั่วคราวแล้วเปลี่ยนชื่อ)"""
+        data = {
+            'version': INDEX_VERSION,
+            'indexed_size': self.indexed_size,
+            'head_len': self.head_len,
+            'head_crc': self.head_crc,
+            'days': self.days
+        }
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+        except OSError as e:
+            print(f"Error saving log index: {str(e)}")
+
+    def _read_head(self, f, length):
+        f.seek(0)
+        return zlib.crc32(f.read(length))
+
+    def _add_span(self, date_key, start, end):
+        spans = self.days.setdefault(date_key, [])
+        if spans and spans[-1][1] == start:
+            spans[-1][1] = end
+        else:
+            spans.append([start, end])
+        self._dirty = True
+
+    def _scan(self, f):
+        """อ่านเฉพาะส่วนท้ายไฟล์ที่ยังไม่อยู่ในดัชนี"""
+        f.seek(self.indexed_size)
+        pos = self.indexed_size
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            date_key = _line_date_key(line)
+            if date_key:
+                self._add_span(date_key, pos, pos + len(line))
+            pos += len(line)
+        self.indexed_size = pos
+        self._dirty = True
+
+    def refresh(self):
+        """ตรวจว่าดัชนีตรงกับไฟล์ล็อก สร้างใหม่หรือเพิ่มส่วนท้ายตามความจำเป็น"""
+        size = os.path.getsize(self.log_path)
+        with open(self.log_path, 'rb') as f:
+            if size < self.indexed_size or self._read_head(f, self.head_len) != self.head_crc:
+                self._reset()
+            if size > self.indexed_size:
+                self._scan(f)
+            if self.head_len < INDEX_HEAD_BYTES and self.indexed_size > self.head_len:
+                self.head_len = min(INDEX_HEAD_BYTES, self.indexed_size)
+                self.head_crc = self._read_head(f, self.head_len)
+        if self._dirty:
+            self.save()
+
+    def rebuild(self):
+        """สร้างดัชนีใหม่ทั้งหมดจากไฟล์ล็อก"""
+        self._reset()
+        self.refresh()
+
+    def note_append(self, date_key, start, end):
+        """บันทึกตำแหน่งของรายการที่เพิ่งเขียนต่อท้ายไฟล์"""
+        if start == self.indexed_size:
+            self._add_span(date_key, start, end)
+            self.indexed_size = end
+
+    def spans(self, date_key):
+        """คืนค่าช่วงไบต์ทั้งหมดของวันที่ระบุ"""
+        self.refresh()
+        return list(self.days.get(date_key, []))
+
+
+class JsonlLogStore:
+    """
+    ที่เก็บล็อกแบบ JSON Lines หนึ่งรายการต่อหนึ่งบรรทัด
+    การเพิ่มรายการเป็นการเขียนต่อท้ายไฟล์ จึงใช้เวลาคงที่ไม่ขึ้นกับขนาดประวัติ
+    delta=True จะเก็บสถานะเต็มเป็นระยะ (keyframe) และเก็บเฉพาะส่วนที่เปลี่ยนในรายการอื่น
+
+    การหมุนไฟล์ (rotation): เมื่อไฟล์ใหญ่เกิน max_bytes หรือมีล็อกเก่ากว่า max_age_days วัน
+    ล็อกจะถูกย้ายไปบีบอัดเป็น gzip แยกไฟล์ตามวันใน archive_dir
+    และไฟล์เก็บถาวรที่เก่ากว่า retention_days วันจะถูกลบ (ล็อกที่ย้ายมาจากไฟล์เดิมนับอายุจาก retention_start)
+    """
+
+    def __init__(self, path, max_bytes=None, max_age_days=None, retention_days=None, archive_dir=None,
+                 delta=False, keyframe_interval=100, retention_start=None):
+        self.path = path
+        self.encoder = SnapshotEncoder(keyframe_interval) if delta else None
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.retention_days = retention_days
+        self.retention_start = retention_start  # วันที่ย้ายล็อกจากไฟล์เดิม (ดู retention_cutoff)
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(os.path.abspath(path)), ARCHIVE_DIR_NAME)
+        self._archive_prefix = os.path.splitext(os.path.basename(path))[0] + "-"
+        self._retention_checked_day = None
+
+        self._ensure_file()
+        self.recover()
+        self.index = LogDayIndex(path)
+        try:
+            self.index.refresh()
+            self.maybe_rotate()
+        except Exception as e:
+            print(f"Error rotating log file: {str(e)}")
+
+    def _ensure_file(self):
+        """สร้างไฟล์ล็อกหากยังไม่มี"""
+        if not os.path.exists(self.path):
+            open(self.path, 'ab').close()
+
+    def recover(self):
+        """
+        ตัดบรรทัดสุดท้ายที่เขียนไม่ครบ (เช่น เครื่องดับระหว่างเขียน) ออกจากไฟล์
+        คืนค่าจำนวนไบต์ที่ถูกตัดทิ้ง
+        """
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return 0
+
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return 0
+
+            # ค้นหาตำแหน่งขึ้นบรรทัดใหม่ล่าสุดทีละก้อนจากท้ายไฟล์
+            chunk_size = 64 * 1024
+            end = size
+            keep = 0
+            while end > 0:
+                start = max(0, end - chunk_size)
+                f.seek(start)
+                chunk = f.read(end - start)
+                pos = chunk.rfind(b"\n")
+                if pos != -1:
+                    keep = start + pos + 1
+                    break
+                end = start
+
+            f.truncate(keep)
+            print(f"Recovered log file {self.path}: dropped {size - keep} bytes of partial entry")
+            return size - keep
+
+    def append(self, log_entry):
+        """เขียนรายการล็อกต่อท้ายไฟล์ในการเขียนครั้งเดียว"""
+        self.append_many([log_entry])
+
+    def append_many(self, log_entries, fsync=False):
+        """เขียนรายการล็อกหลายรายการต่อท้ายไฟล์ในการเขียนครั้งเดียว"""
+        if self.encoder is not None:
+            encoded = [self.encoder.encode(log_entry) for log_entry in log_entries]
+        else:
+            encoded = log_entries
+        lines = [encode_log_line(log_entry).encode('utf-8') for log_entry in encoded]
+        with open(self.path, 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            start = f.tell()
+            f.write(b"".join(lines))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        for log_entry, line in zip(log_entries, lines):
+            self.index.note_append(log_date_key(log_entry), start, start + len(line))
+            start += len(line)
+
+        self.maybe_rotate(size=start)
+
+    def archive_path(self, date_key):
+        """ตำแหน่งไฟล์เก็บถาวรของวันที่ระบุ"""
+        return os.path.join(self.archive_dir, f"{self._archive_prefix}{date_key}{ARCHIVE_SUFFIX}")
+
+    def archived_days(self):
+        """วันที่ที่มีไฟล์เก็บถาวร เรียงจากเก่าไปใหม่"""
+        try:
+            names = os.listdir(self.archive_dir)
+        except OSError:
+            return []
+        days = [
+            name[len(self._archive_prefix):-len(ARCHIVE_SUFFIX)]
+            for name in names
+            if name.startswith(self._archive_prefix) and name.endswith(ARCHIVE_SUFFIX)
+        ]
+        return sorted(days)
+
+    def _read_archive(self, date_key):
+        """อ่านล็อกจากไฟล์เก็บถาวรของวันที่ระบุ (แตกไฟล์เฉพาะวันนั้น)"""
+        lines = []
+        try:
+            with gzip.open(self.archive_path(date_key), 'rb') as gz:
+                for line in gz:
+                    lines.append(line)
+        except FileNotFoundError:
+            return []
+        except (OSError, EOFError) as e:
+            # ส่วนท้ายของไฟล์เขียนไม่ครบ ใช้เท่าที่อ่านได้
+            print(f"Error reading log archive for {date_key}: {str(e)}")
+        return _parse_lines(b"".join(lines))
+
+    def maybe_rotate(self, today=None, size=None):
+        """หมุนไฟล์และลบไฟล์เก็บถาวรที่หมดอายุ หากถึงเกณฑ์ที่กำหนด"""
+        today = today or datetime.date.today().isoformat()
+        if size is None:
+            size = os.path.getsize(self.path)
+
+        if self.max_bytes and size > self.max_bytes:
+            self.rotate(today, include_today=True)
+        elif self.max_age_days and self.index.days:
+            if min(self.index.days) <= _days_ago(today, self.max_age_days):
+                self.rotate(today)
+
+        if self.retention_days and self._retention_checked_day != today:
+            self.apply_retention(today)
+            self._retention_checked_day = today
+
+    def rotate(self, today=None, include_today=False):
+        """
+        ย้ายล็อกของวันก่อนหน้า (หรือทุกวันหาก include_today) ไปเก็บเป็น gzip แยกตามวัน
+        คืนค่าจำนวนวันที่ถูกย้ายออกจากไฟล์หลัก
+        """
+        today = today or datetime.date.today().isoformat()
+        self.index.refresh()
+
+        keep = []
+        moved = 0
+        with open(self.path, 'rb') as f:
+            for day in sorted(self.index.days):
+                spans = self.index.days[day]
+                if day >= today and not include_today:
+                    keep.extend(spans)
+                    continue
+
+                data = []
+                for start, end in spans:
+                    f.seek(start)
+                    data.append(f.read(end - start))
+                os.makedirs(self.archive_dir, exist_ok=True)
+                # gzip รองรับการต่อท้ายหลาย member ในไฟล์เดียว จึงเพิ่มล็อกของวันเดิมได้
+                with gzip.open(self.archive_path(day), 'ab') as gz:
+                    gz.write(b"".join(data))
+                moved += 1
+
+        if moved:
+            self._rewrite(keep)
+        return moved
+
+    def purge(self, before):
+        """
+        ทิ้งล็อกของวันที่เก่ากว่า before ออกจากไฟล์หลักโดยไม่เก็บถาวร
+        ล็อกของวันอื่นยังอยู่ในไฟล์หลักตามเดิม (ไม่ถูกย้ายไปเก็บเป็น gzip)
+        คืนค่าจำนวนวันที่ถูกทิ้ง
+        """
+        self.index.refresh()
+        dropped = [day for day in self.index.days if day < before]
+        if dropped:
+            self._rewrite([span for day, spans in self.index.days.items() if day >= before for span in spans])
+        return len(dropped)
+
+    def _rewrite(self, keep):
+        """เขียนไฟล์หลักใหม่ให้เหลือเฉพาะช่วงไบต์ใน keep (เขียนไฟล์ชั่วคราวแล้วแทนที่)"""
+        remaining = []
+        with open(self.path, 'rb') as f:
+            for start, end in sorted(keep):
+                f.seek(start)
+                remaining.append(f.read(end - start))
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(b"".join(remaining))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.index.rebuild()
+        if self.encoder is not None:
+            # ไฟล์หลักอาจว่างหรือเริ่มใหม่ รายการถัดไปต้องเป็น keyframe
+            self.encoder.reset()
+
+    def apply_retention(self, today=None):
+        """ลบล็อกและไฟล์เก็บถาวรที่เก่ากว่า retention_days วัน คืนค่าจำนวนวันที่ถูกลบ"""
+        today = today or datetime.date.today().isoformat()
+        cutoff = retention_cutoff(today, self.retention_days, self.retention_start)
+        if cutoff is None:
+            return 0
+
+        removed = 0
+        for day in self.archived_days():
+            if day < cutoff:
+                try:
+                    os.remove(self.archive_path(day))
+                    removed += 1
+                except OSError as e:
+                    print(f"Error removing log archive {day}: {str(e)}")
+
+        # ทิ้งเฉพาะวันที่หมดอายุ วันอื่นในไฟล์หลักจะถูกเก็บถาวรตามเกณฑ์ของ maybe_rotate() เท่านั้น
+        removed += self.purge(cutoff)
+        if removed:
+            print(f"Log retention removed {removed} days of logs older than {cutoff} from {self.path}")
+        return removed
+
+    def iter_entries(self, first_day=None, last_day=None):
+        """
+        อ่านล็อกทีละรายการ (รวมไฟล์เก็บถาวร) ข้ามบรรทัดที่เสียหาย
+        ระบุ first_day/last_day เพื่อข้ามไฟล์เก็บถาวรที่อยู่นอกช่วง
+        """
+        for day in self.archived_days():
+            if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+                yield from self._read_archive(day)
+
+        with open(self.path, 'rb') as f:
+            # บรรทัดสุดท้ายที่ไม่มีขึ้นบรรทัดใหม่คือรายการที่ยังเขียนไม่เสร็จ
+            yield from _iter_decoded(line for line in f if line.endswith(b"\n"))
+
+    def read_all(self):
+        """อ่านล็อกทั้งหมด"""
+        return list(self.iter_entries())
+
+    def read_day(self, date_key):
+        """
+        อ่านล็อกของวันที่ระบุ จากไฟล์เก็บถาวรของวันนั้น (ถ้ามี)
+        และจากช่วงไบต์ของวันนั้นในไฟล์หลักตามดัชนี
+        """
+        logs = self._read_archive(date_key)
+        with open(self.path, 'rb') as f:
+            for start, end in self.index.spans(date_key):
+                f.seek(start)
+                logs.extend(log for log in _parse_lines(f.read(end - start)) if log_date_key(log) == date_key)
+        return logs
+
+    def query(self, start=None, end=None, event_types=None, limit=None, newest_first=False):
+        """ค้นหาล็อกตามช่วงเวลาและประเภทเหตุการณ์"""
+        first_day = _time_key(start)[:10] if start is not None else None
+        last_day = _time_key(end)[:10] if end is not None else None
+        return filter_logs(self.iter_entries(first_day, last_day), start, end, event_types, limit, newest_first)
+
+
+class SqliteLogStore:
+    """
+    ที่เก็บล็อกในฐานข้อมูล SQLite โหมด WAL
+    มีดัชนีบน timestamp และ event_type ทำให้ค้นหาตามช่วงเวลา/ประเภทได้ในฐานข้อมูลโดยตรง
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS logs ("
+        " id INTEGER PRIMARY KEY,"
+        " timestamp TEXT NOT NULL,"
+        " event_type TEXT,"
+        " entry TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_event_type ON logs (event_type, timestamp)",
+    )
+
+    def __init__(self, path, retention_days=None, retention_start=None):
+        self.path = path
+        self.retention_days = retention_days
+        self.retention_start = retention_start  # วันที่นำเข้าล็อกจากไฟล์เดิม (ดู retention_cutoff)
+        self._retention_checked_day = None
+        # การเชื่อมต่อแยกต่อเธรด (WAL ให้เธรดอ่านทำงานพร้อมกับเธรดเขียนได้)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    @property
+    def conn(self):
+        """การเชื่อมต่อฐานข้อมูลของเธรดปัจจุบัน"""
+        return self._connection()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.synchronous = "NORMAL"
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """ปิดการเชื่อมต่อทั้งหมด"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def count(self):
+        """จำนวนรายการล็อกทั้งหมด"""
+        return self.conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+
+    def append(self, log_entry):
+        """เพิ่มรายการล็อก"""
+        self.append_many([log_entry])
+
+    def append_many(self, log_entries, fsync=False):
+        """
+        เพิ่มรายการล็อกหลายรายการในทรานแซกชันเดียว
+        fsync=True จะใช้ synchronous=FULL เพื่อให้ข้อมูลถึงดิสก์ก่อน commit เสร็จ
+        """
+        rows = [
+            (log['timestamp'], log.get('event_type'), json.dumps(log, ensure_ascii=False, separators=(',', ':')))
+            for log in log_entries
+        ]
+        conn = self.conn
+        synchronous = "FULL" if fsync else "NORMAL"
+        if self._local.synchronous != synchronous:
+            conn.execute(f"PRAGMA synchronous={synchronous}")
+            self._local.synchronous = synchronous
+        with conn:
+            conn.executemany("INSERT INTO logs (timestamp, event_type, entry) VALUES (?, ?, ?)", rows)
+
+        today = datetime.date.today().isoformat()
+        if self.retention_days and self._retention_checked_day != today:
+            self.apply_retention(today)
+            self._retention_checked_day = today
+
+    def apply_retention(self, today=None):
+        """ลบล็อกที่เก่ากว่า retention_days วัน คืนค่าจำนวนรายการที่ถูกลบ"""
+        today = today or datetime.date.today().isoformat()
+        cutoff = retention_cutoff(today, self.retention_days, self.retention_start)
+        if cutoff is None:
+            return 0
+        with self.conn as conn:
+            cursor = conn.execute("DELETE FROM logs WHERE timestamp < ?", (cutoff,))
+        if cursor.rowcount:
+            print(f"Log retention removed {cursor.rowcount} log entries older than {cutoff} from {self.path}")
+        return cursor.rowcount
+
+    def _select(self, where="", params=(), order="ASC", limit=None):
+        sql = "SELECT entry FROM logs"
+        if where:
+            sql += " WHERE " + where
+        sql += f" ORDER BY timestamp {order}, id {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = tuple(params) + (limit,)
+        return [json.loads(row[0]) for row in self.conn.execute(sql, params)]
+
+    def read_all(self):
+        """อ่านล็อกทั้งหมด"""
+        return self._select()
+
+    def read_day(self, date_key):
+        """อ่านล็อกของวันที่ระบุด้วยดัชนี timestamp"""
+        return self._select("timestamp >= ? AND timestamp < ?", (date_key, next_day_key(date_key)))
+
+    def query(self, start=None, end=None, event_types=None, limit=None, newest_first=False):
+        """ค้นหาล็อกตามช่วงเวลา [start, end) และประเภทเหตุการณ์ภายในฐานข้อมูล"""
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_time_key(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(_time_key(end))
+        if event_types:
+            if isinstance(event_types, str):
+                event_types = [event_types]
+            clauses.append("event_type IN (%s)" % ",".join("?" * len(event_types)))
+            params.extend(event_types)
+
+        where = " AND ".join(clauses)
+        if newest_first or limit is None:
+            return self._select(where, params, "DESC" if newest_first else "ASC", limit)
+
+        # N รายการล่าสุดแต่เรียงจากเก่าไปใหม่
+        logs = self._select(where, params, "DESC", limit)
+        logs.reverse()
+        return logs
+
+    def import_file(self, path):
+        """
+        นำเข้าล็อกจากไฟล์ JSON array หรือ JSONL เดิม
+        คืนค่าจำนวนรายการที่นำเข้า
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            is_array = f.read(4096).lstrip().startswith("[")
+
+        count = 0
+        with open(path, 'rb') as f:
+            entries = iter_json_array(path) if is_array else _iter_decoded(f)
+            while True:
+                batch = list(itertools.islice(entries, 1000))
+                if not batch:
+                    break
+                self.append_many(batch)
+                count += len(batch)
+
+        print(f"Imported {count} log entries from {path} into {self.path}")
+        return count
+
+
+_WRITER_STOP = object()  # สัญญาณให้เธรดเขียนล็อกหยุดทำงานหลังเขียนคิวที่ค้างอยู่หมด
+
+
+class BackgroundLogWriter:
+    """
+    เธรดเขียนล็อกเบื้องหลัง รับรายการผ่านคิวแล้วเขียนเป็นชุด (batch)
+    ชุดจะถูกเขียนเมื่อครบ batch_size รายการ หรือเมื่อครบ flush_interval วินาที
+    นับจากรายการแรกของชุด ทำให้เธรดที่เรียก submit ไม่ต้องรอดิสก์
+    """
+
+    def __init__(self, store, batch_size=50, flush_interval=0.5, fsync=True):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._queue = queue.Queue()
+        self._pending = []  # รายการที่ส่งเข้ามาแล้วแต่ยังเขียนไม่เสร็จ
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+        self._closed = False
+
+        self.entries_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self.last_batch_seconds = 0.0
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, log_entry):
+        """ส่งรายการล็อกเข้าคิว (ไม่บล็อก)"""
+        if self._closed:
+            raise RuntimeError("Log writer is closed")
+        # ใส่คิวขณะถือ lock เพื่อให้ลำดับในคิวตรงกับ _pending (_write_batch ตัดรายการจากหัวของ _pending)
+        with self._pending_lock:
+            self._pending.append(log_entry)
+            self._queue.put(log_entry)
+
+    def queue_depth(self):
+        """จำนวนรายการที่รอเขียนลงที่เก็บ"""
+        with self._pending_lock:
+            return len(self._pending)
+
+    def stats(self):
+        """สถิติการทำงานของเธรดเขียนล็อก"""
+        return {
+            'queue_depth': self.queue_depth(),
+            'entries_written': self.entries_written,
+            'batches_written': self.batches_written,
+            'write_errors': self.write_errors,
+            'last_batch_seconds': self.last_batch_seconds
+        }
+
+    def snapshot(self, read):
+        """
+        เรียก read() ขณะที่ไม่มีการเขียนชุดใดอยู่
+        คืนค่า (ผลลัพธ์ของ read, รายการที่ยังรอเขียน) ซึ่งไม่ซ้ำซ้อนกัน
+        """
+        with self._write_lock:
+            result = read()
+            with self._pending_lock:
+                pending = list(self._pending)
+        return result, pending
+
+    def flush(self):
+        """รอจนกว่ารายการในคิวทั้งหมดถูกเขียนแล้ว"""
+        self._queue.join()
+
+    def close(self, timeout=None):
+        """หยุดรับรายการใหม่และรอเขียนคิวที่ค้างอยู่ให้หมด"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_WRITER_STOP)
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _WRITER_STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _WRITER_STOP:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        started = time.perf_counter()
+        with self._write_lock:
+            try:
+                self.store.append_many(batch, fsync=self.fsync)
+                self.entries_written += len(batch)
+                self.batches_written += 1
+            except Exception as e:
+                self.write_errors += 1
+                print(f"Error writing {len(batch)} log entries: {str(e)}")
+            finally:
+                with self._pending_lock:
+                    del self._pending[:len(batch)]
+        self.last_batch_seconds = time.perf_counter() - started
+        for _ in batch:
+            self._queue.task_done()
+
+
+def migrate_json_array_to_jsonl(json_path, jsonl_path, encoder=None):
+    """
+    ย้ายล็อกจากไฟล์ JSON array เดิมไปเป็นไฟล์ JSONL (ทำครั้งเดียว)
+    จะเขียนไฟล์ชั่วคราวก่อนแล้วค่อยเปลี่ยนชื่อ เพื่อไม่ให้เหลือไฟล์ที่ย้ายไม่ครบ
+    ไฟล์เดิมจะไม่ถูกแก้ไข คืนค่าจำนวนรายการที่ย้าย หรือ None หากไม่ต้องย้าย
+    ระบุ encoder (SnapshotEncoder) เพื่อเขียนในรูปแบบ delta
+    """
+    if os.path.exists(jsonl_path) or not os.path.exists(json_path):
+        return None
+
+    count = 0
+    tmp_path = jsonl_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline="\n") as f:
+        for log_entry in iter_json_array(json_path):
+            if encoder is not None:
+                log_entry = encoder.encode(log_entry)
+            f.write(encode_log_line(log_entry))
+            count += 1
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, jsonl_path)
+
+    print(f"Migrated {count} log entries from {json_path} to {jsonl_path}")
+    return count
@@ -0,0 +1,417 @@
+"""
+ประวัติค่าการใช้งานระบบ (CPU, RAM, GPU, อุณหภูมิ) ในหน่วยความจำขนาดคงที่สำหรับ HDMI Monitor
+"""
+import os
+import math
+import time
+import threading
+import warnings
+
+import numpy as np
+
+HISTORY_CAPACITY = 3600  # จำนวนตัวอย่างที่เก็บได้ต่อค่า (1 ชั่วโมงเมื่อตรวจสอบทุก 1 วินาที)
+
+# ช่วงเวลาของสถิติย้อนหลัง (วินาที)
+HISTORY_WINDOWS = {
+    '1m': 60,
+    '15m': 15 * 60,
+    '1h': 60 * 60
+}
+
+HISTORY_PERCENTILE = 95
+
+# ระดับข้อมูลสรุปสำหรับกราฟย้อนหลังระยะยาว: (ความละเอียดเป็นวินาที, จำนวนช่วงที่เก็บ)
+ROLLUP_TIERS = (
+    (10, 6 * 360),        # ช่วงละ 10 วินาที ย้อนหลัง 6 ชั่วโมง
+    (60, 7 * 24 * 60),    # ช่วงละ 1 นาที ย้อนหลัง 7 วัน
+    (3600, 90 * 24)       # ช่วงละ 1 ชั่วโมง ย้อนหลัง 90 วัน
+)
+HISTORY_MAX_POINTS = 500  # จำนวนจุดสูงสุดที่ query() ส่งกลับ
+HISTORY_SAVE_INTERVAL = 300  # บันทึกประวัติลงไฟล์ทุก 5 นาที (เมื่อกำหนด path)
+
+METRIC_CPU_PERCENT = "cpu_percent"
+METRIC_MEMORY_PERCENT = "memory_percent"
+METRIC_CPU_TEMPERATURE = "cpu_temperature"
+METRIC_MAINBOARD_TEMPERATURE = "mainboard_temperature"
+METRIC_HDMI_CONNECTED = "hdmi_connected"
+METRIC_HDMI_ACTIVE = "hdmi_active"
+# ค่าที่เก็บเฉพาะใน tiers ไม่ใช้ช่องของข้อมูลดิบ (ตรวจสอบ HDMI ถี่ได้โดยไม่ทำให้ช่วง 1 ชั่วโมงของข้อมูลดิบสั้นลง)
+ROLLUP_ONLY_METRICS = (METRIC_HDMI_CONNECTED, METRIC_HDMI_ACTIVE)
+
+
+def gpu_metric(index, field):
+    """ชื่อค่าของ GPU ลำดับที่ index เช่น gpu0_load"""
+    return f"gpu{index}_{field}"
+
+
+def extract_metrics(status):
+    """ดึงค่าตัวเลขจากผลของ SystemMonitorCore.check_system_status() เป็น {ชื่อค่า: ค่า}"""
+    metrics = {}
+    if 'percent' in status.get('cpu', {}):
+        metrics[METRIC_CPU_PERCENT] = status['cpu']['percent']
+    if 'percent' in status.get('memory', {}):
+        metrics[METRIC_MEMORY_PERCENT] = status['memory']['percent']
+
+    temperatures = status.get('temperatures', {})
+    if 'cpu' in temperatures:
+        metrics[METRIC_CPU_TEMPERATURE] = temperatures['cpu']
+    if 'mainboard' in temperatures:
+        metrics[METRIC_MAINBOARD_TEMPERATURE] = temperatures['mainboard']
+
+    for i, gpu in enumerate(status.get('gpu', [])):
+        if 'load' not in gpu:
+            continue
+        metrics[gpu_metric(i, 'load')] = gpu['load']
+        metrics[gpu_metric(i, 'memory_percent')] = gpu.get('memory_percent', 0)
+        if gpu.get('temperature') is not None:
+            metrics[gpu_metric(i, 'temperature')] = gpu['temperature']
+    return metrics
+
+
+def lttb(times, values, max_points):
+    """
+    ลดจำนวนจุดด้วยวิธี Largest-Triangle-Three-Buckets ให้เหลือไม่เกิน max_points จุด
+    แบ่งข้อมูลเป็นช่วงเท่าๆ กัน แล้วเลือกจุดที่ทำสามเหลี่ยมใหญ่ที่สุดกับจุดที่เลือกก่อนหน้าและค่าเฉลี่ยของช่วงถัดไป
+    ยอดและหุบของกราฟจึงยังอยู่ จุดแรกและจุดสุดท้ายคงเดิมเสมอ
+    """
+    count = len(times)
+    if count <= max_points:
+        return times, values
+    if max_points < 3:
+        keep = [0, count - 1][:max(max_points, 0)]
+        return times[keep], values[keep]
+
+    every = (count - 2) / (max_points - 2)
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0] = 0
+    a = 0
+    for i in range(max_points - 2):
+        # ค่าเฉลี่ยของช่วงถัดไป
+        next_start = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, count)
+        avg_time = times[next_start:next_end].mean()
+        avg_value = values[next_start:next_end].mean()
+
+        # จุดในช่วงปัจจุบันที่ทำพื้นที่สามเหลี่ยมมากที่สุด
+        start = int(math.floor(i * every)) + 1
+        end = int(math.floor((i + 1) * every)) + 1
+        area = np.abs((times[a] - avg_time) * (values[start:end] - values[a])
+                      - (times[a] - times[start:end]) * (avg_value - values[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = count - 1
+    return times[selected], values[selected]
+
+
+class RollupTier:
+    """
+    ข้อมูลสรุปช่วงละ resolution วินาที (ผลรวม, จำนวน, ต่ำสุด, สูงสุด ของแต่ละค่า) เก็บ capacity ช่วงล่าสุด
+    ช่วงถูกสร้างทีละตัวอย่างที่เข้ามา โดยไม่ต้องอ่านข้อมูลดิบย้อนหลัง
+    """
+
+    def __init__(self, resolution, capacity, rows=0):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.buckets = np.full(capacity, -1, dtype=np.int64)  # เลขช่วง (เวลา // resolution) ของแต่ละช่อง
+        self.sums = np.zeros((rows, capacity))
+        self.counts = np.zeros((rows, capacity), dtype=np.int64)
+        self.mins = np.full((rows, capacity), np.inf)
+        self.maxs = np.full((rows, capacity), -np.inf)
+
+    def add_row(self):
+        self.sums = np.vstack([self.sums, np.zeros((1, self.capacity))])
+        self.counts = np.vstack([self.counts, np.zeros((1, self.capacity), dtype=np.int64)])
+        self.mins = np.vstack([self.mins, np.full((1, self.capacity), np.inf)])
+        self.maxs = np.vstack([self.maxs, np.full((1, self.capacity), -np.inf)])
+
+    def add(self, timestamp, rows, values):
+        """รวมตัวอย่างหนึ่งรอบ (rows และ values เป็น array ขนาดเท่ากัน) เข้ากับช่วงของ timestamp"""
+        bucket = int(timestamp // self.resolution)
+        slot = bucket % self.capacity
+        if self.buckets[slot] != bucket:
+            # เริ่มช่วงใหม่ ทับช่วงที่เก่าที่สุด
+            self.buckets[slot] = bucket
+            self.sums[:, slot] = 0
+            self.counts[:, slot] = 0
+            self.mins[:, slot] = np.inf
+            self.maxs[:, slot] = -np.inf
+        self.sums[rows, slot] += values
+        self.counts[rows, slot] += 1
+        self.mins[rows, slot] = np.minimum(self.mins[rows, slot], values)
+        self.maxs[rows, slot] = np.maximum(self.maxs[rows, slot], values)
+
+    def oldest(self):
+        """เวลาเริ่มของช่วงที่เก่าที่สุดที่ยังเก็บอยู่ (None ถ้ายังไม่มีข้อมูล)"""
+        valid = self.buckets[self.buckets >= 0]
+        return float(valid.min() * self.resolution) if valid.size else None
+
+    def series(self, row, start, end):
+        """(เวลาเริ่มช่วง, ค่าเฉลี่ย) ของแถว row ระหว่าง start ถึง end เรียงตามเวลา"""
+        mask = ((self.buckets >= start // self.resolution) & (self.buckets <= end // self.resolution)
+                & (self.counts[row] > 0))
+        buckets = self.buckets[mask]
+        order = np.argsort(buckets)
+        values = self.sums[row, mask] / self.counts[row, mask]
+        return (buckets[order] * self.resolution).astype(float), values[order]
+
+    def state(self, prefix):
+        return {prefix + "resolution": np.array(self.resolution), prefix + "buckets": self.buckets, prefix + "sums": self.sums, prefix + "counts": self.counts,
+                prefix + "mins": self.mins, prefix + "maxs": self.maxs}
+
+    def restore(self, prefix, data):
+        if (prefix + "buckets" not in data or int(data[prefix + "resolution"]) != self.resolution
+                or data[prefix + "buckets"].shape != self.buckets.shape):
+            return  # ระดับข้อมูลเปลี่ยนไปจากไฟล์ที่บันทึกไว้
+        self.buckets = data[prefix + "buckets"]
+        self.sums = data[prefix + "sums"]
+        self.counts = data[prefix + "counts"]
+        self.mins = data[prefix + "mins"]
+        self.maxs = data[prefix + "maxs"]
+
+
+class MetricHistory:
+    """
+    Ring buffer ของ NumPy array ที่จองไว้ล่วงหน้า แถวละหนึ่งค่า (เช่น cpu_percent) ใช้หน่วยความจำคงที่
+    append() เขียนทับตัวอย่างที่เก่าที่สุดใน O(1) ค่าที่ขาดในรอบนั้นเก็บเป็น NaN
+    สถิติ min/max/mean/p95 คำนวณพร้อมกันทุกค่าด้วย NumPy (เรียกได้จากเธรดอื่น)
+    ทุกตัวอย่างถูกสรุปลง tiers (10 วินาที, 1 นาที, 1 ชั่วโมง) ไปพร้อมกัน สำหรับ query() ช่วงเวลายาว
+    ค่าใน ROLLUP_ONLY_METRICS (สถานะ HDMI) เก็บเฉพาะใน tiers และไม่รวมอยู่ใน rolling_stats()
+    หากกำหนด path ประวัติจะถูกบันทึกลงไฟล์ทุก autosave_interval วินาที และโหลดคืนด้วย load()
+    """
+
+    def __init__(self, capacity=HISTORY_CAPACITY, windows=None, clock=time.time, tiers=ROLLUP_TIERS,
+                 path=None, autosave_interval=HISTORY_SAVE_INTERVAL):
+        self.capacity = capacity
+        self.windows = dict(windows or HISTORY_WINDOWS)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # ให้เขียนไฟล์ได้ทีละเธรด
+        self._times = np.full(capacity, -np.inf)
+        self._values = np.full((0, capacity), np.nan)
+        self._rows = {}
+        self._rollup_only = set(ROLLUP_ONLY_METRICS)
+        self._next = 0
+        self.count = 0
+        self.tiers = [RollupTier(resolution, tier_capacity) for resolution, tier_capacity in tiers]
+        self.path = path
+        self.autosave_interval = autosave_interval
+        self._last_save = time.monotonic()
+
+    @property
+    def metrics(self):
+        return list(self._rows)
+
+    def _row(self, name):
+        """แถวของค่า name (เพิ่มแถวใหม่เมื่อพบค่าใหม่ เช่น GPU ที่เพิ่งต่อ ซึ่งเกิดขึ้นไม่บ่อย)"""
+        row = self._rows.get(name)
+        if row is None:
+            row = len(self._rows)
+            self._values = np.vstack([self._values, np.full((1, self.capacity), np.nan)])
+            for tier in self.tiers:
+                tier.add_row()
+            self._rows[name] = row
+        return row
+
+    def append(self, metrics, timestamp=None, raw=True):
+        """
+        เพิ่มตัวอย่างหนึ่งรอบ metrics เป็น {ชื่อค่า: ตัวเลข} (เรียกได้จากหลายเธรด)
+        raw=False เพิ่มเฉพาะใน tiers โดยไม่ใช้ช่องของข้อมูลดิบ
+        """
+        metrics = {name: value for name, value in metrics.items() if value is not None}
+        with self._lock:
+            # อ่านเวลาภายใน lock เพื่อให้ตัวอย่างเรียงตามเวลาแม้เพิ่มจากหลายเธรด
+            timestamp = self._clock() if timestamp is None else timestamp
+            rows = np.array([self._row(name) for name in metrics], dtype=np.intp)
+            values = np.array(list(metrics.values()), dtype=float)
+            if raw:
+                slot = self._next
+                self._times[slot] = timestamp
+                self._values[:, slot] = np.nan
+                self._values[rows, slot] = values
+                self._next = (slot + 1) % self.capacity
+                self.count = min(self.count + 1, self.capacity)
+            else:
+                self._rollup_only.update(metrics)
+            for tier in self.tiers:
+                tier.add(timestamp, rows, values)
+
+        if self.path and self.autosave_interval and time.monotonic() - self._last_save >= self.autosave_interval:
+            self.save(wait=False)
+
+    def record(self, status, timestamp=None):
+        """เพิ่มผลของ check_system_status() หนึ่งรอบ"""
+        self.append(extract_metrics(status), timestamp)
+
+    def record_hdmi(self, status, timestamp=None):
+        """
+        เพิ่มสถานะ HDMI จาก check_hdmi_status() เป็นค่า 0/1 (ค่าเฉลี่ยของช่วง = สัดส่วนเวลาที่เชื่อมต่อ)
+        เก็บเฉพาะใน tiers เพราะตรวจสอบ HDMI ถี่กว่าค่าการใช้งานระบบ
+        """
+        self.append({
+            METRIC_HDMI_CONNECTED: 1.0 if status['hdmi_connected'] else 0.0,
+            METRIC_HDMI_ACTIVE: 1.0 if status['hdmi_active'] else 0.0
+        }, timestamp, raw=False)
+
+    def series(self, name, seconds=None, now=None):
+        """(เวลา, ค่า) ของ name เรียงจากเก่าไปใหม่ ย้อนหลังไม่เกิน seconds วินาที"""
+        now = self._clock() if now is None else now
+        with self._lock:
+            if name not in self._rows:
+                return np.empty(0), np.empty(0)
+            order = np.roll(np.arange(self.capacity), -self._next)
+            times = self._times[order]
+            values = self._values[self._rows[name], order]
+        mask = np.isfinite(times)
+        if seconds is not None:
+            mask &= times >= now - seconds
+        return times[mask], values[mask]
+
+    def query(self, name, start=None, end=None, max_points=None):
+        """
+        (เวลา, ค่า) ของ name ระหว่าง start ถึง end (epoch วินาที, ค่าเริ่มต้นคือ 1 ชั่วโมงล่าสุด) สำหรับกราฟ
+        ใช้ระดับข้อมูลที่หยาบที่สุดที่ยังครอบคลุม start และมีอย่างน้อย max_points จุด
+        แล้วลดจุดด้วย LTTB ให้เหลือไม่เกิน max_points จุด กราฟ 30 วันจึงอ่านข้อมูลพอๆ กับกราฟ 5 นาที
+        """
+        end = self._clock() if end is None else end
+        start = end - 3600 if start is None else start
+        max_points = HISTORY_MAX_POINTS if max_points is None else max_points
+        with self._lock:
+            row = self._rows.get(name)
+            raw_times = self._times[np.isfinite(self._times)]
+            if row is None or (not raw_times.size and name not in self._rollup_only):
+                return np.empty(0), np.empty(0)
+
+            # ระดับข้อมูลจากละเอียดไปหยาบ: ข้อมูลดิบ (ประมาณ 1 ตัวอย่างต่อวินาที) แล้วตาม tiers
+            levels = [] if name in self._rollup_only else [(1, raw_times.min(), None)]
+            levels += [(tier.resolution, tier.oldest(), tier) for tier in self.tiers if tier.oldest() is not None]
+            if not levels:
+                return np.empty(0), np.empty(0)
+            # ไม่มีข้อมูลก่อนตัวอย่างแรก ช่วงที่ต้องการจึงเริ่มไม่ก่อนข้อมูลที่เก่าที่สุด
+            # (tier มีข้อมูลเก่ากว่าข้อมูลดิบเมื่อช่วงที่เก่าที่สุดจบก่อนตัวอย่างดิบแรก)
+            first = levels[0][1]
+            for resolution, oldest, _ in levels[1:]:
+                if oldest + resolution <= first:
+                    first = oldest
+            start = max(start, first)
+            covering = [level for level in levels if level[1] <= start]
+            chosen = covering[0]
+            for level in covering:
+                if (end - start) / level[0] >= max_points:
+                    chosen = level
+
+            tier = chosen[2]
+            if tier is None:
+                mask = (self._times >= start) & (self._times <= end) & ~np.isnan(self._values[row])
+                order = np.argsort(self._times[mask])
+                times = self._times[mask][order]
+                values = self._values[row, mask][order]
+            else:
+                times, values = tier.series(row, start, end)
+        return lttb(times, values, max_points)
+
+    def rolling_stats(self, windows=None, now=None):
+        """
+        สถิติย้อนหลังของทุกค่า
+        {'1m': {'cpu_percent': {'min', 'max', 'mean', 'p95', 'samples'}, ...}, '15m': ..., '1h': ...}
+        ค่าที่ไม่มีตัวอย่างในช่วงเวลานั้นจะเป็น None
+        """
+        now = self._clock() if now is None else now
+        windows = self.windows if windows is None else windows
+        with self._lock:
+            names = [name for name in self._rows if name not in self._rollup_only]
+            times = self._times.copy()
+            values = self._values[[self._rows[name] for name in names]]
+
+        stats = {}
+        for label, seconds in windows.items():
+            window = values[:, times >= now - seconds]
+            samples = np.count_nonzero(~np.isnan(window), axis=1)
+            with warnings.catch_warnings():
+                # ค่าที่ไม่มีตัวอย่างเลยให้ผลเป็น NaN (แปลงเป็น None ด้านล่าง)
+                warnings.simplefilter("ignore", RuntimeWarning)
+                if window.shape[1]:
+                    columns = (np.nanmin(window, axis=1), np.nanmax(window, axis=1),
+                               np.nanmean(window, axis=1),
+                               np.nanpercentile(window, HISTORY_PERCENTILE, axis=1))
+                else:
+                    columns = (np.full(len(names), np.nan),) * 4
+            stats[label] = {
+                name: {
+                    'min': _finite(columns[0][row]),
+                    'max': _finite(columns[1][row]),
+                    'mean': _finite(columns[2][row]),
+                    'p95': _finite(columns[3][row]),
+                    'samples': int(samples[row])
+                }
+                for row, name in enumerate(names)
+            }
+        return stats
+
+    def memory_bytes(self):
+        size = self._times.nbytes + self._values.nbytes
+        for tier in self.tiers:
+            size += tier.buckets.nbytes + tier.sums.nbytes + tier.counts.nbytes + tier.mins.nbytes + tier.maxs.nbytes
+        return size
+
+    def save(self, path=None, wait=True):
+        """
+        บันทึกข้อมูลดิบและทุก tier ลงไฟล์ .npz (เขียนไฟล์ชั่วคราวแล้วแทนที่ ไฟล์เดิมจึงไม่เสียหาย)
+        เขียนได้ทีละเธรด wait=False จะข้ามการบันทึกหากเธรดอื่นกำลังบันทึกอยู่ (ใช้กับการบันทึกอัตโนมัติ)
+        """
+        path = path or self.path
+        if not path:
+            return
+        if not self._save_lock.acquire(wait):
+            return
+        try:
+            with self._lock:
+                data = {
+                    'names': np.array(list(self._rows), dtype=str),
+                    'times': self._times.copy(),
+                    'values': self._values.copy(),
+                    'position': np.array([self._next, self.count])
+                }
+                for i, tier in enumerate(self.tiers):
+                    data.update({key: value.copy() for key, value in tier.state(f"tier{i}_").items()})
+            self._last_save = time.monotonic()
+
+            try:
+                temp_path = path + ".tmp"
+                with open(temp_path, 'wb') as f:
+                    np.savez_compressed(f, **data)
+                os.replace(temp_path, path)
+            except Exception as e:
+                print(f"Error saving metric history: {str(e)}")
+        finally:
+            self._save_lock.release()
+
+    def load(self, path=None):
+        """โหลดประวัติที่บันทึกไว้ (เรียกก่อนเริ่มเพิ่มตัวอย่าง) คืนค่า True ถ้าโหลดสำเร็จ"""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as f:
+                data = {key: f[key] for key in f.files}
+            with self._lock:
+                if data['times'].shape == self._times.shape:
+                    self._times = data['times']
+                    self._values = data['values']
+                    self._next, self.count = (int(value) for value in data['position'])
+                else:
+                    self._values = np.full((len(data['names']), self.capacity), np.nan)
+                self._rows = {str(name): row for row, name in enumerate(data['names'])}
+                for i, tier in enumerate(self.tiers):
+                    tier.restore(f"tier{i}_", data)
+                    # tier ที่โหลดไม่ได้ (ความจุเปลี่ยน) ให้มีแถวครบตามชื่อค่า
+                    while tier.sums.shape[0] < len(self._rows):
+                        tier.add_row()
+            return True
+        except Exception as e:
+            print(f"Error loading metric history: {str(e)}")
+            return False
+
+
+def _finite(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
@@ -0,0 +1,199 @@
+"""
+ส่งออกสถานะ HDMI, GPU และระบบในรูปแบบ Prometheus/OpenMetrics ทาง HTTP (GET /metrics)
+
+ทุก scrape ใช้ผลตรวจสอบล่าสุดที่เก็บไว้ใน MetricsCache ไม่มีการอ่าน WMI หรือ GPUtil ระหว่าง scrape
+ข้อความถูกสร้างใหม่เฉพาะเมื่อมีผลตรวจสอบใหม่ scrape ถี่แค่ไหนจึงไม่เพิ่มภาระของเครื่อง
+"""
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PREFIX = "hdmi_monitor_"
+CONTENT_TYPE_TEXT = "text/plain; version=0.0.4; charset=utf-8"
+CONTENT_TYPE_OPENMETRICS = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class MetricFamily:
+    """ค่าชื่อเดียวกันหลายชุด label สำหรับหนึ่งบล็อก # HELP/# TYPE"""
+
+    def __init__(self, name, help_text, metric_type="gauge"):
+        self.name = METRICS_PREFIX + name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self.samples = []
+
+    def add(self, value, **labels):
+        if value is None:
+            return
+        try:
+            value = _format_value(value)
+        except (TypeError, ValueError):
+            return
+        self.samples.append((labels, value))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.samples:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape_label(label)}"' for key, label in labels.items())
+                lines.append(f"{self.name}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{self.name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def hdmi_families(status, sampled_at):
+    """ค่าจากผลของ check_hdmi_status()"""
+    connected = MetricFamily("hdmi_connected", "1 if an HDMI display is connected.")
+    active = MetricFamily("hdmi_active", "1 if a connected HDMI display is active.")
+    connection_type = MetricFamily("monitor_connection_type",
+                                   "VideoOutputTechnology code of each display (5 = HDMI).")
+    monitor_active = MetricFamily("monitor_active", "1 if the display is active.")
+    gpu_error = MetricFamily("gpu_error_code", "Device error code reported for each GPU (0 = OK).")
+    updated = MetricFamily("hdmi_last_check_timestamp_seconds", "Unix time of the cached HDMI check.")
+
+    connected.add(status.get('hdmi_connected', False))
+    active.add(status.get('hdmi_active', False))
+    for i, monitor in enumerate(status.get('hdmi_devices', [])):
+        labels = {'monitor': i, 'instance': monitor.get('instance_name', "")}
+        connection_type.add(monitor.get('connection_type'), **labels)
+        monitor_active.add(monitor.get('active', False), **labels)
+    for gpu_id, gpu_data in status.get('gpu_status', {}).items():
+        gpu_error.add(gpu_data.get('error_code'), gpu=gpu_id, name=gpu_data.get('name', ""))
+    updated.add(sampled_at)
+    return [connected, active, connection_type, monitor_active, gpu_error, updated]
+
+
+def system_families(status, sampled_at):
+    """ค่าจากผลของ SystemMonitorCore.check_system_status()"""
+    cpu = status.get('cpu', {})
+    memory = status.get('memory', {})
+    temperatures = status.get('temperatures', {})
+
+    cpu_percent = MetricFamily("cpu_percent", "CPU utilisation in percent.")
+    cpu_cores = MetricFamily("cpu_cores", "Number of logical CPUs.")
+    cpu_frequency = MetricFamily("cpu_frequency_mhz", "Current CPU frequency in MHz.")
+    memory_percent = MetricFamily("memory_percent", "RAM utilisation in percent.")
+    memory_used = MetricFamily("memory_used_bytes", "RAM in use.")
+    memory_total = MetricFamily("memory_total_bytes", "Total RAM.")
+    temperature = MetricFamily("temperature_celsius", "Board temperatures.")
+    gpu_load = MetricFamily("gpu_load_percent", "GPU utilisation in percent.")
+    gpu_memory_used = MetricFamily("gpu_memory_used_megabytes", "GPU memory in use.")
+    gpu_memory_total = MetricFamily("gpu_memory_total_megabytes", "Total GPU memory.")
+    gpu_temperature = MetricFamily("gpu_temperature_celsius", "GPU temperature.")
+    updated = MetricFamily("system_last_check_timestamp_seconds", "Unix time of the cached system check.")
+
+    cpu_percent.add(cpu.get('percent'))
+    cpu_cores.add(cpu.get('cores'))
+    cpu_frequency.add(cpu.get('frequency'))
+    memory_percent.add(memory.get('percent'))
+    memory_used.add(memory.get('used'))
+    memory_total.add(memory.get('total'))
+    for sensor in ('cpu', 'mainboard'):
+        temperature.add(temperatures.get(sensor), sensor=sensor)
+    for i, gpu in enumerate(status.get('gpu', [])):
+        if 'load' not in gpu:
+            continue
+        labels = {'gpu': f"gpu_{i}", 'name': gpu.get('name', "")}
+        gpu_load.add(gpu.get('load'), **labels)
+        gpu_memory_used.add(gpu.get('memory_used'), **labels)
+        gpu_memory_total.add(gpu.get('memory_total'), **labels)
+        gpu_temperature.add(gpu.get('temperature'), **labels)
+    updated.add(sampled_at)
+    return [cpu_percent, cpu_cores, cpu_frequency, memory_percent, memory_used, memory_total, temperature,
+            gpu_load, gpu_memory_used, gpu_memory_total, gpu_temperature, updated]
+
+
+class MetricsCache:
+    """
+    ผลตรวจสอบล่าสุดของ HDMIMonitorCore และ SystemMonitorCore (เรียก set_* จากเธรดตรวจสอบหรือเธรด UI)
+    render() สร้างข้อความครั้งเดียวต่อผลตรวจสอบใหม่ และคืนข้อความเดิมสำหรับ scrape ถัดไป
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._hdmi = None
+        self._system = None
+        self._rendered = None
+        self.renders = 0
+        self.scrapes = 0
+
+    def set_hdmi_status(self, status):
+        with self._lock:
+            self._hdmi = (status, self._clock())
+            self._rendered = None
+
+    def set_system_status(self, status):
+        with self._lock:
+            self._system = (status, self._clock())
+            self._rendered = None
+
+    def render(self):
+        with self._lock:
+            self.scrapes += 1
+            if self._rendered is None:
+                families = []
+                if self._hdmi is not None:
+                    families += hdmi_families(*self._hdmi)
+                if self._system is not None:
+                    families += system_families(*self._system)
+                self._rendered = "".join(family.render() for family in families)
+                self.renders += 1
+            return self._rendered
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.cache.render()
+        if "application/openmetrics-text" in self.headers.get("Accept", ""):
+            content_type = CONTENT_TYPE_OPENMETRICS
+            body += "# EOF\n"
+        else:
+            content_type = CONTENT_TYPE_TEXT
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # ไม่พิมพ์ทุก scrape
+
+
+class MetricsExporter:
+    """HTTP server สำหรับ /metrics ในเธรดเบื้องหลัง (ค่าเริ่มต้นรับเฉพาะเครื่องนี้ 127.0.0.1)"""
+
+    def __init__(self, cache, host="127.0.0.1", port=9877):
+        self.cache = cache
+        self.server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.cache = cache
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-exporter", daemon=True)
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
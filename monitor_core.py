@@ -0,0 +1,956 @@
+"""
+ส่วนควบคุมการตรวจสอบของ HDMI Monitor ที่ไม่ขึ้นกับ Qt
+"""
+import os
+import time
+import datetime
+import threading
+import collections
+import functools
+import queue
+
+import psutil
+
+from log_storage import (STORAGE_JSON, STORAGE_JSONL, STORAGE_SQLITE, JsonArrayLogStore,
+                         JsonlLogStore, SqliteLogStore, BackgroundLogWriter, filter_logs,
+                         SnapshotEncoder, next_day_key, migrate_json_array_to_jsonl, mark_migrated,
+                         read_retention_start)
+from hw_probes import (PROBE_QUERIES, QUERY_MONITORS, QUERY_GPUS, QUERY_CONTROLLERS, ProbeTimeout,
+                       WindowsProbeBackend, WMIDisplayEventSource, create_probe_backend,
+                       get_error_description)
+
+# กำหนดค่าคงที่ของการตรวจสอบและการบันทึกล็อก (ใช้ทั้งโหมดหน้าต่างและโหมด daemon)
+LOG_FILE = "hdmi_monitor_log.json"
+LOG_FILE_JSONL = "hdmi_monitor_log.jsonl"
+LOG_FILE_SQLITE = "hdmi_monitor_log.db"
+LOG_STORAGE = STORAGE_JSONL  # รูปแบบการจัดเก็บล็อก (STORAGE_JSON, STORAGE_JSONL หรือ STORAGE_SQLITE)
+LOG_ROTATE_MAX_BYTES = 5 * 1024 * 1024  # หมุนไฟล์ล็อกเมื่อใหญ่เกิน 5 MB
+LOG_ROTATE_MAX_AGE_DAYS = 1  # ย้ายล็อกของวันก่อนหน้าไปเก็บถาวรทุกวัน
+LOG_RETENTION_DAYS = 365  # เก็บประวัติย้อนหลัง 1 ปี
+LOG_ARCHIVE_DIR = "log_archive"  # โฟลเดอร์เก็บล็อกเก่าที่บีบอัดแล้ว
+METRIC_HISTORY_FILE = "hdmi_monitor_history.npz"  # ประวัติค่าการใช้งานและสถานะ HDMI สำหรับกราฟย้อนหลัง
+METRICS_HOST = "127.0.0.1"  # ที่อยู่ของ HTTP /metrics (Prometheus/OpenMetrics)
+METRICS_PORT = None  # พอร์ตของ /metrics เช่น 9877 (None = ปิด, เปิดได้ด้วย --metrics-port)
+LOG_DELTA_ENCODING = True  # เก็บสถานะแบบ keyframe + diff ในไฟล์ JSONL
+LOG_KEYFRAME_INTERVAL = 100  # เขียนสถานะเต็มอย่างน้อยทุก 100 รายการ
+LOG_WRITER_BATCH_SIZE = 50  # จำนวนรายการสูงสุดต่อการเขียนหนึ่งชุด
+LOG_WRITER_FLUSH_INTERVAL = 0.5  # ระยะเวลารอรวมชุดก่อนเขียน (วินาที)
+LOG_WRITER_FSYNC = True  # บังคับ fsync หลังเขียนแต่ละชุด
+HDMI_CHECK_INTERVAL = 5  # ตรวจสอบทุก 5 วินาที
+HDMI_MIN_CHECK_INTERVAL = 1  # ตรวจสอบถี่ที่สุดหลังสถานะ HDMI เปลี่ยน (วินาที)
+HDMI_MAX_CHECK_INTERVAL = HDMI_CHECK_INTERVAL  # ตรวจสอบห่างที่สุดในโหมดตรวจสอบตามรอบ ไม่เกินรอบเดิม เพื่อไม่ให้พบการถอดสายช้าลง (วินาที)
+SYSTEM_CHECK_INTERVAL = 1  # ตรวจสอบทุก 1 วินาที
+SYSTEM_MAX_CHECK_INTERVAL = 5  # ตรวจสอบห่างที่สุดเมื่อค่าการใช้งานคงที่ (วินาที)
+SYSTEM_HIDDEN_CHECK_INTERVAL = 30  # รอบตรวจสอบขณะหน้าต่างถูกซ่อนใน System Tray (วินาที)
+SYSTEM_CHANGE_THRESHOLD = 5  # ค่าการใช้งาน (%) ที่เปลี่ยนเกินนี้ถือว่ามีการเปลี่ยนแปลง
+POLL_BACKOFF = 2  # เพิ่มช่วงเวลาตรวจสอบทีละกี่เท่าเมื่อสถานะคงที่
+SAMPLE_MAX_AGE = 1  # ใช้ผลการอ่านฮาร์ดแวร์ร่วมกันระหว่างเธรดหากอายุไม่เกิน 1 วินาที
+PROBE_DEADLINE = 5  # เวลาสูงสุดที่รอการอ่านฮาร์ดแวร์แต่ละครั้ง (WMI, nvidia-smi) ก่อนถือว่าค้าง (วินาที)
+THREAD_STOP_TIMEOUT = PROBE_DEADLINE + 2  # เวลาสูงสุดที่รอเธรดตรวจสอบหยุดเมื่อปิดโปรแกรม (วินาที)
+PROBE_BACKEND = "auto"  # วิธีตรวจสอบฮาร์ดแวร์ ("windows", "sysfs" หรือ "auto" ตามระบบปฏิบัติการ)
+HDMI_EVENT_DRIVEN = True  # ตรวจสอบทันทีเมื่อได้รับเหตุการณ์จอภาพเปลี่ยนแปลงจาก WMI
+HDMI_SAFETY_POLL_INTERVAL = 60  # รอบตรวจสอบสำรองเมื่อใช้โหมดเหตุการณ์ (วินาที)
+HDMI_DEBOUNCE_SAMPLES = 3  # ยืนยันสถานะใหม่เมื่อได้ผลตรวจสอบแบบเดียวกันติดต่อกันกี่ครั้ง
+HDMI_DEBOUNCE_MS = 2000  # หรือเมื่อสถานะใหม่คงอยู่นานเท่านี้ (มิลลิวินาที)
+HDMI_FLAP_THRESHOLD = 4  # สถานะสลับไปมากี่ครั้งจึงถือว่าสัญญาณกระพริบ
+HDMI_FLAP_WINDOW = 60  # ช่วงเวลาที่ใช้นับการสลับสถานะ (วินาที)
+
+
+class AdaptiveScheduler:
+    """
+    กำหนดช่วงเวลาระหว่างการตรวจสอบแบบปรับตัว
+    - หลังสถานะเปลี่ยน จะกลับไปตรวจสอบถี่ที่สุด (min_interval) เพื่อจับการกระพริบของสัญญาณ
+    - เมื่อสถานะคงที่ จะเพิ่มช่วงเวลาขึ้นทีละ backoff เท่าจนถึง max_interval
+    - ขณะหน้าต่างถูกซ่อน จะใช้ช่วงเวลาไม่ต่ำกว่า hidden_interval
+    """
+
+    def __init__(self, min_interval, max_interval, backoff=2.0, hidden_interval=None, rate_window=60):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.hidden_interval = hidden_interval
+        self.hidden = False
+        self.interval = min_interval
+
+        self._wake = threading.Event()
+        self._poll_times = collections.deque(maxlen=rate_window)
+        self._started = time.monotonic()
+        self.polls = 0
+        self.transitions = 0
+
+    def record(self, changed):
+        """บันทึกผลการตรวจสอบหนึ่งครั้ง และปรับช่วงเวลาของรอบถัดไป"""
+        now = time.monotonic()
+        self.polls += 1
+        self._poll_times.append(now)
+        if changed:
+            self.transitions += 1
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def next_interval(self):
+        """ช่วงเวลาก่อนการตรวจสอบครั้งถัดไป (วินาที)"""
+        if self.hidden and self.hidden_interval:
+            return max(self.interval, self.hidden_interval)
+        return self.interval
+
+    def set_hidden(self, hidden):
+        """แจ้งว่าผลการตรวจสอบมองไม่เห็น (เช่น หน้าต่างถูกซ่อนใน System Tray)"""
+        was_hidden = self.hidden
+        self.hidden = hidden
+        if was_hidden and not hidden:
+            # กลับมาแสดงผล ให้ตรวจสอบทันทีแทนที่จะรอรอบที่ยาว
+            self.interval = self.min_interval
+            self.wake()
+
+    def wake(self):
+        """ปลุกให้ sleep() คืนค่าทันที"""
+        self._wake.set()
+
+    def sleep(self):
+        """รอจนถึงรอบถัดไป คืนค่า True หากถูกปลุกก่อนครบเวลา"""
+        woken = self._wake.wait(self.next_interval())
+        self._wake.clear()
+        return woken
+
+    def metrics(self):
+        """สถิติอัตราการตรวจสอบ สำหรับยืนยันว่าลดภาระเครื่องได้จริง"""
+        recent_rate = 0.0
+        if len(self._poll_times) > 1:
+            span = self._poll_times[-1] - self._poll_times[0]
+            if span > 0:
+                recent_rate = (len(self._poll_times) - 1) / span
+        elapsed = time.monotonic() - self._started
+        return {
+            'polls': self.polls,
+            'transitions': self.transitions,
+            'current_interval': self.next_interval(),
+            'hidden': self.hidden,
+            'recent_polls_per_second': recent_rate,
+            'average_polls_per_second': self.polls / elapsed if elapsed > 0 else 0.0
+        }
+
+
+EVENT_FLAPPING = "FLAPPING"
+
+
+def status_key(status):
+    """ส่วนของสถานะที่ใช้ตัดสินว่าสถานะเปลี่ยน: การเชื่อมต่อ HDMI และรหัสข้อผิดพลาดของการ์ดจอแต่ละตัว"""
+    gpu_codes = tuple(sorted((gpu_id, gpu_info['error_code'])
+                             for gpu_id, gpu_info in status['gpu_status'].items()))
+    return (status['hdmi_connected'], status['hdmi_active'], gpu_codes)
+
+
+def determine_event_type(status):
+    """ระบุประเภทของเหตุการณ์ที่เกิดขึ้น"""
+    if not status['hdmi_connected']:
+        return "HDMI_DISCONNECTED"
+    elif not status['hdmi_active']:
+        return "HDMI_INACTIVE"
+
+    # ตรวจสอบว่ามี GPU ที่มีปัญหาหรือไม่
+    for gpu_info in status['gpu_status'].values():
+        if gpu_info['error_code'] != 0:
+            return f"GPU_ERROR_CODE_{gpu_info['error_code']}"
+
+    return "NORMAL"
+
+
+class StatusDebouncer:
+    """
+    ตัดสินการเปลี่ยนสถานะ HDMI แบบหน่วงเวลา (debounce) เพื่อไม่ให้สายที่หลวมสร้างล็อกและการแจ้งเตือนจำนวนมาก
+    - สถานะใหม่จะถูกยืนยันเมื่อได้ผลตรวจสอบแบบเดียวกันติดต่อกัน confirm_samples ครั้ง
+      หรือคงอยู่นานอย่างน้อย confirm_ms มิลลิวินาที (ผลตรวจสอบครั้งแรกยืนยันทันที)
+    - หากผลตรวจสอบสลับไปมาตั้งแต่ flap_threshold ครั้งภายใน flap_window วินาที จะถือว่าสัญญาณกระพริบ:
+      ส่งเหตุการณ์ FLAPPING ครั้งเดียว และงดเหตุการณ์อื่นจนกว่าสถานะจะนิ่ง
+      (ผลตรวจสอบเหมือนเดิมติดต่อกัน confirm_samples ครั้ง หรือนานอย่างน้อย confirm_ms มิลลิวินาที)
+      เมื่อนิ่งแล้วจะส่งสถานะที่ยืนยันพร้อมจำนวนครั้งที่สลับ (flap_count) และระยะเวลา (flap_duration)
+    update() คืนรายการเหตุการณ์ แต่ละรายการมี event_type และ status
+    """
+
+    def __init__(self, confirm_samples=3, confirm_ms=2000, flap_threshold=4, flap_window=60):
+        self.confirm_samples = confirm_samples
+        self.confirm_ms = confirm_ms
+        self.flap_threshold = flap_threshold
+        self.flap_window = flap_window
+
+        self.committed = None  # สถานะที่ยืนยันแล้วล่าสุด
+        self._committed_key = None
+        self._candidate = None  # [key, status, จำนวนครั้ง, เวลาที่พบครั้งแรก]
+        self._last_key = None
+        self._last_toggle = None  # เวลาที่ผลตรวจสอบเปลี่ยนครั้งล่าสุด
+        self._stable_samples = 0  # จำนวนผลตรวจสอบที่เหมือนเดิมติดต่อกันนับจากการเปลี่ยนครั้งล่าสุด
+        self._toggles = collections.deque()
+
+        self.flapping = False
+        self._flap_started = None
+        self._flap_count = 0
+        self.flap_episodes = 0
+        self.suppressed = 0  # จำนวนการเปลี่ยนสถานะที่ไม่ได้ส่งเป็นเหตุการณ์เพราะกำลังกระพริบ
+
+    @property
+    def pending(self):
+        """มีสถานะใหม่ที่รอการยืนยันหรือกำลังกระพริบอยู่ (ควรตรวจสอบถี่ขึ้น)"""
+        return self._candidate is not None or self.flapping
+
+    def update(self, status, now=None):
+        """ป้อนผลตรวจสอบหนึ่งครั้ง คืนรายการเหตุการณ์ที่ต้องบันทึก/แจ้งเตือน"""
+        now = time.monotonic() if now is None else now
+        key = status_key(status)
+        events = []
+
+        if self.committed is None:
+            self._commit(key, status)
+            self._last_key = key
+            self._last_toggle = now
+            self._stable_samples = 1
+            return [self._event(determine_event_type(status), status)]
+
+        # นับการสลับของผลตรวจสอบดิบภายใน flap_window
+        if key != self._last_key:
+            self._toggles.append(now)
+            self._last_toggle = now
+            self._stable_samples = 1
+            if self.flapping:
+                self._flap_count += 1
+        else:
+            self._stable_samples += 1
+        self._last_key = key
+        while self._toggles and now - self._toggles[0] > self.flap_window:
+            self._toggles.popleft()
+
+        if not self.flapping and len(self._toggles) >= self.flap_threshold:
+            self.flapping = True
+            self.flap_episodes += 1
+            self._flap_started = self._toggles[0]
+            self._flap_count = len(self._toggles)
+            events.append(self._event(EVENT_FLAPPING, status, flap_count=self._flap_count,
+                                      flap_window=self.flap_window))
+
+        if key == self._committed_key:
+            self._candidate = None
+        else:
+            if self._candidate is None or self._candidate[0] != key:
+                self._candidate = [key, status, 0, now]
+            self._candidate[1] = status
+            self._candidate[2] += 1
+
+            confirmed = (self._candidate[2] >= self.confirm_samples or
+                         (now - self._candidate[3]) * 1000 >= self.confirm_ms)
+            if confirmed:
+                self._commit(key, status)
+                if self.flapping:
+                    self.suppressed += 1
+                else:
+                    events.append(self._event(determine_event_type(status), status))
+
+        # สัญญาณนิ่งแล้ว (ไม่ต้องรอให้การสลับเก่าหลุดจาก flap_window): ส่งสถานะที่ยืนยันพร้อมสรุปการกระพริบ
+        stable = (self._stable_samples >= self.confirm_samples or
+                  (now - self._last_toggle) * 1000 >= self.confirm_ms)
+        if self.flapping and self._candidate is None and stable:
+            self.flapping = False
+            # เริ่มนับการสลับใหม่ การกระพริบครั้งถัดไปต้องสลับครบ flap_threshold ครั้งอีกรอบ
+            self._toggles.clear()
+            events.append(self._event(determine_event_type(self.committed), self.committed,
+                                      flap_count=self._flap_count,
+                                      flap_duration=round(now - self._flap_started, 3)))
+
+        return events
+
+    def _commit(self, key, status):
+        self.committed = status
+        self._committed_key = key
+        self._candidate = None
+
+    def _event(self, event_type, status, **summary):
+        event = {'event_type': event_type, 'status': status}
+        event.update(summary)
+        return event
+
+
+class _SampleEntry:
+    """ผลการอ่านหนึ่งครั้งของ query (ค่าหรือข้อผิดพลาด) พร้อมเวลาที่อ่านเสร็จ"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.time = None
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class _SamplerWorker:
+    """เธรดอ่านฮาร์ดแวร์หนึ่งเธรด พร้อมคิวคำขอของตัวเอง"""
+
+    def __init__(self, sampler, number):
+        self.requests = queue.Queue()
+        self.current = None  # (ชื่อ query, เวลาที่เริ่มอ่าน)
+        self.thread = threading.Thread(target=sampler._run, args=(self,),
+                                       name=f"hardware-sampler-{number}", daemon=True)
+
+
+class HardwareSampler:
+    """
+    บริการอ่านข้อมูลฮาร์ดแวร์ที่ใช้ร่วมกันระหว่างเธรดตรวจสอบ
+    - ทุก query ทำงานในเธรดของ sampler เพียงเธรดเดียว (การเชื่อมต่อ COM/WMI ชุดเดียว)
+    - ผลลัพธ์ถูกแคชแยกตาม query ผู้อ่านที่ยอมรับข้อมูลอายุไม่เกิน max_age จะได้ผลลัพธ์ชุดเดียวกัน
+    - ผู้อ่านที่ขอ query เดียวกันระหว่างที่กำลังอ่านอยู่จะรอผลลัพธ์ของการอ่านครั้งนั้น ไม่อ่านซ้ำ
+    - ผู้อ่านรอไม่เกิน deadline วินาที (ProbeTimeout) หากเธรดค้างอยู่กับ query ใดนานเกิน deadline
+      ของ query นั้น จะทิ้งเธรดเดิมและเริ่มเธรดใหม่ (watchdog) คำขออื่นที่ค้างอยู่จะย้ายไปยังเธรดใหม่
+    ค่าที่ได้จาก get() ใช้ร่วมกันระหว่างผู้อ่าน ห้ามแก้ไข
+    """
+
+    def __init__(self, on_thread_exit=None, deadline=None):
+        self.on_thread_exit = on_thread_exit
+        self.deadline = deadline
+        self._queries = {}
+        self._deadlines = {}
+        self._latest = {}
+        self._pending = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._worker = None
+        self._closed = False
+        self.restarts = 0
+
+    def register(self, name, func, deadline=None):
+        """เพิ่ม query ชื่อ name ซึ่งอ่านค่าด้วย func() (deadline แทนค่าเริ่มต้นของ sampler ได้)"""
+        self._queries[name] = func
+        self._deadlines[name] = deadline
+        self._stats[name] = {'runs': 0, 'shared': 0, 'errors': 0, 'timeouts': 0, 'last_duration': None}
+
+    def _deadline(self, name):
+        deadline = self._deadlines.get(name)
+        return self.deadline if deadline is None else deadline
+
+    def get(self, name, max_age=0):
+        """
+        ผลลัพธ์ของ query ที่อายุไม่เกิน max_age วินาที
+        หากไม่มีจะส่งคำขอไปยังเธรดของ sampler แล้วรอผล (ข้อผิดพลาดของ query จะถูกส่งต่อ)
+        รอนานเกิน deadline จะเกิด ProbeTimeout
+        """
+        if name not in self._queries:
+            raise KeyError(f"Unknown sampler query: {name}")
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Hardware sampler is closed")
+            stats = self._stats[name]
+            latest = self._latest.get(name)
+            if latest is not None and time.monotonic() - latest.time <= max_age:
+                stats['shared'] += 1
+                return latest.result()
+
+            entry = self._pending.get(name)
+            if entry is None:
+                entry = _SampleEntry()
+                self._pending[name] = entry
+                self._ensure_worker().requests.put(name)
+            else:
+                stats['shared'] += 1
+
+        deadline = self._deadline(name)
+        if not entry.done.wait(deadline):
+            with self._lock:
+                self._stats[name]['timeouts'] += 1
+                self._check_worker()
+            if not entry.done.is_set():
+                raise ProbeTimeout(name, deadline)
+        return entry.result()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = _SamplerWorker(self, self.restarts + 1)
+            self._worker.thread.start()
+        return self._worker
+
+    def _check_worker(self):
+        """watchdog: เริ่มเธรดใหม่หากเธรดปัจจุบันค้างอยู่กับ query เดียวนานเกิน deadline (เรียกขณะถือ _lock)"""
+        worker = self._worker
+        if worker is None or worker.current is None:
+            return
+        name, started = worker.current
+        deadline = self._deadline(name)
+        if deadline is None or time.monotonic() - started < deadline:
+            return
+
+        print(f"Hardware probe '{name}' is stuck, restarting sampler worker")
+        self.restarts += 1
+        self._worker = None
+        worker.requests.put(None)  # ให้เธรดเดิมจบการทำงานหากกลับมาจาก query ได้
+
+        stuck = self._pending.pop(name, None)
+        if stuck is not None:
+            stuck.error = ProbeTimeout(name, deadline)
+            stuck.time = time.monotonic()
+            stuck.done.set()
+
+        if self._pending:
+            new_worker = self._ensure_worker()
+            for pending_name in self._pending:
+                new_worker.requests.put(pending_name)
+
+    def _run(self, worker):
+        try:
+            while True:
+                name = worker.requests.get()
+                if name is None or worker is not self._worker:
+                    break
+                worker.current = (name, time.monotonic())
+                self._sample(worker, name)
+                worker.current = None
+        finally:
+            if self.on_thread_exit is not None:
+                self.on_thread_exit()
+
+    def _sample(self, worker, name):
+        started = time.monotonic()
+        value = error = None
+        try:
+            value = self._queries[name]()
+        except Exception as e:
+            error = e
+        finished = time.monotonic()
+
+        with self._lock:
+            if worker is not self._worker:
+                return  # เธรดนี้ถูกทิ้งไปแล้ว ผู้อ่านได้รับ ProbeTimeout ไปแล้ว
+            entry = self._pending.pop(name, None)
+            if entry is None:
+                return
+            entry.value = value
+            entry.error = error
+            entry.time = finished
+
+            stats = self._stats[name]
+            stats['runs'] += 1
+            stats['last_duration'] = finished - started
+            if error is not None:
+                stats['errors'] += 1
+            self._latest[name] = entry
+        entry.done.set()
+
+    def stats(self):
+        """
+        สถิติของแต่ละ query: จำนวนครั้งที่อ่านจริง (runs), ใช้ผลลัพธ์ร่วมกัน (shared),
+        ผิดพลาด (errors) และหมดเวลา (timeouts)
+        """
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def close(self, timeout=None):
+        """หยุดเธรดของ sampler หลังอ่านคำขอที่ค้างอยู่เสร็จ (รอไม่เกิน timeout วินาที)"""
+        with self._lock:
+            self._closed = True
+            worker = self._worker
+        if worker is not None:
+            worker.requests.put(None)
+            worker.thread.join(timeout)
+
+
+def create_hardware_sampler(backend, deadline=None):
+    """สร้าง HardwareSampler ที่อ่านข้อมูลทุกชนิดใน PROBE_QUERIES ผ่าน backend"""
+    sampler = HardwareSampler(on_thread_exit=backend.close_thread, deadline=deadline)
+    for name in PROBE_QUERIES:
+        sampler.register(name, functools.partial(backend.read_query, name))
+    return sampler
+
+
+def create_event_source(backend):
+    """แหล่งเหตุการณ์จอภาพของ backend (เฉพาะ WMI บน Windows เมื่อเปิด HDMI_EVENT_DRIVEN) หรือ None"""
+    if HDMI_EVENT_DRIVEN and isinstance(backend, WindowsProbeBackend):
+        return WMIDisplayEventSource(backend.wmi_pool)
+    return None
+
+
+def notification_message(log_entry):
+    """สร้างข้อความแจ้งเตือนตามประเภทเหตุการณ์ของรายการล็อก"""
+    event_type = log_entry['event_type']
+    status = log_entry['status']
+    if event_type == EVENT_FLAPPING:
+        return (f"สัญญาณ HDMI ไม่เสถียร: สถานะเปลี่ยนไปมา {log_entry['flap_count']} ครั้ง"
+                f"ใน {log_entry['flap_window']} วินาที")
+    elif event_type == "HDMI_DISCONNECTED":
+        return "HDMI ถูกถอดออกจากเครื่อง"
+    elif event_type == "HDMI_INACTIVE":
+        return "HDMI เชื่อมต่ออยู่แต่ไม่ทำงาน"
+    elif event_type.startswith("GPU_ERROR_CODE_"):
+        error_code = event_type.split("_")[-1]
+        for gpu_id, gpu_info in status['gpu_status'].items():
+            if str(gpu_info['error_code']) == error_code:
+                return f"การ์ดจอ {gpu_info['name']} มีปัญหา: {gpu_info['error_description']}"
+        return f"การ์ดจอมีปัญหา (รหัส {error_code})"
+    elif event_type == "NORMAL":
+        return "การเชื่อมต่อ HDMI กลับมาทำงานปกติแล้ว"
+    else:
+        return f"เหตุการณ์: {event_type}"
+
+
+def _ignore(*args):
+    pass
+
+
+class HDMIMonitorCore:
+    """
+    วงรอบตรวจสอบสถานะ HDMI และไดรเวอร์การ์ดจอ (ไม่ขึ้นกับ Qt)
+    on_status(status) ถูกเรียกทุกครั้งที่ตรวจสอบ, on_event(log_entry) เมื่อมีเหตุการณ์ที่ยืนยันแล้ว
+    และ on_error(message) เมื่อรอบตรวจสอบผิดพลาด ทุก callback ถูกเรียกจากเธรดที่เรียก run()
+    หากกำหนด history (MetricHistory) สถานะ HDMI ทุกรอบจะถูกเก็บไว้สำหรับกราฟย้อนหลัง
+    """
+
+    def __init__(self, backend=None, event_source=None, scheduler=None, sampler=None, debouncer=None,
+                 on_status=None, on_event=None, on_error=None, history=None):
+        self.running = True
+        self.interval = HDMI_CHECK_INTERVAL
+        # ตัวตรวจสอบฮาร์ดแวร์ (WMI บน Windows, DRM sysfs บน Linux)
+        self.backend = backend or create_probe_backend(PROBE_BACKEND)
+        # อ่านข้อมูลฮาร์ดแวร์ผ่าน sampler ที่ใช้ร่วมกับ SystemMonitorCore (ถ้ามี)
+        self.sampler = sampler
+        self.on_status = on_status or _ignore
+        self.on_event = on_event or _ignore
+        self.on_error = on_error or _ignore
+        self.history = history
+
+        # โหมดเหตุการณ์: ตรวจสอบเมื่อได้รับเหตุการณ์ และตรวจสอบสำรองทุก safety_interval วินาที
+        self.event_source = event_source
+        self.safety_interval = HDMI_SAFETY_POLL_INTERVAL
+        self.events_received = 0
+        self.last_event_latency = None  # เวลาตั้งแต่เกิดเหตุการณ์จนส่งสถานะใหม่ (วินาที)
+        self.probe_timeouts = 0  # จำนวนรอบที่อ่านฮาร์ดแวร์ไม่เสร็จภายใน PROBE_DEADLINE
+        self._pending_event = None
+
+        # ตรวจสอบถี่หลังสถานะเปลี่ยน แล้วค่อยๆ ห่างออกเมื่อสถานะคงที่
+        # ยืดรอบได้ถึง safety_interval เฉพาะเมื่อมีแหล่งเหตุการณ์แจ้งการถอดสายอยู่แล้ว
+        max_interval = HDMI_MAX_CHECK_INTERVAL if event_source is None else self.safety_interval
+        self.scheduler = scheduler or AdaptiveScheduler(HDMI_MIN_CHECK_INTERVAL, max_interval,
+                                                        backoff=POLL_BACKOFF)
+
+        # ยืนยันการเปลี่ยนสถานะหลังผลตรวจสอบคงที่ และรวมการกระพริบเป็นเหตุการณ์ FLAPPING เดียว
+        self.debouncer = debouncer or StatusDebouncer(HDMI_DEBOUNCE_SAMPLES, HDMI_DEBOUNCE_MS,
+                                                      HDMI_FLAP_THRESHOLD, HDMI_FLAP_WINDOW)
+
+    def run(self):
+        while self.running:
+            try:
+                status = self.check_hdmi_status()
+                self.on_status(status)
+                if self._pending_event is not None:
+                    self.last_event_latency = time.monotonic() - self._pending_event['time']
+                    self._pending_event = None
+
+                # ตรวจสอบการเปลี่ยนแปลงสถานะและบันทึกล็อกหากมีการเปลี่ยนแปลง
+                timeouts = status.get('probe_timeouts')
+                if timeouts:
+                    self.probe_timeouts += 1
+                if timeouts and QUERY_MONITORS in timeouts:
+                    # อ่านจอภาพไม่ทันเวลา ไม่ใช้ผลนี้ตัดสินว่าสถานะเปลี่ยน
+                    events = []
+                else:
+                    events = self.debouncer.update(self._debounce_status(status))
+                    if self.history is not None:
+                        self.history.record_hdmi(status)
+                for event in events:
+                    self._emit_event(event)
+                # ตรวจสอบถี่ต่อไประหว่างรอยืนยันสถานะใหม่
+                self.scheduler.record(bool(events) or self.debouncer.pending)
+
+                self._wait_for_next_check()
+            except Exception as e:
+                error_msg = f"Error in monitoring thread: {str(e)}"
+                print(error_msg)
+                self.on_error(error_msg)
+                time.sleep(self.interval)
+
+        self.backend.close_thread()
+
+    def _debounce_status(self, status):
+        """
+        สถานะที่ใช้ตัดสินการเปลี่ยนแปลง: หากอ่านการ์ดจอไม่ทันเวลา (nvidia-smi/WMI ค้าง)
+        ให้ใช้ gpu_status ที่ยืนยันล่าสุดแทน เพื่อให้ยังบันทึกการเปลี่ยนแปลงของจอภาพได้
+        """
+        timeouts = status.get('probe_timeouts')
+        if not timeouts or (QUERY_GPUS not in timeouts and QUERY_CONTROLLERS not in timeouts):
+            return status
+        committed = self.debouncer.committed
+        status = dict(status)
+        status['gpu_status'] = dict(committed['gpu_status']) if committed is not None else {}
+        return status
+
+    def _wait_for_next_check(self):
+        """รอจนถึงรอบตรวจสอบถัดไป หรือจนกว่าจะมีเหตุการณ์จอภาพเปลี่ยนแปลง"""
+        if self.event_source is None:
+            self.scheduler.sleep()
+            return
+
+        try:
+            event = self.event_source.wait(self.scheduler.next_interval())
+        except Exception as e:
+            # สมัครรับเหตุการณ์ไม่ได้ ให้กลับไปใช้การตรวจสอบตามรอบเวลา
+            print(f"Display event subscription failed, falling back to polling: {str(e)}")
+            self.event_source = None
+            self.scheduler.max_interval = HDMI_MAX_CHECK_INTERVAL
+            self.scheduler.sleep()
+            return
+
+        if event is not None:
+            self.events_received += 1
+            self._pending_event = event
+            # อุปกรณ์เปลี่ยนแปลง: อ่านข้อมูลการ์ดจอและไดรเวอร์ใหม่ในการตรวจสอบครั้งนี้
+            self.backend.inventory.invalidate()
+
+    def _emit_event(self, event):
+        """ส่งรายการล็อกของเหตุการณ์ที่ยืนยันแล้ว"""
+        log_entry = {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'status': event['status'],
+            'event_type': event['event_type']
+        }
+        for key in ('flap_count', 'flap_window', 'flap_duration'):
+            if key in event:
+                log_entry[key] = event[key]
+        self.on_event(log_entry)
+
+    def check_hdmi_status(self):
+        """ตรวจสอบสถานะการเชื่อมต่อ HDMI และไดรเวอร์การ์ดจอ"""
+        if self.sampler is None:
+            return self.backend.check_hdmi_status()
+        return self.backend.check_hdmi_status(read=self._read_sample)
+
+    def _read_sample(self, name):
+        """อ่านข้อมูลดิบผ่าน sampler"""
+        # จอภาพต้องอ่านใหม่ทุกครั้ง เพื่อไม่ให้ได้สถานะก่อนเกิดเหตุการณ์
+        max_age = 0 if name == QUERY_MONITORS else SAMPLE_MAX_AGE
+        return self.sampler.get(name, max_age)
+
+    def poll_metrics(self):
+        """สถิติอัตราการตรวจสอบ HDMI"""
+        metrics = self.scheduler.metrics()
+        metrics['events_received'] = self.events_received
+        metrics['probe_timeouts'] = self.probe_timeouts
+        return metrics
+
+    def stop(self):
+        self.running = False
+        self.scheduler.wake()
+        if self.event_source is not None:
+            self.event_source.close()
+
+
+class SystemMonitorCore:
+    """
+    วงรอบตรวจสอบสถานะระบบ (CPU, RAM, GPU) ที่ไม่ขึ้นกับ Qt
+    on_status(status) ถูกเรียกจากเธรดที่เรียก run() ทุกครั้งที่ตรวจสอบ
+    ทุกผลการตรวจสอบถูกเก็บใน history (MetricHistory) สำหรับสถิติย้อนหลัง
+    หากไม่ได้กำหนด history จะสร้างเมื่อเริ่ม run() (numpy ถูกนำเข้าเมื่อจำเป็นเท่านั้น)
+    """
+
+    def __init__(self, backend=None, scheduler=None, sampler=None, on_status=None, history=None):
+        self.running = True
+        self.interval = SYSTEM_CHECK_INTERVAL
+        self.backend = backend or create_probe_backend(PROBE_BACKEND)
+        self.sampler = sampler
+        self.on_status = on_status or _ignore
+        # ค่าการใช้งานคงที่ให้ตรวจสอบห่างขึ้น และตรวจสอบนานๆ ครั้งขณะไม่มีผู้ดูผล
+        self.scheduler = scheduler or AdaptiveScheduler(SYSTEM_CHECK_INTERVAL, SYSTEM_MAX_CHECK_INTERVAL,
+                                                        backoff=POLL_BACKOFF,
+                                                        hidden_interval=SYSTEM_HIDDEN_CHECK_INTERVAL)
+        self.history = history
+        self.last_status = None
+
+    def run(self):
+        if self.history is None:
+            from metric_history import MetricHistory
+            self.history = MetricHistory()
+
+        while self.running:
+            try:
+                status = self.check_system_status()
+                self.history.record(status)
+                self.on_status(status)
+                self.scheduler.record(self._is_significant_change(status))
+                self.last_status = status
+                self.scheduler.sleep()
+            except Exception as e:
+                print(f"Error in system monitoring thread: {str(e)}")
+                time.sleep(self.interval)
+
+        self.backend.close_thread()
+
+    def check_system_status(self):
+        """ตรวจสอบสถานะ CPU, RAM และ GPU"""
+        result = {
+            'cpu': {},
+            'memory': {},
+            'gpu': [],
+            'temperatures': {}
+        }
+
+        try:
+            # CPU
+            cpu_percent = psutil.cpu_percent(interval=None)
+            cpu_count = psutil.cpu_count(logical=True)
+            cpu_freq = psutil.cpu_freq()
+
+            result['cpu'] = {
+                'percent': cpu_percent,
+                'cores': cpu_count,
+                'frequency': cpu_freq.current if cpu_freq else 0
+            }
+
+            # Memory
+            memory = psutil.virtual_memory()
+            result['memory'] = {
+                'total': memory.total,
+                'available': memory.available,
+                'percent': memory.percent,
+                'used': memory.used
+            }
+
+            # อุณหภูมิ - ใช้ psutil แทนการใช้ WMI
+            try:
+                # ตรวจสอบว่า psutil มีข้อมูลอุณหภูมิหรือไม่
+                if hasattr(psutil, 'sensors_temperatures'):
+                    temps = psutil.sensors_temperatures()
+                    if temps:
+                        # CPU Temperature
+                        for name, entries in temps.items():
+                            if 'cpu' in name.lower() or 'coretemp' in name.lower():
+                                if entries:
+                                    result['temperatures']['cpu'] = entries[0].current
+                            elif 'acpi' in name.lower() or 'system' in name.lower() or 'motherboard' in name.lower():
+                                if entries:
+                                    result['temperatures']['mainboard'] = entries[0].current
+                else:
+                    # ถ้า psutil ไม่มีข้อมูล temperature
+                    result['temperatures']['error'] = "ไม่สามารถอ่านอุณหภูมิได้ (psutil ไม่สนับสนุนบนระบบนี้)"
+            except Exception as e:
+                result['temperatures']['error'] = f"ไม่สามารถอ่านอุณหภูมิได้: {str(e)}"
+
+            # GPU (ข้อมูลคงที่มาจากแคช อ่านใหม่เฉพาะ load, หน่วยความจำ และอุณหภูมิ)
+            try:
+                gpus = self._read_sample(QUERY_GPUS)
+                if not gpus:
+                    # ถ้าไม่พบ GPU ให้ใช้ข้อมูลการ์ดจอจากระบบปฏิบัติการแทน
+                    for controller in self._read_sample(QUERY_CONTROLLERS):
+                        result['gpu'].append({
+                            'name': controller['name'],
+                            'driver_version': controller['driver_version'],
+                            'driver_status': "ปกติ" if controller['error_code'] == 0 else "มีปัญหา",
+                            'status_message': self._get_error_description(controller['error_code'])
+                        })
+                    if not result['gpu']:
+                        result['gpu'].append({'error': "ไม่พบข้อมูล GPU"})
+                else:
+                    for gpu in gpus:
+                        result['gpu'].append({
+                            'name': gpu['name'],
+                            'load': gpu['load'],
+                            'memory_total': gpu['memory_total'],
+                            'memory_used': gpu['memory_used'],
+                            'memory_percent': (gpu['memory_used'] / gpu['memory_total']) * 100 if gpu['memory_total'] > 0 else 0,
+                            'temperature': gpu['temperature']
+                        })
+            except Exception as e:
+                print(f"Error getting GPU info: {str(e)}")
+                if isinstance(e, ProbeTimeout):
+                    result['probe_timeouts'] = [e.query]
+                result['gpu'].append({'error': str(e)})
+
+        except Exception as e:
+            print(f"Error checking system status: {str(e)}")
+
+        if not result['gpu']:
+            result['gpu'].append({'error': "ไม่พบข้อมูล GPU"})
+
+        return result
+
+    def _read_sample(self, name):
+        """อ่านข้อมูลดิบผ่าน sampler ที่ใช้ร่วมกับ HDMIMonitorCore (ถ้ามี)"""
+        if self.sampler is None:
+            return self.backend.read_query(name)
+        return self.sampler.get(name, SAMPLE_MAX_AGE)
+
+    def _get_error_description(self, error_code):
+        """แปลงรหัสข้อผิดพลาดเป็นคำอธิบาย"""
+        return get_error_description(error_code)
+
+    def _is_significant_change(self, status):
+        """ตรวจสอบว่าค่าการใช้งานเปลี่ยนไปจากครั้งก่อนเกิน SYSTEM_CHANGE_THRESHOLD หรือไม่"""
+        if self.last_status is None:
+            return True
+
+        def changed(old, new):
+            return abs(new - old) >= SYSTEM_CHANGE_THRESHOLD
+
+        if changed(self.last_status['cpu'].get('percent', 0), status['cpu'].get('percent', 0)):
+            return True
+        if changed(self.last_status['memory'].get('percent', 0), status['memory'].get('percent', 0)):
+            return True
+
+        if len(self.last_status['gpu']) != len(status['gpu']):
+            return True
+        for old_gpu, new_gpu in zip(self.last_status['gpu'], status['gpu']):
+            if changed(old_gpu.get('load', 0), new_gpu.get('load', 0)):
+                return True
+            if old_gpu.get('driver_status') != new_gpu.get('driver_status'):
+                return True
+
+        return False
+
+    def rolling_stats(self, windows=None):
+        """สถิติ min/max/mean/p95 ย้อนหลังของค่าการใช้งาน (ดู MetricHistory.rolling_stats)"""
+        if self.history is None:
+            return {}
+        return self.history.rolling_stats(windows)
+
+    def history_series(self, name, start=None, end=None, max_points=None):
+        """ค่าย้อนหลังของ name สำหรับกราฟ ไม่เกิน max_points จุด (ดู MetricHistory.query)"""
+        if self.history is None:
+            return [], []
+        return self.history.query(name, start, end, max_points)
+
+    def set_window_visible(self, visible):
+        """แจ้งว่ามีผู้ดูผลการตรวจสอบอยู่หรือไม่ (เช่น หน้าต่างถูกซ่อนใน System Tray)"""
+        self.scheduler.set_hidden(not visible)
+
+    def poll_metrics(self):
+        """สถิติอัตราการตรวจสอบสถานะระบบ"""
+        return self.scheduler.metrics()
+
+    def stop(self):
+        self.running = False
+        self.scheduler.wake()
+
+
+class LogManager:
+    """จัดการการบันทึกและเรียกดูล็อก"""
+
+    def __init__(self, log_file=None, storage=LOG_STORAGE, legacy_log_file=LOG_FILE,
+                 max_bytes=LOG_ROTATE_MAX_BYTES, max_age_days=LOG_ROTATE_MAX_AGE_DAYS,
+                 retention_days=LOG_RETENTION_DAYS, archive_dir=LOG_ARCHIVE_DIR,
+                 delta=LOG_DELTA_ENCODING, keyframe_interval=LOG_KEYFRAME_INTERVAL):
+        self.storage = storage
+        if storage == STORAGE_JSONL:
+            self.log_file = log_file or LOG_FILE_JSONL
+            retention_start = read_retention_start(self.log_file)
+            # ย้ายประวัติจากไฟล์ JSON เดิมในครั้งแรกที่ใช้รูปแบบ JSONL
+            # (ล็อกที่ย้ายมานับอายุจากวันที่ย้าย ไม่ถูกลบทันทีแม้เก่ากว่า retention_days)
+            try:
+                encoder = SnapshotEncoder(keyframe_interval) if delta else None
+                if migrate_json_array_to_jsonl(legacy_log_file, self.log_file, encoder):
+                    retention_start = mark_migrated(self.log_file)
+            except Exception as e:
+                print(f"Error migrating legacy log file: {str(e)}")
+            self.store = JsonlLogStore(self.log_file, max_bytes=max_bytes, max_age_days=max_age_days,
+                                       retention_days=retention_days, archive_dir=archive_dir,
+                                       delta=delta, keyframe_interval=keyframe_interval,
+                                       retention_start=retention_start)
+        elif storage == STORAGE_SQLITE:
+            self.log_file = log_file or LOG_FILE_SQLITE
+            is_new = not os.path.exists(self.log_file)
+            self.store = SqliteLogStore(self.log_file, retention_days=retention_days,
+                                        retention_start=read_retention_start(self.log_file))
+            # นำเข้าประวัติจากไฟล์ JSON เดิมเมื่อสร้างฐานข้อมูลใหม่ (นับอายุของล็อกที่นำเข้าจากวันที่นำเข้า)
+            if is_new and os.path.exists(legacy_log_file):
+                self.store.retention_start = mark_migrated(self.log_file)
+                try:
+                    self.store.import_file(legacy_log_file)
+                except Exception as e:
+                    print(f"Error importing legacy log file: {str(e)}")
+        elif storage == STORAGE_JSON:
+            self.log_file = log_file or LOG_FILE
+            self.store = JsonArrayLogStore(self.log_file)
+        else:
+            raise ValueError(f"Unknown log storage: {storage}")
+
+        self.writer = None
+
+    def start_background_writer(self, batch_size=LOG_WRITER_BATCH_SIZE,
+                                flush_interval=LOG_WRITER_FLUSH_INTERVAL, fsync=LOG_WRITER_FSYNC):
+        """เริ่มเธรดเขียนล็อกเบื้องหลัง หลังจากนี้ add_log_entry จะไม่รอการเขียนดิสก์"""
+        if self.writer is None:
+            self.writer = BackgroundLogWriter(self.store, batch_size, flush_interval, fsync)
+            self.writer.start()
+        return self.writer
+
+    def queue_depth(self):
+        """จำนวนรายการล็อกที่ยังรอเขียนลงดิสก์"""
+        return self.writer.queue_depth() if self.writer else 0
+
+    def close(self):
+        """เขียนล็อกที่ค้างอยู่ให้หมดแล้วปิดที่เก็บล็อก"""
+        if self.writer is not None:
+            pending = self.writer.queue_depth()
+            if pending:
+                print(f"Flushing {pending} pending log entries...")
+            self.writer.close()
+            self.writer = None
+        if hasattr(self.store, 'close'):
+            self.store.close()
+
+    def add_log_entry(self, log_entry):
+        """เพิ่มรายการล็อกใหม่"""
+        try:
+            if self.writer is not None:
+                self.writer.submit(log_entry)
+            else:
+                self.store.append(log_entry)
+            return True
+        except Exception as e:
+            print(f"Error adding log entry: {str(e)}")
+            return False
+
+    def _read(self, read, start=None, end=None, event_types=None, limit=None, newest_first=False):
+        """อ่านจากที่เก็บล็อก และรวมรายการที่ยังรอเธรดเขียนล็อกซึ่งตรงกับเงื่อนไข"""
+        try:
+            if self.writer is None:
+                return read()
+            logs, pending = self.writer.snapshot(read)
+        except Exception as e:
+            print(f"Error reading logs: {str(e)}")
+            return []
+
+        pending = filter_logs(pending, start, end, event_types, newest_first=newest_first)
+        if not pending:
+            return logs
+        if newest_first:
+            logs = pending + logs
+            return logs if limit is None else logs[:limit]
+        logs = logs + pending
+        if limit is None:
+            return logs
+        return logs[len(logs) - limit:] if limit else []
+
+    def get_logs(self):
+        """อ่านล็อกทั้งหมด"""
+        return self._read(self.store.read_all)
+
+    def get_logs_by_date(self, date):
+        """อ่านล็อกตามวันที่ (QDate, datetime.date หรือข้อความ "yyyy-MM-dd")"""
+        if isinstance(date, str):
+            date_str = date
+        elif isinstance(date, datetime.date):
+            date_str = date.strftime("%Y-%m-%d")
+        else:
+            date_str = date.toString("yyyy-MM-dd")
+        return self._read(lambda: self.store.read_day(date_str), start=date_str, end=next_day_key(date_str))
+
+    def get_logs_in_range(self, start, end, event_types=None):
+        """อ่านล็อกในช่วงเวลา [start, end) โดยเลือกกรองตามประเภทเหตุการณ์ได้"""
+        return self._read(lambda: self.store.query(start=start, end=end, event_types=event_types),
+                          start=start, end=end, event_types=event_types)
+
+    def get_logs_by_event_type(self, event_types, limit=None):
+        """อ่านล็อกตามประเภทเหตุการณ์ (ระบุ limit เพื่อเอาเฉพาะรายการล่าสุด)"""
+        return self._read(lambda: self.store.query(event_types=event_types, limit=limit),
+                          event_types=event_types, limit=limit)
+
+    def get_last_logs(self, count, event_types=None):
+        """อ่านล็อกล่าสุด count รายการ เรียงจากใหม่ไปเก่า"""
+        return self._read(lambda: self.store.query(event_types=event_types, limit=count, newest_first=True),
+                          event_types=event_types, limit=count, newest_first=True)
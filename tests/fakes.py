@@ -0,0 +1,110 @@
+"""
+โมดูล wmi, GPUtil และ pythoncom จำลองสำหรับทดสอบและวัดความเร็วบนระบบที่ไม่ใช่ Windows
+ใช้ร่วมกันระหว่าง tests/ และ benchmarks/monitor_bench.py
+"""
+import random
+import threading
+
+from hw_probes import CONNECTION_TYPE_HDMI, WMIConnectionPool, WindowsProbeBackend
+
+
+class FakeWMIObject:
+    """อินสแตนซ์ของคลาส WMI จำลอง (ค่าคุณสมบัติเป็น attribute)"""
+
+    def __init__(self, **properties):
+        self.__dict__.update(properties)
+
+
+class FakeWMIConnection:
+    """การเชื่อมต่อ wmi.WMI() จำลอง อ่านรายการปัจจุบันของโมดูลทุกครั้งที่ query (รูปแบบเดียวกับ wmi จริง)"""
+
+    def __init__(self, module):
+        self._module = module
+
+    def WmiMonitorConnectionParams(self, fields=None, **filters):
+        return list(self._module.monitors)
+
+    def Win32_VideoController(self, fields=None, **filters):
+        return list(self._module.controllers)
+
+
+class FakeWMIModule:
+    """
+    โมดูล wmi จำลอง: จอ HDMI หนึ่งจอ จอ DisplayPort หนึ่งจอ และการ์ดจอหนึ่งใบ
+    รายการ monitors/controllers แก้ไขได้ระหว่างทดสอบ (เช่น จำลองการถอดสาย)
+    """
+
+    def __init__(self, hdmi_active=True):
+        self.monitors = [
+            FakeWMIObject(InstanceName="DISPLAY\\TEST01\\1&1&0&UID0_0",
+                          VideoOutputTechnology=CONNECTION_TYPE_HDMI, Active=hdmi_active),
+            FakeWMIObject(InstanceName="DISPLAY\\TEST02\\1&1&0&UID1_0", VideoOutputTechnology=10, Active=True)
+        ]
+        self.controllers = [
+            FakeWMIObject(Name="Test GPU", Status="OK", ConfigManagerErrorCode=0,
+                          DriverVersion="31.0.15.0000", DriverDate="20240101000000.000000-000")
+        ]
+
+    def WMI(self, namespace=None):
+        return FakeWMIConnection(self)
+
+
+class FakeComModule:
+    """โมดูล pythoncom จำลอง"""
+
+    def CoInitialize(self):
+        pass
+
+    def CoUninitialize(self):
+        pass
+
+
+class FakeGPUtil:
+    """
+    GPUtil ที่มีการ์ด NVIDIA count ใบ นับจำนวนครั้งที่ถูกเรียก (แต่ละครั้งเท่ากับเรียก nvidia-smi หนึ่งครั้ง)
+    random_readings=True ให้ค่าการใช้งานเปลี่ยนทุกครั้งที่อ่าน (ใช้วัดความเร็ว)
+    """
+
+    def __init__(self, count=1, random_readings=False):
+        self.count = count
+        self.random_readings = random_readings
+        self.calls = 0
+
+    def getGPUs(self):
+        self.calls += 1
+        gpus = []
+        for idx in range(self.count):
+            if self.random_readings:
+                readings = {'memoryUsed': random.uniform(500, 4000), 'load': random.random(),
+                            'temperature': random.uniform(40, 80)}
+            else:
+                readings = {'memoryUsed': 1024.0, 'load': 0.5, 'temperature': 60}
+            gpus.append(FakeWMIObject(id=idx, uuid=f"GPU-test-{idx}", name=f"Test NVIDIA {idx}",
+                                      driver="551.23", memoryTotal=8192.0, **readings))
+        return gpus
+
+
+class HangingGPUtil:
+    """GPUtil ที่ getGPUs() ค้างจนกว่าจะเรียก release() (จำลอง nvidia-smi ค้าง)"""
+
+    def __init__(self, released=False):
+        self.released = threading.Event()
+        if released:
+            self.released.set()
+
+    def getGPUs(self):
+        self.released.wait()
+        return []
+
+    def release(self):
+        self.released.set()
+
+
+def create_fake_backend(wmi_module=None, gputil_module=None):
+    """
+    WindowsProbeBackend ที่ใช้โมดูลจำลองทั้งหมด (ไม่ใช้ pynvml)
+    ค่าเริ่มต้นไม่มีการ์ด NVIDIA ส่ง gputil_module=FakeGPUtil() เพื่อจำลองการ์ด NVIDIA
+    """
+    pool = WMIConnectionPool(wmi_module or FakeWMIModule(), FakeComModule())
+    return WindowsProbeBackend(wmi_pool=pool, gputil_module=gputil_module or HangingGPUtil(released=True),
+                               nvml_module=False)
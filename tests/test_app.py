@@ -0,0 +1,41 @@
+"""
+ตารางล็อกในหน้าต่างหลัก (LogTableModel) บน Qt แบบ offscreen
+"""
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PyQt5")
+
+from PyQt5.QtCore import Qt
+
+from app import LogTableModel
+from hw_probes import CONNECTION_TYPE_HDMI
+
+
+def test_log_details_are_single_line_with_full_text_in_tooltip():
+    log = {
+        'timestamp': "2025-04-01T10:00:00.123456",
+        'event_type': "GPU_ERROR_CODE_43",
+        'flap_count': 5,
+        'flap_duration': 12.0,
+        'status': {
+            'hdmi_connected': True,
+            'hdmi_active': True,
+            'hdmi_devices': [{'instance_name': "DISPLAY\\TEST01", 'connection_type': CONNECTION_TYPE_HDMI,
+                              'active': True, 'status': "normal"}],
+            'gpu_status': {'gpu_0': {'name': "Test GPU", 'error_code': 43,
+                                     'error_description': "Windows หยุดการทำงานของอุปกรณ์"}}
+        }
+    }
+    model = LogTableModel()
+    model.set_logs([log])
+    index = model.index(0, 3)
+
+    display = model.data(index, Qt.DisplayRole)
+    tooltip = model.data(index, Qt.ToolTipRole)
+    assert "\n" not in display
+    assert len(tooltip.splitlines()) == 3
+    assert display == " | ".join(tooltip.splitlines())
+    assert model.data(model.index(0, 0), Qt.ToolTipRole) is None
@@ -0,0 +1,25 @@
+"""
+โหมด daemon เมื่อเปิดพอร์ต /metrics ไม่ได้
+"""
+import io
+import sys
+import socket
+
+import hdmi_daemon
+
+
+def test_daemon_exits_cleanly_when_metrics_port_is_in_use(monkeypatch):
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", stdout)
+    monkeypatch.setattr(sys, "stderr", stderr)
+
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen(1)
+        port = busy.getsockname()[1]
+        code = hdmi_daemon.main(["--daemon", "--metrics-port", str(port)])
+
+    assert code == 1
+    assert f"Cannot start metrics exporter on 127.0.0.1:{port}" in stderr.getvalue()
+    assert stdout.getvalue() == ""
@@ -0,0 +1,158 @@
+"""
+การเชื่อมต่อ WMI ที่ใช้ซ้ำ, backend DRM sysfs บนโครงสร้างไฟล์จำลอง
+และแคชข้อมูลการ์ดจอ (GpuInventory) เมื่อ nvidia-smi/GPUtil ค้าง
+"""
+import time
+import threading
+
+from hw_probes import (CONNECTION_TYPE_HDMI, CONNECTION_TYPE_INTERNAL, WMI_NAMESPACE_MONITOR,
+                       SysfsProbeBackend)
+from fakes import FakeGPUtil, HangingGPUtil, FakeWMIModule, create_fake_backend
+
+
+def test_inventory_does_not_block_while_gpu_query_hangs():
+    gputil = HangingGPUtil()
+    backend = create_fake_backend(gputil_module=gputil)
+    inventory = backend.inventory
+    stuck = threading.Thread(target=inventory.nvidia_gpus, daemon=True)
+    stuck.start()
+    try:
+        time.sleep(0.1)
+        started = time.monotonic()
+        inventory.invalidate()
+        controllers = inventory.controllers()
+        gpus = inventory.nvidia_gpus()
+        assert time.monotonic() - started < 1
+        assert [controller['name'] for controller in controllers] == ["Test GPU"]
+        assert gpus == []
+        assert stuck.is_alive()
+    finally:
+        gputil.release()
+        stuck.join(5)
+
+
+def test_inventory_reloads_after_invalidate():
+    backend = create_fake_backend()
+    inventory = backend.inventory
+    inventory.controllers()
+    inventory.controllers()
+    assert inventory.refreshes == 1
+    inventory.invalidate()
+    inventory.controllers()
+    assert inventory.refreshes == 2
+
+
+def test_controller_error_code_is_read_every_check():
+    wmi_module = FakeWMIModule()
+    backend = create_fake_backend(wmi_module)
+    assert backend.inventory.controllers()[0]['error_code'] == 0
+
+    wmi_module.controllers[0].ConfigManagerErrorCode = 43
+    controller = backend.inventory.controllers()[0]
+    assert controller['error_code'] == 43
+    assert controller['driver_status'] == "error"
+    assert controller['name'] == "Test GPU"
+    assert backend.inventory.refreshes == 1
+
+
+def test_wmi_connection_is_reused_across_polls():
+    backend = create_fake_backend()
+    for _ in range(5):
+        status = backend.check_hdmi_status()
+    assert status['hdmi_connected'] and status['hdmi_active']
+    # เชื่อมต่อครั้งเดียวต่อ namespace (root\wmi และ root\cimv2) ไม่ใช่ทุกรอบตรวจสอบ
+    assert backend.wmi_pool.connects == 2
+    assert backend.wmi_pool.reconnects == 0
+
+
+def test_wmi_pool_reconnects_after_failed_query():
+    backend = create_fake_backend()
+    backend.check_hdmi_status()
+
+    def broken(*fields, **filters):
+        raise RuntimeError("The RPC server is unavailable")
+
+    backend.wmi_pool.get(WMI_NAMESPACE_MONITOR).WmiMonitorConnectionParams = broken
+    assert backend.check_hdmi_status()['hdmi_connected']
+    assert backend.wmi_pool.reconnects == 1
+    assert backend.wmi_pool.connects == 3
+
+
+def write_sysfs(root, path, value):
+    target = root.joinpath(*path.split("/"))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(value + "\n")
+
+
+def create_sysfs_backend(tmp_path):
+    """โครงสร้าง /sys จำลอง: การ์ด Intel หนึ่งใบ จอ eDP และพอร์ต HDMI ที่ต่ออยู่"""
+    drm_root = tmp_path / "drm"
+    module_root = tmp_path / "module"
+    write_sysfs(drm_root, "card0/device/uevent", "DRIVER=i915\nPCI_CLASS=30000\nPCI_ID=8086:9A49")
+    write_sysfs(module_root, "i915/version", "1.6.0")
+    write_sysfs(drm_root, "card0-eDP-1/status", "connected")
+    write_sysfs(drm_root, "card0-eDP-1/enabled", "enabled")
+    write_sysfs(drm_root, "card0-HDMI-A-1/status", "connected")
+    write_sysfs(drm_root, "card0-HDMI-A-1/enabled", "enabled")
+    write_sysfs(drm_root, "card0-DP-1/status", "disconnected")
+    write_sysfs(drm_root, "card0-DP-1/enabled", "disabled")
+    backend = SysfsProbeBackend(drm_root=str(drm_root), module_root=str(module_root),
+                                gputil_module=HangingGPUtil(released=True), nvml_module=False)
+    return backend, drm_root
+
+
+def test_sysfs_backend_reads_fake_drm_tree(tmp_path):
+    backend, drm_root = create_sysfs_backend(tmp_path)
+    status = backend.check_hdmi_status()
+
+    assert status['hdmi_connected'] and status['hdmi_active']
+    devices = {device['instance_name']: device for device in status['hdmi_devices']}
+    assert sorted(devices) == ["card0-HDMI-A-1", "card0-eDP-1"]
+    assert devices["card0-HDMI-A-1"]['connection_type'] == CONNECTION_TYPE_HDMI
+    assert devices["card0-eDP-1"]['connection_type'] == CONNECTION_TYPE_INTERNAL
+
+    gpu = status['gpu_status']['gpu_0']
+    assert gpu['name'] == "Intel GPU 9A49 (i915)"
+    assert gpu['driver_version'] == "1.6.0"
+    assert gpu['error_code'] == 0
+
+
+def test_sysfs_backend_follows_hdmi_state(tmp_path):
+    backend, drm_root = create_sysfs_backend(tmp_path)
+
+    write_sysfs(drm_root, "card0-HDMI-A-1/enabled", "disabled")
+    status = backend.check_hdmi_status()
+    assert status['hdmi_connected'] and not status['hdmi_active']
+
+    write_sysfs(drm_root, "card0-HDMI-A-1/status", "disconnected")
+    status = backend.check_hdmi_status()
+    assert not status['hdmi_connected'] and not status['hdmi_active']
+    assert [device['instance_name'] for device in status['hdmi_devices']] == ["card0-eDP-1"]
+
+
+def test_sysfs_backend_reports_missing_driver(tmp_path):
+    backend, drm_root = create_sysfs_backend(tmp_path)
+    write_sysfs(drm_root, "card0/device/uevent", "PCI_CLASS=30000\nPCI_ID=10DE:2204")
+    gpu = backend.check_hdmi_status()['gpu_status']['gpu_0']
+    assert gpu['name'] == "NVIDIA GPU 2204"
+    assert gpu['error_code'] == 28
+    assert gpu['driver_status'] == "error"
+
+
+def test_gputil_is_not_called_on_every_sample():
+    gputil = FakeGPUtil(count=2)
+    backend = create_fake_backend(gputil_module=gputil)
+    for _ in range(10):
+        gpus = backend.sample_gpus()
+    assert [gpu['load'] for gpu in gpus] == [50.0, 50.0]
+    # อ่านข้อมูลคงที่หนึ่งครั้ง และอ่านค่าการใช้งานหนึ่งครั้งภายใน gputil_interval
+    assert gputil.calls == 2
+
+    backend.gputil_interval = 0
+    backend.sample_gpus()
+    assert gputil.calls == 3
+
+    backend.gputil_interval = 60
+    backend.inventory.invalidate()
+    backend.sample_gpus()
+    assert gputil.calls == 5
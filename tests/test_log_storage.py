@@ -0,0 +1,119 @@
+"""
+การย้ายล็อกจากไฟล์ JSON เดิมเมื่ออัปเกรด, การลบล็อกเก่าตาม retention และลำดับของเธรดเขียนล็อกเบื้องหลัง
+"""
+import os
+import json
+import queue
+import datetime
+import threading
+
+import pytest
+
+from log_storage import STORAGE_JSONL, STORAGE_SQLITE, BackgroundLogWriter, JsonlLogStore
+from monitor_core import LogManager
+
+LEGACY_DAYS_AGO = 500  # ล็อกเดิมเก่ากว่า LOG_RETENTION_DAYS (365 วัน)
+
+
+def legacy_entries(count, days_ago=LEGACY_DAYS_AGO):
+    start = datetime.datetime.now() - datetime.timedelta(days=days_ago)
+    return [{
+        'timestamp': (start + datetime.timedelta(minutes=i)).isoformat(),
+        'event_type': "NORMAL",
+        'status': {'hdmi_connected': True, 'hdmi_active': True, 'hdmi_devices': [], 'gpu_status': {}}
+    } for i in range(count)]
+
+
+def open_log_manager(tmp_path, storage):
+    name = "hdmi_monitor_log.db" if storage == STORAGE_SQLITE else "hdmi_monitor_log.jsonl"
+    return LogManager(log_file=str(tmp_path / name), storage=storage,
+                      legacy_log_file=str(tmp_path / "hdmi_monitor_log.json"),
+                      archive_dir=str(tmp_path / "log_archive"))
+
+
+@pytest.mark.parametrize("storage", [STORAGE_JSONL, STORAGE_SQLITE])
+def test_migrated_entries_survive_retention(tmp_path, storage):
+    with open(tmp_path / "hdmi_monitor_log.json", 'w', encoding='utf-8') as f:
+        json.dump(legacy_entries(18), f)
+
+    for _ in range(2):  # ครั้งแรกที่ย้าย และการเปิดครั้งถัดไป
+        log_manager = open_log_manager(tmp_path, storage)
+        try:
+            assert len(log_manager.get_logs()) == 18
+        finally:
+            log_manager.close()
+
+
+def test_retention_still_drops_old_entries_without_migration(tmp_path):
+    log_manager = open_log_manager(tmp_path, STORAGE_JSONL)
+    try:
+        for log_entry in legacy_entries(3) + legacy_entries(2, days_ago=0):
+            log_manager.add_log_entry(log_entry)
+        log_manager.store.apply_retention()
+        assert len(log_manager.get_logs()) == 2
+        assert not os.path.exists(log_manager.log_file + ".migrated")
+    finally:
+        log_manager.close()
+
+
+def test_retention_does_not_archive_recent_days(tmp_path):
+    path = str(tmp_path / "hdmi_monitor_log.jsonl")
+    archive_dir = str(tmp_path / "log_archive")
+    store = JsonlLogStore(path, archive_dir=archive_dir, delta=True)
+    for days_ago in (40, 40, 5, 2, 0):
+        store.append(legacy_entries(1, days_ago=days_ago)[0])
+
+    store = JsonlLogStore(path, retention_days=30, archive_dir=archive_dir, delta=True)
+    assert store.archived_days() == []
+    assert not os.path.exists(archive_dir)
+    days = sorted(store.index.days)
+    assert len(days) == 3
+    assert len(store.read_all()) == 3
+    assert len(store.read_day(days[0])) == 1
+
+
+class RecordingStore:
+
+    def __init__(self):
+        self.entries = []
+
+    def append_many(self, log_entries, fsync=False):
+        self.entries.extend(log_entries)
+
+
+class SlowPutQueue(queue.Queue):
+    """คิวที่ put() ของรายการ "first" ช้า จนกว่ารายการ "second" จะถูกใส่ (หรือครบ 0.5 วินาที)"""
+
+    def __init__(self):
+        super().__init__()
+        self.first_putting = threading.Event()
+        self.second_put = threading.Event()
+
+    def put(self, item, block=True, timeout=None):
+        if isinstance(item, dict) and item.get('event_type') == "first":
+            self.first_putting.set()
+            self.second_put.wait(0.5)
+        super().put(item, block, timeout)
+        if isinstance(item, dict) and item.get('event_type') == "second":
+            self.second_put.set()
+
+
+def test_background_writer_keeps_submit_order():
+    store = RecordingStore()
+    writer = BackgroundLogWriter(store, batch_size=1, flush_interval=0.01, fsync=False)
+    writer._queue = SlowPutQueue()
+    writer.start()
+    try:
+        first = threading.Thread(target=writer.submit, args=({'event_type': "first"},))
+        first.start()
+        assert writer._queue.first_putting.wait(5)
+        second = threading.Thread(target=writer.submit, args=({'event_type': "second"},))
+        second.start()
+        first.join(5)
+        second.join(5)
+        writer.flush()
+
+        assert [entry['event_type'] for entry in store.entries] == ["first", "second"]
+        assert writer.queue_depth() == 0
+    finally:
+        writer.close(timeout=5)
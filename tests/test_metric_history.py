@@ -0,0 +1,65 @@
+"""
+ประวัติค่าการใช้งาน (MetricHistory) เมื่อเพิ่มสถานะ HDMI ปนกับค่าการใช้งานระบบ และการบันทึกลงไฟล์จากหลายเธรด
+"""
+import threading
+import time
+
+import metric_history
+from metric_history import METRIC_CPU_PERCENT, METRIC_HDMI_CONNECTED, MetricHistory
+
+HDMI_CHECKS_PER_SECOND = 5
+
+
+def test_hdmi_samples_do_not_shorten_the_raw_window():
+    start = 1700000000.0
+    history = MetricHistory(capacity=3600)
+    for second in range(3600):
+        now = start + second
+        history.record({'cpu': {'percent': second % 100}, 'memory': {}}, timestamp=now)
+        for i in range(HDMI_CHECKS_PER_SECOND):
+            history.record_hdmi({'hdmi_connected': second % 2 == 0, 'hdmi_active': True},
+                                timestamp=now + i / HDMI_CHECKS_PER_SECOND)
+
+    stats = history.rolling_stats(now=start + 3599)
+    assert stats['1h'][METRIC_CPU_PERCENT]['samples'] == 3600
+    assert stats['15m'][METRIC_CPU_PERCENT]['samples'] == 901
+    assert METRIC_HDMI_CONNECTED not in stats['1h']
+
+    times, values = history.query(METRIC_HDMI_CONNECTED, start, start + 3599)
+    assert len(times) > 0
+    assert 0.4 < values.mean() < 0.6
+
+
+def test_concurrent_saves_do_not_overlap(tmp_path, monkeypatch):
+    savez = metric_history.np.savez_compressed
+    writers = []
+    overlaps = []
+
+    def slow_savez(f, **data):
+        writers.append(1)
+        if len(writers) > 1:
+            overlaps.append(len(writers))
+        time.sleep(0.05)
+        savez(f, **data)
+        writers.pop()
+
+    monkeypatch.setattr(metric_history.np, "savez_compressed", slow_savez)
+    path = str(tmp_path / "history.npz")
+    history = MetricHistory(capacity=100, path=path, autosave_interval=0.001)
+
+    def append_samples(offset):
+        for i in range(20):
+            history.append({'cpu_percent': i}, timestamp=1700000000.0 + offset + i)
+
+    threads = [threading.Thread(target=append_samples, args=(n * 100,)) for n in range(4)]
+    threads.append(threading.Thread(target=history.save))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert overlaps == []
+    history.save()
+    loaded = MetricHistory(capacity=100, path=path)
+    assert loaded.load()
+    assert loaded.count == 80
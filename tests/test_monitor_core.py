@@ -0,0 +1,170 @@
+"""
+การหน่วงสถานะ HDMI (debounce/flapping) และการตรวจสอบ HDMI เมื่อการอ่านฮาร์ดแวร์ค้าง
+โดยใช้โมดูล wmi, GPUtil และ pythoncom จำลอง
+"""
+import time
+import threading
+
+import pytest
+
+from hw_probes import ProbeTimeout, QueueDisplayEventSource
+from monitor_core import (HDMI_CHECK_INTERVAL, AdaptiveScheduler, HardwareSampler, HDMIMonitorCore,
+                          StatusDebouncer, create_hardware_sampler)
+from fakes import HangingGPUtil, FakeWMIModule, create_fake_backend
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def hdmi_status(connected):
+    return {'hdmi_connected': connected, 'hdmi_active': connected,
+            'gpu_status': {'gpu0': {'error_code': 0}}}
+
+
+def feed(debouncer, samples, start=0.0, step=1.0):
+    """ป้อนผลตรวจสอบทีละครั้งห่างกัน step วินาที คืนรายการ (เวลา, เหตุการณ์)"""
+    events = []
+    for i, connected in enumerate(samples):
+        now = start + i * step
+        events.extend((now, e) for e in debouncer.update(hdmi_status(connected), now=now))
+    return events
+
+
+def test_debouncer_confirms_after_consecutive_samples():
+    debouncer = StatusDebouncer(confirm_samples=3, confirm_ms=60000)
+    events = feed(debouncer, [True, False, False, False])
+    assert [(t, e['event_type']) for t, e in events] == [(0.0, "NORMAL"), (3.0, "HDMI_DISCONNECTED")]
+
+
+def test_debouncer_confirms_after_confirm_ms():
+    debouncer = StatusDebouncer(confirm_samples=10, confirm_ms=2000)
+    events = feed(debouncer, [True, False, False, False])
+    assert [(t, e['event_type']) for t, e in events] == [(0.0, "NORMAL"), (3.0, "HDMI_DISCONNECTED")]
+
+
+def test_debouncer_ignores_short_glitch():
+    debouncer = StatusDebouncer(confirm_samples=3, confirm_ms=60000)
+    events = feed(debouncer, [True, False, True, True, True])
+    assert [e['event_type'] for _, e in events] == ["NORMAL"]
+
+
+def test_debouncer_reports_flapping_once():
+    debouncer = StatusDebouncer(confirm_samples=3, confirm_ms=60000, flap_threshold=4, flap_window=60)
+    events = feed(debouncer, [True, False, True, False, True, False, True, False])
+    assert [(t, e['event_type']) for t, e in events] == [(0.0, "NORMAL"), (4.0, "FLAPPING")]
+    assert events[1][1]['flap_count'] == 4
+    assert debouncer.flapping
+    assert debouncer.flap_episodes == 1
+
+
+def test_debouncer_reports_settled_state_soon_after_flapping():
+    debouncer = StatusDebouncer(confirm_samples=3, confirm_ms=60000, flap_threshold=4, flap_window=60)
+    # กระพริบจนถึงวินาทีที่ 5 แล้วถอดสายจริง (สัญญาณนิ่งที่ "ไม่เชื่อมต่อ")
+    events = feed(debouncer, [True, False, True, False, True, False] + [False] * 10)
+    types = [(t, e['event_type']) for t, e in events]
+    assert types == [(0.0, "NORMAL"), (4.0, "FLAPPING"), (7.0, "HDMI_DISCONNECTED")]
+    assert events[-1][1]['flap_count'] == 5
+    assert events[-1][1]['flap_duration'] == 6.0
+    assert not debouncer.flapping
+
+    # หลังจบการกระพริบ การสลับครั้งเดียวต้องไม่เริ่มการกระพริบรอบใหม่
+    events = feed(debouncer, [True, True, True], start=20.0)
+    assert [e['event_type'] for _, e in events] == ["NORMAL"]
+
+
+def test_debouncer_flapping_ends_after_confirm_ms_of_stability():
+    debouncer = StatusDebouncer(confirm_samples=100, confirm_ms=2000, flap_threshold=4, flap_window=60)
+    events = feed(debouncer, [True, False, True, False, True, True, True, True, True], step=0.5)
+    types = [(t, e['event_type']) for t, e in events]
+    assert types == [(0.0, "NORMAL"), (2.0, "FLAPPING"), (4.0, "NORMAL")]
+
+
+def test_hung_probe_times_out_and_restarts_sampler_worker():
+    released = threading.Event()
+    sampler = HardwareSampler(deadline=0.2)
+    sampler.register("hung", lambda: released.wait() and "late")
+    sampler.register("quick", lambda: "ok")
+    try:
+        started = time.monotonic()
+        with pytest.raises(ProbeTimeout):
+            sampler.get("hung")
+        assert time.monotonic() - started < 1
+        assert sampler.restarts == 1
+        assert sampler.stats()["hung"]['timeouts'] == 1
+
+        # query อื่นยังอ่านได้ผ่านเธรดใหม่ ขณะที่เธรดเดิมยังค้างอยู่
+        assert sampler.get("quick") == "ok"
+    finally:
+        released.set()
+        sampler.close(timeout=5)
+
+
+def test_unplug_is_logged_while_gpu_probe_hangs():
+    wmi_module = FakeWMIModule()
+    gputil = HangingGPUtil()
+    backend = create_fake_backend(wmi_module, gputil)
+    sampler = create_hardware_sampler(backend, deadline=0.3)
+    events = []
+    core = HDMIMonitorCore(backend=backend, sampler=sampler, on_event=events.append,
+                           scheduler=AdaptiveScheduler(0.01, 0.05),
+                           debouncer=StatusDebouncer(confirm_samples=2, confirm_ms=60000))
+    thread = threading.Thread(target=core.run, daemon=True)
+    thread.start()
+    try:
+        assert wait_for(lambda: events), "initial event was not logged"
+        assert events[0]['event_type'] == "NORMAL"
+
+        wmi_module.monitors = []
+        assert wait_for(lambda: any(e['event_type'] == "HDMI_DISCONNECTED" for e in events))
+        assert core.probe_timeouts > 0
+    finally:
+        core.stop()
+        gputil.release()
+        thread.join(5)
+        sampler.close(timeout=5)
+
+
+def test_polling_mode_never_checks_less_often_than_before():
+    core = HDMIMonitorCore(backend=create_fake_backend())
+    assert core.scheduler.max_interval <= HDMI_CHECK_INTERVAL
+    for changed in [True] + [False] * 20:
+        core.scheduler.record(changed)
+    assert core.scheduler.next_interval() <= HDMI_CHECK_INTERVAL
+
+
+def test_event_mode_backs_off_to_safety_interval():
+    core = HDMIMonitorCore(backend=create_fake_backend(), event_source=QueueDisplayEventSource())
+    assert core.scheduler.max_interval == core.safety_interval
+
+
+def test_display_event_triggers_check_without_waiting_for_poll():
+    wmi_module = FakeWMIModule()
+    backend = create_fake_backend(wmi_module)
+    event_source = QueueDisplayEventSource()
+    events = []
+    # ตรวจสอบสำรองทุก 30 วินาที: การถอดสายต้องถูกพบจากเหตุการณ์เท่านั้น
+    core = HDMIMonitorCore(backend=backend, event_source=event_source, on_event=events.append,
+                           scheduler=AdaptiveScheduler(30, 30),
+                           debouncer=StatusDebouncer(confirm_samples=1, confirm_ms=60000))
+    thread = threading.Thread(target=core.run, daemon=True)
+    thread.start()
+    try:
+        assert wait_for(lambda: events), "initial event was not logged"
+
+        wmi_module.monitors = []
+        started = time.monotonic()
+        event_source.push()
+        assert wait_for(lambda: len(events) == 2, timeout=5)
+        assert time.monotonic() - started < 1
+        assert events[1]['event_type'] == "HDMI_DISCONNECTED"
+        assert core.events_received == 1
+        assert core.last_event_latency < 1
+    finally:
+        core.stop()
+        thread.join(5)